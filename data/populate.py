@@ -1,7 +1,15 @@
 import sqlite3
 import json
+import re
 import sys
 import os
+import time
+import argparse
+import hashlib
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from queue import Full
 
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(__file__)
@@ -9,720 +17,1126 @@ DB_NAME = os.path.join(SCRIPT_DIR, "dnd_srd.db")
 SCHEMA_FILE = os.path.join(SCRIPT_DIR, "schema.sql")
 MODULES_DIR = os.path.join(SCRIPT_DIR, "modules")
 
+# Module files, by the key the populate functions use.
+MODULE_FILES = {
+    'classes': '5e-SRD-Classes.json',
+    'levels': '5e-SRD-Levels.json',
+    'subclasses': '5e-SRD-Subclasses.json',
+    'features': '5e-SRD-Features.json',
+    'spells': '5e-SRD-Spells.json',
+    'equipment': '5e-SRD-Equipment.json',
+    'proficiencies': '5e-SRD-Proficiencies.json',
+    'equipment_categories': '5e-SRD-Equipment-Categories.json',
+    'weapon_properties': '5e-SRD-Weapon-Properties.json',
+    'ability_scores': '5e-SRD-Ability-Scores.json',
+    'damage_types': '5e-SRD-Damage-Types.json',
+    'magic_schools': '5e-SRD-Magic-Schools.json',
+    'races': '5e-SRD-Races.json',
+    'subraces': '5e-SRD-Subraces.json',
+    'languages': '5e-SRD-Languages.json',
+    'feats': '5e-SRD-Feats.json',
+}
+
+# Key under which the schema.sql hash is stored in BuildMeta
+SCHEMA_META_KEY = '(schema)'
+
+# Module files are streamed in chunks of this many characters, and rows are
+# written in executemany batches of BATCH_SIZE, so peak memory during a
+# build does not grow with module size.
+STREAM_CHUNK_SIZE = 1 << 16
+BATCH_SIZE = 1000
+
+# Parallel parsing: batches a parse worker may queue ahead of the writer,
+# and the total module size below which a build stays single-process.
+PARSE_QUEUE_BATCHES = 8
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# PRAGMAs used while building. The database is written to a temporary file
+# and only moved into place once the build succeeded, so there is nothing to
+# protect with a rollback journal or fsyncs.
+BUILD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -65536", # 64 MiB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    # Foreign keys are verified once at the end with foreign_key_check
+    "PRAGMA foreign_keys = OFF",
+)
+
+# --- INSERT statements, one per table ---
+
+INSERT_SQL = {
+    'AbilityScore': 'INSERT OR IGNORE INTO AbilityScore ("index", name, full_name, description) VALUES (?, ?, ?, ?)',
+    'DamageType': 'INSERT OR IGNORE INTO DamageType ("index", name, description) VALUES (?, ?, ?)',
+    'MagicSchool': 'INSERT OR IGNORE INTO MagicSchool ("index", name, description) VALUES (?, ?, ?)',
+    'Proficiency': 'INSERT OR IGNORE INTO Proficiency ("index", name, type) VALUES (?, ?, ?)',
+    'EquipmentCategory': 'INSERT OR IGNORE INTO EquipmentCategory ("index", name) VALUES (?, ?)',
+    'WeaponProperty': 'INSERT OR IGNORE INTO WeaponProperty ("index", name, description) VALUES (?, ?, ?)',
+    'Language': 'INSERT OR IGNORE INTO Language ("index", name, type) VALUES (?, ?, ?)',
+
+    'Class': """INSERT OR IGNORE INTO Class ("index", name, hit_die, spellcasting_level, spellcasting_ability_index)
+                VALUES (?, ?, ?, ?, ?)""",
+    'Subclass': 'INSERT OR IGNORE INTO Subclass ("index", name, class_index) VALUES (?, ?, ?)',
+    'ClassProficiency': "INSERT OR IGNORE INTO ClassProficiency (class_index, proficiency_index) VALUES (?, ?)",
+    'ClassProficiencyChoice': "INSERT INTO ClassProficiencyChoice (id, class_index, description, choose, type) VALUES (?, ?, ?, ?, ?)",
+    'ClassProficiencyChoiceOption': "INSERT OR IGNORE INTO ClassProficiencyChoiceOption (choice_id, proficiency_index) VALUES (?, ?)",
+    'SubclassDetails': 'UPDATE Subclass SET desc = ?, subclass_flavor = ? WHERE "index" = ?',
+
+    'Spell': """INSERT OR IGNORE INTO Spell ("index", name, description, higher_level_desc, range, components, material, ritual,
+                duration, concentration, casting_time, level, attack_type, damage_type_index, dc_type_index,
+                dc_success, area_of_effect_type, area_of_effect_size, school_index)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'SpellClass': "INSERT OR IGNORE INTO SpellClass (spell_index, class_index) VALUES (?, ?)",
+    'SpellSubclass': "INSERT OR IGNORE INTO SpellSubclass (spell_index, subclass_index) VALUES (?, ?)",
+
+    'Equipment': """INSERT OR IGNORE INTO Equipment ("index", name, equipment_category_index, cost_quantity, cost_unit, weight,
+                    description, weapon_category, weapon_range, category_range, damage_dice, damage_type_index,
+                    range_normal, range_long, throw_range_normal, throw_range_long, two_handed_damage_dice,
+                    two_handed_damage_type_index, armor_category, armor_class_base, armor_class_dex_bonus,
+                    armor_class_max_bonus, str_minimum, stealth_disadvantage, gear_category_index, tool_category,
+                    vehicle_category, speed_quantity, speed_unit, capacity)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'EquipmentProperty': "INSERT OR IGNORE INTO EquipmentProperty (equipment_index, property_index) VALUES (?, ?)",
+    'EquipmentContent': """INSERT OR IGNORE INTO EquipmentContent (pack_equipment_index, content_equipment_index, quantity)
+                           VALUES (?, ?, ?)""",
+
+    'Feature': 'INSERT OR IGNORE INTO Feature ("index", name, description) VALUES (?, ?, ?)',
+    'ClassLevel': """INSERT INTO ClassLevel (id, class_index, level, prof_bonus, ability_score_bonuses, class_specific_json)
+                     VALUES (?, ?, ?, ?, ?, ?)""",
+    'ClassLevel_Feature': "INSERT OR IGNORE INTO ClassLevel_Feature (class_level_id, feature_index) VALUES (?, ?)",
+    'ClassLevel_Spellcasting': """INSERT OR IGNORE INTO ClassLevel_Spellcasting
+                                  (class_level_id, cantrips_known, spells_known, spell_slots_level_1, spell_slots_level_2,
+                                  spell_slots_level_3, spell_slots_level_4, spell_slots_level_5, spell_slots_level_6,
+                                  spell_slots_level_7, spell_slots_level_8, spell_slots_level_9)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'SubclassLevel': """INSERT INTO SubclassLevel (id, subclass_index, level, subclass_specific_json)
+                        VALUES (?, ?, ?, ?)""",
+    'SubclassLevel_Feature': "INSERT OR IGNORE INTO SubclassLevel_Feature (subclass_level_id, feature_index) VALUES (?, ?)",
+
+    'Feat': """INSERT OR IGNORE INTO Feat ("index", name, prerequisites_json, description)
+               VALUES (?, ?, ?, ?)""",
+
+    'Race': """INSERT OR IGNORE INTO Race ("index", name, speed, alignment, age, size, size_description, language_desc)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+    'RaceAbilityBonus': "INSERT OR IGNORE INTO RaceAbilityBonus (race_index, ability_score_index, bonus) VALUES (?, ?, ?)",
+    'RaceProficiency': "INSERT OR IGNORE INTO RaceProficiency (race_index, proficiency_index) VALUES (?, ?)",
+    'RaceLanguage': "INSERT OR IGNORE INTO RaceLanguage (race_index, language_index) VALUES (?, ?)",
+    'RaceFeature': "INSERT OR IGNORE INTO RaceFeature (race_index, feature_index) VALUES (?, ?)",
+    'RaceProficiencyChoice': "INSERT INTO RaceProficiencyChoice (id, race_index, description, choose, type) VALUES (?, ?, ?, ?, ?)",
+    'RaceProficiencyChoiceOption': "INSERT OR IGNORE INTO RaceProficiencyChoiceOption (choice_id, proficiency_index) VALUES (?, ?)",
+    'RaceLanguageChoice': "INSERT INTO RaceLanguageChoice (id, race_index, description, choose, type) VALUES (?, ?, ?, ?, ?)",
+    'RaceLanguageChoiceOption': "INSERT OR IGNORE INTO RaceLanguageChoiceOption (choice_id, language_index) VALUES (?, ?)",
+
+    'Subrace': """INSERT OR IGNORE INTO Subrace ("index", name, race_index, description)
+                  VALUES (?, ?, ?, ?)""",
+    'SubraceAbilityBonus': "INSERT OR IGNORE INTO SubraceAbilityBonus (subrace_index, ability_score_index, bonus) VALUES (?, ?, ?)",
+    'SubraceProficiency': "INSERT OR IGNORE INTO SubraceProficiency (subrace_index, proficiency_index) VALUES (?, ?)",
+    'SubraceLanguage': "INSERT OR IGNORE INTO SubraceLanguage (subrace_index, language_index) VALUES (?, ?)",
+    'SubraceFeature': "INSERT OR IGNORE INTO SubraceFeature (subrace_index, feature_index) VALUES (?, ?)",
+    'SubraceLanguageChoice': "INSERT INTO SubraceLanguageChoice (id, subrace_index, description, choose, type) VALUES (?, ?, ?, ?, ?)",
+    'SubraceLanguageChoiceOption': "INSERT OR IGNORE INTO SubraceLanguageChoiceOption (choice_id, language_index) VALUES (?, ?)",
+
+    'ClassProgression': """INSERT INTO ClassProgression (class_index, level, class_name, hit_die, prof_bonus,
+                           ability_score_bonuses, spellcasting_ability_index, cantrips_known, spells_known,
+                           spell_slots_level_1, spell_slots_level_2, spell_slots_level_3, spell_slots_level_4,
+                           spell_slots_level_5, spell_slots_level_6, spell_slots_level_7, spell_slots_level_8,
+                           spell_slots_level_9, class_specific_json, features_json, all_features_json)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'SubclassProgression': """INSERT INTO SubclassProgression (subclass_index, level, class_index, subclass_name,
+                              subclass_specific_json, features_json, all_features_json)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)""",
+    'RaceSummary': """INSERT INTO RaceSummary ("index", kind, race_index, name, speed, size, ability_bonuses_json,
+                      proficiencies_json, languages_json, traits_json)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'SpellList': "INSERT INTO SpellList (owner_index, spell_level, spells_json) VALUES (?, ?, ?)",
+    'SrdRef': 'INSERT INTO SrdRef (id, kind, "index", name) VALUES (?, ?, ?, ?)',
+}
+
+# --- Build Report ---
+
+class BuildReport:
+    """Collects per-table row counts and timings for the end-of-build summary."""
+    def __init__(self):
+        self.tables = {} # name -> [rows, seconds]
+        self.started = time.perf_counter()
+
+    def record(self, name, rows, seconds):
+        entry = self.tables.setdefault(name, [0, 0.0])
+        entry[0] += rows
+        entry[1] += seconds
+
+    def print_report(self):
+        # "(...)" entries are parse/index steps, not inserted rows
+        total_rows = sum(rows for name, (rows, _) in self.tables.items() if not name.startswith('('))
+        print("\nBuild timing report:")
+        print(f"  {'Table':<36} {'Rows':>8} {'ms':>9}")
+        for name, (rows, seconds) in sorted(self.tables.items(), key=lambda kv: -kv[1][1]):
+            print(f"  {name:<36} {rows:>8} {seconds * 1000:>9.2f}")
+        print(f"  {'TOTAL (wall clock)':<36} {total_rows:>8} {(time.perf_counter() - self.started) * 1000:>9.2f}")
+
 # --- Database Functions ---
 
 def connect_db(db_name):
-    """Connects to the SQLite DB and returns connection and cursor."""
+    """Connects to the SQLite DB, applies the build PRAGMAs and returns connection and cursor."""
     conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
-    cursor.executescript("PRAGMA foreign_keys = ON;")
+    for pragma in BUILD_PRAGMAS:
+        cursor.execute(pragma)
     return conn, cursor
 
-def create_tables(cursor):
-    """Creates all tables from the schema.sql file."""
-    print(f"Reading schema from {SCHEMA_FILE}...")
+CREATE_INDEX = re.compile(r'^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\b', re.IGNORECASE | re.MULTILINE)
+
+def split_schema(schema_sql):
+    """
+    Splits schema.sql into (table_statements, index_statements).
+    Indexes are created after the bulk load, which is much cheaper than
+    maintaining them row by row.
+    """
+    tables, indexes = [], []
+    for statement in schema_sql.split(';'):
+        # Drop the comment lines above the statement before classifying it
+        statement = "\n".join(line for line in statement.splitlines()
+                               if not line.lstrip().startswith('--')).strip()
+        if not statement or statement.upper().startswith('PRAGMA'):
+            continue
+        (indexes if CREATE_INDEX.match(statement) else tables).append(statement)
+    # Every index in the file must be deferred, or it's built row by row
+    expected = len(CREATE_INDEX.findall(schema_sql))
+    if len(indexes) != expected:
+        raise ValueError(f"schema.sql has {expected} CREATE INDEX statements but only {len(indexes)} were deferred")
+    return tables, indexes
+
+def read_schema():
+    """Reads schema.sql and returns it split by split_schema()."""
     try:
         with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
-            schema_sql = f.read()
-        cursor.executescript(schema_sql)
-        print("Tables created successfully.")
+            return split_schema(f.read())
     except FileNotFoundError:
         print(f"ERROR: '{SCHEMA_FILE}' not found.", file=sys.stderr)
         raise
+
+def create_tables(cursor):
+    """Creates all tables from the schema.sql file (indexes are deferred)."""
+    print(f"Reading schema from {SCHEMA_FILE}...")
+    tables, _ = read_schema()
+    try:
+        for statement in tables:
+            cursor.execute(statement)
+        print("Tables created successfully.")
     except sqlite3.Error as e:
         print(f"An error occurred while creating tables: {e}", file=sys.stderr)
         raise
 
-# --- Data Loading Function ---
+def create_indexes(cursor, report):
+    """
+    Creates the indexes from schema.sql once all rows are loaded.
+    No ANALYZE: statistics from the small SRD tables make the planner sort
+    "tiny" results instead of walking an index, which stops holding once
+    larger homebrew modules are merged in.
+    """
+    _, indexes = read_schema()
+    start = time.perf_counter()
+    for statement in indexes:
+        cursor.execute(statement)
+    report.record("(indexes)", 0, time.perf_counter() - start)
 
-def load_json(file_path):
-    """Loads and parses JSON data from a local file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            print(f"  Loading data from: {file_path}")
-            return json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from {file_path}: {e}", file=sys.stderr)
-        return None
-    except FileNotFoundError:
-        print(f"Error: File not found. Make sure '{file_path}' exists.", file=sys.stderr)
-        return None
-    except Exception as e:
-        print(f"Error loading file {file_path}: {e}", file=sys.stderr)
-        return None
+def check_foreign_keys(cursor):
+    """Fails the build if any row violates a foreign key."""
+    violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        for table, rowid, parent, _ in violations[:20]:
+            print(f"  Foreign key violation: {table} rowid {rowid} -> {parent}", file=sys.stderr)
+        raise sqlite3.IntegrityError(f"{len(violations)} foreign key violation(s)")
 
-# --- Population Functions ---
+def write_rows(cursor, rows_by_table, report):
+    """Inserts every batch in `rows_by_table` ({table: [row tuples]}) with executemany, in order."""
+    for table, rows in rows_by_table.items():
+        if not rows:
+            continue
+        start = time.perf_counter()
+        cursor.executemany(INSERT_SQL[table], rows)
+        report.record(table, len(rows), time.perf_counter() - start)
 
-def populate_reference_tables(cursor, file_paths):
-    """Populates all independent reference tables from their JSON files."""
-    print("Populating reference tables...")
-    
-    try:
-        ability_scores = load_json(file_paths['ability_scores'])
-        if ability_scores:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO AbilityScore (\"index\", name, full_name, description) VALUES (?, ?, ?, ?)",
-                [(s['index'], s['name'], s.get('full_name'), '\n'.join(s.get('desc', []))) for s in ability_scores]
-            )
+# --- Data Loading Functions ---
 
-        damage_types = load_json(file_paths['damage_types'])
-        if damage_types:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO DamageType (\"index\", name, description) VALUES (?, ?, ?)",
-                [(d['index'], d['name'], '\n'.join(d.get('desc', []))) for d in damage_types]
-            )
+def stream_json_array(file_path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the elements of a file's top-level JSON array one at a time.
+    The file is read in chunks of `chunk_size` characters, so memory use
+    depends on the largest single element rather than on the file size.
+    Raises json.JSONDecodeError for malformed input.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        eof = not buf
 
-        magic_schools = load_json(file_paths['magic_schools'])
-        if magic_schools:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO MagicSchool (\"index\", name, description) VALUES (?, ?, ?)",
-                [(s['index'], s['name'], s.get('desc')) for s in magic_schools]
-            )
+        def skip_whitespace():
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
 
-        prof_data = load_json(file_paths['proficiencies'])
-        if prof_data:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO Proficiency (\"index\", name, type) VALUES (?, ?, ?)",
-                [(p['index'], p['name'], p['type']) for p in prof_data]
-            )
+        skip_whitespace()
+        if buf[pos:pos + 1] != '[':
+            raise json.JSONDecodeError("Expected a top-level JSON array", buf, pos)
+        pos += 1
 
-        cat_data = load_json(file_paths['equipment_categories'])
-        if cat_data:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO EquipmentCategory (\"index\", name) VALUES (?, ?)",
-                [(c['index'], c['name']) for c in cat_data]
-            )
-        
-        prop_data = load_json(file_paths['weapon_properties'])
-        if prop_data:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO WeaponProperty (\"index\", name, description) VALUES (?, ?, ?)",
-                [(p['index'], p['name'], '\n'.join(p.get('desc', []))) for p in prop_data]
-            )
-        
-        # NEW: Load Languages
-        languages = load_json(file_paths['languages'])
-        if languages:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO Language (\"index\", name, type) VALUES (?, ?, ?)",
-                [(l['index'], l['name'], l.get('type')) for l in languages]
-            )
+        skip_whitespace()
+        if buf[pos:pos + 1] == ']':
+            return
+        while True:
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+                # A value not followed by a delimiter may be cut short at the
+                # chunk boundary (e.g. "12" of "125"); read more to be sure.
+                complete = eof or (end < len(buf) and buf[end] in ' \t\r\n,]')
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                # Element spans the chunk boundary: drop consumed text, read more
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
 
-        print("Reference tables populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating reference tables: {e}", file=sys.stderr)
-        raise
+            yield element
+            pos = end
+            skip_whitespace()
+            separator = buf[pos:pos + 1]
+            pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise json.JSONDecodeError("Expected ',' or ']' between array elements", buf, pos - 1)
+            skip_whitespace()
 
-def populate_class_tables(cursor, file_paths):
-    """Populates all tables related to Classes."""
-    print("Populating Class tables...")
-    classes_data = load_json(file_paths['classes'])
-    if not classes_data:
-        print("  Skipping class tables, file not loaded.")
+def stream_module(file_path, report=None):
+    """
+    Yields the records of a module file one at a time (see stream_json_array).
+    A missing file is reported and yields nothing. Time spent reading and
+    decoding is added to `report` as a "(parse)" entry.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: File not found. Make sure '{file_path}' exists.", file=sys.stderr)
+        print(f"  Skipping {os.path.basename(file_path)}, file not loaded.")
         return
 
+    print(f"  Loading data from: {file_path}")
+    records = stream_json_array(file_path)
+    parse_seconds = 0.0
+    count = 0
     try:
-        for char_class in classes_data:
-            spellcasting = char_class.get('spellcasting', {})
-            spellcasting_lvl = spellcasting.get('level')
-            spellcasting_abil = spellcasting.get('spellcasting_ability', {}).get('index')
-            
-            cursor.execute(
-                """INSERT OR IGNORE INTO Class ("index", name, hit_die, spellcasting_level, spellcasting_ability_index) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                (
-                    char_class['index'], char_class['name'], char_class['hit_die'],
-                    spellcasting_lvl, spellcasting_abil
-                )
-            )
-            
-            for subclass in char_class.get('subclasses', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO Subclass (\"index\", name, class_index) VALUES (?, ?, ?)",
-                    (subclass['index'], subclass['name'], char_class['index'])
-                )
-            
-            for prof in char_class.get('proficiencies', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO ClassProficiency (class_index, proficiency_index) VALUES (?, ?)",
-                    (char_class['index'], prof['index'])
-                )
-                                  
-            for choice in char_class.get('proficiency_choices', []):
-                cursor.execute(
-                    "INSERT INTO ClassProficiencyChoice (class_index, description, choose, type) VALUES (?, ?, ?, ?)",
-                    (char_class['index'], choice.get('desc'), choice['choose'], choice['type'])
-                )
-                choice_id = cursor.lastrowid
-                
-                choice_from = choice.get('from', {})
-                if not choice_from: continue
-
-                options = choice_from.get('options', [])
-                for option in options:
-                    if isinstance(option, dict) and option.get('option_type') == 'reference':
-                        cursor.execute(
-                            "INSERT OR IGNORE INTO ClassProficiencyChoiceOption (choice_id, proficiency_index) VALUES (?, ?)",
-                            (choice_id, option['item']['index'])
-                        )
-                    elif isinstance(option, dict) and option.get('option_type') == 'choice':
-                        nested_choice_from = option.get('choice', {}).get('from', {})
-                        nested_options = nested_choice_from.get('options', [])
-                        for nested_option in nested_options:
-                             if isinstance(nested_option, dict) and nested_option.get('option_type') == 'reference':
-                                cursor.execute(
-                                    "INSERT OR IGNORE INTO ClassProficiencyChoiceOption (choice_id, proficiency_index) VALUES (?, ?)",
-                                    (choice_id, nested_option['item']['index'])
-                                )
-
-        print("Class tables populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating class tables: {e}", file=sys.stderr)
+        while True:
+            start = time.perf_counter()
+            try:
+                record = next(records)
+            except StopIteration:
+                break
+            finally:
+                parse_seconds += time.perf_counter() - start
+            count += 1
+            yield record
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON from {file_path}: {e}", file=sys.stderr)
         raise
+    finally:
+        if report:
+            report.record(f"(parse) {os.path.basename(file_path)}", count, parse_seconds)
 
-def populate_subclass_details(cursor, file_paths):
-    """Parses 5e-SRD-Subclasses.json to add descriptions and flavors to the Subclass table."""
-    print("Populating subclass details...")
-    subclass_data = load_json(file_paths['subclasses'])
-    if not subclass_data:
-        print("  Skipping subclass details, file not loaded.")
-        return
-        
-    try:
-        for subclass in subclass_data:
-            cursor.execute(
-                """UPDATE Subclass SET desc = ?, subclass_flavor = ? WHERE "index" = ?""",
-                (
-                    '\n'.join(subclass.get('desc', [])),
-                    subclass.get('subclass_flavor'),
-                    subclass['index']
-                )
-            )
-        print("Subclass details populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating subclass details: {e}", file=sys.stderr)
-        raise
+def iter_batches(rows, batch_size=BATCH_SIZE):
+    """
+    Groups a stream of (table, row) pairs into {table: [rows]} batches of
+    at most `batch_size` rows. Rows of a table keep their stream order.
+    """
+    batch = {}
+    size = 0
+    for table, row in rows:
+        batch.setdefault(table, []).append(row)
+        size += 1
+        if size >= batch_size:
+            yield batch
+            batch, size = {}, 0
+    if batch:
+        yield batch
 
-def populate_spell_tables(cursor, file_paths):
-    """Populates all tables related to Spells."""
-    print("Populating Spell tables...")
-    spells_data = load_json(file_paths['spells'])
-    if not spells_data:
-        print("  Skipping spells, file not loaded.")
+def _choice_option_indexes(choice):
+    """Yields the referenced indexes of a choice's options, including one level of nested choices."""
+    choice_from = choice.get('from', {})
+    if not choice_from:
         return
+    for option in choice_from.get('options', []):
+        if isinstance(option, dict) and option.get('option_type') == 'reference':
+            yield option['item']['index']
+        elif isinstance(option, dict) and option.get('option_type') == 'choice':
+            nested_choice_from = option.get('choice', {}).get('from', {})
+            for nested_option in nested_choice_from.get('options', []):
+                if isinstance(nested_option, dict) and nested_option.get('option_type') == 'reference':
+                    yield nested_option['item']['index']
 
-    try:
-        for spell in spells_data:
-            cursor.execute(
-                """INSERT OR IGNORE INTO Spell ("index", name, description, higher_level_desc, range, components, material, ritual, 
-                   duration, concentration, casting_time, level, attack_type, damage_type_index, dc_type_index, 
-                   dc_success, area_of_effect_type, area_of_effect_size, school_index) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    spell['index'], spell['name'], '\n'.join(spell.get('desc', [])),
-                    '\n'.join(spell.get('higher_level', [])), spell.get('range'),
-                    ','.join(spell.get('components', [])), spell.get('material'),
-                    spell.get('ritual', False), spell.get('duration'),
-                    spell.get('concentration', False), spell.get('casting_time'),
-                    spell['level'], spell.get('attack_type'),
-                    spell.get('damage', {}).get('damage_type', {}).get('index'),
-                    spell.get('dc', {}).get('dc_type', {}).get('index'),
-                    spell.get('dc', {}).get('dc_success'),
-                    spell.get('area_of_effect', {}).get('type'),
-                    spell.get('area_of_effect', {}).get('size'),
-                    spell.get('school', {}).get('index')
-                )
-            )
-            
-            for char_class in spell.get('classes', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO SpellClass (spell_index, class_index) VALUES (?, ?)",
-                    (spell['index'], char_class['index'])
-                )
+# --- Row Parsers ---
+# Each parser streams its module file(s) and yields (table, row) pairs;
+# the keys of INSERT_SQL name the statement used for each table.
 
-            for subclass in spell.get('subclasses', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO SpellSubclass (spell_index, subclass_index) VALUES (?, ?)",
-                    (spell['index'], subclass['index'])
-                )
-        
-        print("Spell tables populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating spell tables: {e}", file=sys.stderr)
-        raise
+def parse_reference_tables(file_paths, report=None):
+    """Rows for all independent reference tables."""
+    for s in stream_module(file_paths['ability_scores'], report):
+        yield 'AbilityScore', (s['index'], s['name'], s.get('full_name'), '\n'.join(s.get('desc', [])))
 
-def populate_equipment_tables(cursor, file_paths):
-    """Populates all tables related to Equipment."""
-    print("Populating Equipment tables...")
-    equipment_data = load_json(file_paths['equipment'])
-    if not equipment_data:
-        print("  Skipping equipment, file not loaded.")
-        return
-        
-    try:
-        for item in equipment_data:
-            cursor.execute(
-                """INSERT OR IGNORE INTO Equipment ("index", name, equipment_category_index, cost_quantity, cost_unit, weight, 
-                   description, weapon_category, weapon_range, category_range, damage_dice, damage_type_index, 
-                   range_normal, range_long, throw_range_normal, throw_range_long, two_handed_damage_dice, 
-                   two_handed_damage_type_index, armor_category, armor_class_base, armor_class_dex_bonus, 
-                   armor_class_max_bonus, str_minimum, stealth_disadvantage, gear_category_index, tool_category, 
-                   vehicle_category, speed_quantity, speed_unit, capacity) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    item.get('index'), item.get('name'),
-                    item.get('equipment_category', {}).get('index'),
-                    item.get('cost', {}).get('quantity'), item.get('cost', {}).get('unit'),
-                    item.get('weight'), '\n'.join(item.get('desc', [])) if item.get('desc') else None,
-                    item.get('weapon_category'), item.get('weapon_range'), item.get('category_range'),
-                    item.get('damage', {}).get('damage_dice'),
-                    item.get('damage', {}).get('damage_type', {}).get('index'),
-                    item.get('range', {}).get('normal'), item.get('range', {}).get('long'),
-                    item.get('throw_range', {}).get('normal'), item.get('throw_range', {}).get('long'),
-                    item.get('two_handed_damage', {}).get('damage_dice'),
-                    item.get('two_handed_damage', {}).get('damage_type', {}).get('index'),
-                    item.get('armor_category'), item.get('armor_class', {}).get('base'),
-                    item.get('armor_class', {}).get('dex_bonus'),
-                    item.get('armor_class', {}).get('max_bonus'),
-                    item.get('str_minimum', 0), item.get('stealth_disadvantage', False),
-                    item.get('gear_category', {}).get('index'), item.get('tool_category'),
-                    item.get('vehicle_category'), item.get('speed', {}).get('quantity'),
-                    item.get('speed', {}).get('unit'), item.get('capacity')
-                )
-            )
-            
-            for prop in item.get('properties', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO EquipmentProperty (equipment_index, property_index) VALUES (?, ?)",
-                    (item['index'], prop['index'])
-                )
-                                  
-            for content in item.get('contents', []):
-                cursor.execute("SELECT 1 FROM Equipment WHERE \"index\" = ?", (content['item']['index'],))
-                if cursor.fetchone():
-                    cursor.execute(
-                        "INSERT OR IGNORE INTO EquipmentContent (pack_equipment_index, content_equipment_index, quantity) VALUES (?, ?, ?)",
-                        (item['index'], content['item']['index'], content['quantity'])
-                    )
-
-        print("Equipment tables populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating equipment tables: {e}", file=sys.stderr)
-        raise
+    for d in stream_module(file_paths['damage_types'], report):
+        yield 'DamageType', (d['index'], d['name'], '\n'.join(d.get('desc', [])))
 
-def populate_levels_tables(cursor, file_paths):
-    """Populates all tables related to class and subclass level progression."""
-    print("Populating level progression tables...")
-    
-    # We must load features first to populate the Feature table
-    features_data = load_json(file_paths['features'])
-    if features_data:
-        try:
-            for feature in features_data:
-                cursor.execute(
-                    "INSERT OR IGNORE INTO Feature (\"index\", name, description) VALUES (?, ?, ?)",
-                    (
-                        feature['index'], feature['name'],
-                        '\n'.join(feature.get('desc', []))
-                    )
-                )
-            print("  Feature table populated.")
-        except sqlite3.Error as e:
-            print(f"Error populating Feature table: {e}", file=sys.stderr)
-            raise
-    else:
-        print("  Skipping Feature table, file not loaded.")
-
-    levels_data = load_json(file_paths['levels'])
-    if not levels_data:
-        print("  Skipping level progression, file not loaded.")
-        return
+    for s in stream_module(file_paths['magic_schools'], report):
+        yield 'MagicSchool', (s['index'], s['name'], s.get('desc'))
 
-    try:
-        for level_entry in levels_data:
-            # Add any features *also* defined in this file (some are)
+    for p in stream_module(file_paths['proficiencies'], report):
+        yield 'Proficiency', (p['index'], p['name'], p['type'])
+
+    for c in stream_module(file_paths['equipment_categories'], report):
+        yield 'EquipmentCategory', (c['index'], c['name'])
+
+    for p in stream_module(file_paths['weapon_properties'], report):
+        yield 'WeaponProperty', (p['index'], p['name'], '\n'.join(p.get('desc', [])))
+
+    for l in stream_module(file_paths['languages'], report):
+        yield 'Language', (l['index'], l['name'], l.get('type'))
+
+def parse_class_tables(file_paths, report=None):
+    """Rows for all tables related to Classes."""
+    choice_id = 0
+    for char_class in stream_module(file_paths['classes'], report):
+        spellcasting = char_class.get('spellcasting', {})
+        yield 'Class', (
+            char_class['index'], char_class['name'], char_class['hit_die'],
+            spellcasting.get('level'), spellcasting.get('spellcasting_ability', {}).get('index')
+        )
+
+        for subclass in char_class.get('subclasses', []):
+            yield 'Subclass', (subclass['index'], subclass['name'], char_class['index'])
+
+        for prof in char_class.get('proficiencies', []):
+            yield 'ClassProficiency', (char_class['index'], prof['index'])
+
+        for choice in char_class.get('proficiency_choices', []):
+            # Choice ids are assigned here instead of read back through lastrowid
+            choice_id += 1
+            yield 'ClassProficiencyChoice', (choice_id, char_class['index'], choice.get('desc'), choice['choose'], choice['type'])
+            for prof_index in _choice_option_indexes(choice):
+                yield 'ClassProficiencyChoiceOption', (choice_id, prof_index)
+
+def parse_subclass_details(file_paths, report=None):
+    """Descriptions and flavors from 5e-SRD-Subclasses.json, applied as UPDATEs to Subclass."""
+    for subclass in stream_module(file_paths['subclasses'], report):
+        yield 'SubclassDetails', ('\n'.join(subclass.get('desc', [])), subclass.get('subclass_flavor'), subclass['index'])
+
+def parse_spell_tables(file_paths, report=None):
+    """Rows for all tables related to Spells."""
+    for spell in stream_module(file_paths['spells'], report):
+        yield 'Spell', (
+            spell['index'], spell['name'], '\n'.join(spell.get('desc', [])),
+            '\n'.join(spell.get('higher_level', [])), spell.get('range'),
+            ','.join(spell.get('components', [])), spell.get('material'),
+            spell.get('ritual', False), spell.get('duration'),
+            spell.get('concentration', False), spell.get('casting_time'),
+            spell['level'], spell.get('attack_type'),
+            spell.get('damage', {}).get('damage_type', {}).get('index'),
+            spell.get('dc', {}).get('dc_type', {}).get('index'),
+            spell.get('dc', {}).get('dc_success'),
+            spell.get('area_of_effect', {}).get('type'),
+            spell.get('area_of_effect', {}).get('size'),
+            spell.get('school', {}).get('index')
+        )
+        for char_class in spell.get('classes', []):
+            yield 'SpellClass', (spell['index'], char_class['index'])
+        for subclass in spell.get('subclasses', []):
+            yield 'SpellSubclass', (spell['index'], subclass['index'])
+
+def parse_equipment_tables(file_paths, report=None):
+    """
+    Rows for all tables related to Equipment. Pack contents that reference
+    unknown equipment are removed afterwards (see POST_STAGE_SQL).
+    """
+    for item in stream_module(file_paths['equipment'], report):
+        yield 'Equipment', (
+            item.get('index'), item.get('name'),
+            item.get('equipment_category', {}).get('index'),
+            item.get('cost', {}).get('quantity'), item.get('cost', {}).get('unit'),
+            item.get('weight'), '\n'.join(item.get('desc', [])) if item.get('desc') else None,
+            item.get('weapon_category'), item.get('weapon_range'), item.get('category_range'),
+            item.get('damage', {}).get('damage_dice'),
+            item.get('damage', {}).get('damage_type', {}).get('index'),
+            item.get('range', {}).get('normal'), item.get('range', {}).get('long'),
+            item.get('throw_range', {}).get('normal'), item.get('throw_range', {}).get('long'),
+            item.get('two_handed_damage', {}).get('damage_dice'),
+            item.get('two_handed_damage', {}).get('damage_type', {}).get('index'),
+            item.get('armor_category'), item.get('armor_class', {}).get('base'),
+            item.get('armor_class', {}).get('dex_bonus'),
+            item.get('armor_class', {}).get('max_bonus'),
+            item.get('str_minimum', 0), item.get('stealth_disadvantage', False),
+            item.get('gear_category', {}).get('index'), item.get('tool_category'),
+            item.get('vehicle_category'), item.get('speed', {}).get('quantity'),
+            item.get('speed', {}).get('unit'), item.get('capacity')
+        )
+        for prop in item.get('properties', []):
+            yield 'EquipmentProperty', (item['index'], prop['index'])
+        for content in item.get('contents', []):
+            yield 'EquipmentContent', (item['index'], content['item']['index'], content['quantity'])
+
+def parse_levels_tables(file_paths, report=None):
+    """Rows for all tables related to class and subclass level progression."""
+    # Features come first so their descriptions win over the name-only
+    # entries below (Feature inserts are INSERT OR IGNORE)
+    for feature in stream_module(file_paths['features'], report):
+        yield 'Feature', (feature['index'], feature['name'], '\n'.join(feature.get('desc', [])))
+
+    class_level_id = 0
+    subclass_level_id = 0
+    for level_entry in stream_module(file_paths['levels'], report):
+        # Add any features *also* defined in this file (some are)
+        for feature in level_entry.get('features', []):
+            yield 'Feature', (feature['index'], feature['name'], None)
+
+        if 'subclass' in level_entry:
+            subclass_level_id += 1
+            yield 'SubclassLevel', (
+                subclass_level_id,
+                level_entry['subclass']['index'],
+                level_entry['level'],
+                json.dumps(level_entry.get('subclass_specific'))
+            )
             for feature in level_entry.get('features', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO Feature (\"index\", name) VALUES (?, ?)",
-                    (feature['index'], feature['name'])
-                )
-            
-            if 'subclass' in level_entry:
-                cursor.execute(
-                    """INSERT INTO SubclassLevel (subclass_index, level, subclass_specific_json) 
-                       VALUES (?, ?, ?)""",
-                    (
-                        level_entry['subclass']['index'],
-                        level_entry['level'],
-                        json.dumps(level_entry.get('subclass_specific'))
-                    )
-                )
-                subclass_level_id = cursor.lastrowid
-                
-                for feature in level_entry.get('features', []):
-                    cursor.execute(
-                        "INSERT OR IGNORE INTO SubclassLevel_Feature (subclass_level_id, feature_index) VALUES (?, ?)",
-                        (subclass_level_id, feature['index'])
-                    )
-            
-            elif 'class' in level_entry:
-                cursor.execute(
-                    """INSERT INTO ClassLevel (class_index, level, prof_bonus, ability_score_bonuses, class_specific_json) 
-                       VALUES (?, ?, ?, ?, ?)""",
-                    (
-                        level_entry['class']['index'],
-                        level_entry['level'],
-                        level_entry.get('prof_bonus'),
-                        level_entry.get('ability_score_bonuses'),
-                        json.dumps(level_entry.get('class_specific'))
-                    )
-                )
-                class_level_id = cursor.lastrowid
-                
-                for feature in level_entry.get('features', []):
-                    cursor.execute(
-                        "INSERT OR IGNORE INTO ClassLevel_Feature (class_level_id, feature_index) VALUES (?, ?)",
-                        (class_level_id, feature['index'])
-                    )
-                
-                if 'spellcasting' in level_entry:
-                    sc = level_entry['spellcasting']
-                    cursor.execute(
-                        """INSERT OR IGNORE INTO ClassLevel_Spellcasting 
-                           (class_level_id, cantrips_known, spells_known, spell_slots_level_1, spell_slots_level_2, 
-                           spell_slots_level_3, spell_slots_level_4, spell_slots_level_5, spell_slots_level_6, 
-                           spell_slots_level_7, spell_slots_level_8, spell_slots_level_9) 
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (
-                            class_level_id,
-                            sc.get('cantrips_known'), sc.get('spells_known'),
-                            sc.get('spell_slots_level_1'), sc.get('spell_slots_level_2'),
-                            sc.get('spell_slots_level_3'), sc.get('spell_slots_level_4'),
-                            sc.get('spell_slots_level_5'), sc.get('spell_slots_level_6'),
-                            sc.get('spell_slots_level_7'), sc.get('spell_slots_level_8'),
-                            sc.get('spell_slots_level_9')
-                        )
-                    )
-        print("Level progression tables populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating level tables: {e}", file=sys.stderr)
-        raise
+                yield 'SubclassLevel_Feature', (subclass_level_id, feature['index'])
 
-# ---------- NEW: Feat Population Function ----------
-def populate_feat_table(cursor, file_paths):
-    """Populates the Feat table."""
-    print("Populating Feat table...")
-    feats_data = load_json(file_paths['feats'])
-    if not feats_data:
-        print("  Skipping Feats, file not loaded.")
-        return
-    
-    try:
-        for feat in feats_data:
-            prereqs = feat.get('prerequisites', [])
-            prereqs_json = json.dumps(prereqs) if prereqs else None
-            
-            cursor.execute(
-                """INSERT OR IGNORE INTO Feat ("index", name, prerequisites_json, description) 
-                   VALUES (?, ?, ?, ?)""",
-                (
-                    feat['index'], feat['name'],
-                    prereqs_json,
-                    '\n'.join(feat.get('desc', []))
-                )
+        elif 'class' in level_entry:
+            class_level_id += 1
+            yield 'ClassLevel', (
+                class_level_id,
+                level_entry['class']['index'],
+                level_entry['level'],
+                level_entry.get('prof_bonus'),
+                level_entry.get('ability_score_bonuses'),
+                json.dumps(level_entry.get('class_specific'))
             )
-        print("Feat table populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating Feat table: {e}", file=sys.stderr)
-        raise
+            for feature in level_entry.get('features', []):
+                yield 'ClassLevel_Feature', (class_level_id, feature['index'])
+
+            if 'spellcasting' in level_entry:
+                sc = level_entry['spellcasting']
+                yield 'ClassLevel_Spellcasting', (
+                    class_level_id,
+                    sc.get('cantrips_known'), sc.get('spells_known'),
+                    sc.get('spell_slots_level_1'), sc.get('spell_slots_level_2'),
+                    sc.get('spell_slots_level_3'), sc.get('spell_slots_level_4'),
+                    sc.get('spell_slots_level_5'), sc.get('spell_slots_level_6'),
+                    sc.get('spell_slots_level_7'), sc.get('spell_slots_level_8'),
+                    sc.get('spell_slots_level_9')
+                )
+
+def parse_feat_table(file_paths, report=None):
+    """Rows for the Feat table."""
+    for feat in stream_module(file_paths['feats'], report):
+        prereqs = feat.get('prerequisites', [])
+        yield 'Feat', (
+            feat['index'], feat['name'],
+            json.dumps(prereqs) if prereqs else None,
+            '\n'.join(feat.get('desc', []))
+        )
+
+def parse_race_tables(file_paths, report=None):
+    """Rows for all tables related to Races."""
+    prof_choice_id = 0
+    lang_choice_id = 0
+    for race in stream_module(file_paths['races'], report):
+        race_index = race['index']
+        yield 'Race', (
+            race_index, race['name'], race['speed'],
+            race.get('alignment'), race.get('age'), race.get('size'),
+            race.get('size_description'), race.get('language_desc')
+        )
+
+        # Ability Bonuses
+        for bonus in race.get('ability_bonuses', []):
+            yield 'RaceAbilityBonus', (race_index, bonus['ability_score']['index'], bonus['bonus'])
+
+        # Starting Proficiencies
+        for prof in race.get('starting_proficiencies', []):
+            yield 'RaceProficiency', (race_index, prof['index'])
+
+        # Languages
+        for lang in race.get('languages', []):
+            yield 'RaceLanguage', (race_index, lang['index'])
+
+        # Traits (Features) - ensure the feature exists in the Feature table first
+        for trait in race.get('traits', []):
+            yield 'Feature', (trait['index'], trait['name'], None)
+            yield 'RaceFeature', (race_index, trait['index'])
+
+        # Proficiency Choices (modeled after class choices)
+        for choice in race.get('starting_proficiency_options', []):
+            # Check if choice is a dictionary before trying to access keys
+            if not isinstance(choice, dict):
+                print(f"  Skipping non-dict proficiency choice for race {race_index}: {choice}")
+                continue
+            prof_choice_id += 1
+            yield 'RaceProficiencyChoice', (prof_choice_id, race_index, choice.get('desc'), choice['choose'], choice['type'])
+            for prof_index in _choice_option_indexes(choice):
+                yield 'RaceProficiencyChoiceOption', (prof_choice_id, prof_index)
+
+        # Language Choices
+        for choice in race.get('language_options', []):
+            # Check if choice is a dictionary before trying to access keys
+            if not isinstance(choice, dict):
+                print(f"  Skipping non-dict language choice for race {race_index}: {choice}")
+                continue
+            lang_choice_id += 1
+            yield 'RaceLanguageChoice', (lang_choice_id, race_index, choice.get('desc'), choice['choose'], choice['type'])
+            for lang_index in _choice_option_indexes(choice):
+                yield 'RaceLanguageChoiceOption', (lang_choice_id, lang_index)
+
+def parse_subrace_tables(file_paths, report=None):
+    """Rows for all tables related to Subraces."""
+    choice_id = 0
+    for subrace in stream_module(file_paths['subraces'], report):
+        subrace_index = subrace['index']
+        yield 'Subrace', (
+            subrace_index, subrace['name'], subrace['race']['index'],
+            '\n'.join(subrace.get('desc', []))
+        )
+
+        # Ability Bonuses
+        for bonus in subrace.get('ability_bonuses', []):
+            yield 'SubraceAbilityBonus', (subrace_index, bonus['ability_score']['index'], bonus['bonus'])
 
-# ---------- NEW: Race Population Function ----------
-def populate_race_tables(cursor, file_paths):
-    """Populates all tables related to Races."""
-    print("Populating Race tables...")
-    races_data = load_json(file_paths['races'])
-    if not races_data:
-        print("  Skipping Race tables, file not loaded.")
+        # Starting Proficiencies
+        for prof in subrace.get('starting_proficiencies', []):
+            yield 'SubraceProficiency', (subrace_index, prof['index'])
+
+        # Languages
+        for lang in subrace.get('languages', []):
+            yield 'SubraceLanguage', (subrace_index, lang['index'])
+
+        # Traits (Features) - Note: key is 'racial_traits' in subrace json
+        for trait in subrace.get('racial_traits', []):
+            yield 'Feature', (trait['index'], trait['name'], None)
+            yield 'SubraceFeature', (subrace_index, trait['index'])
+
+        # Language Choices
+        for choice in subrace.get('language_options', []):
+            # Check if choice is a dictionary before trying to access keys
+            if not isinstance(choice, dict):
+                print(f"  Skipping non-dict language choice for subrace {subrace_index}: {choice}")
+                continue
+            choice_id += 1
+            yield 'SubraceLanguageChoice', (choice_id, subrace_index, choice.get('desc'), choice['choose'], choice['type'])
+            for lang_index in _choice_option_indexes(choice):
+                yield 'SubraceLanguageChoiceOption', (choice_id, lang_index)
+
+# --- Build Stages ---
+
+# Stages in dependency order:
+# (name, label, row parser, module keys read, tables owned, stages depended on)
+# A stage is re-run when one of its modules changed or a stage it depends on
+# is re-run. Re-running a stage first empties the tables it owns.
+STAGES = (
+    ('reference', "reference tables", parse_reference_tables,
+        ('ability_scores', 'damage_types', 'magic_schools', 'proficiencies',
+         'equipment_categories', 'weapon_properties', 'languages'),
+        ('AbilityScore', 'DamageType', 'MagicSchool', 'Proficiency',
+         'EquipmentCategory', 'WeaponProperty', 'Language'),
+        ()),
+    ('classes', "Class tables", parse_class_tables, ('classes',),
+        ('Class', 'Subclass', 'ClassProficiency', 'ClassProficiencyChoice', 'ClassProficiencyChoiceOption'),
+        ('reference',)),
+    # Only UPDATEs Subclass rows, so it owns no tables
+    ('subclass_details', "subclass details", parse_subclass_details, ('subclasses',), (), ('classes',)),
+    ('spells', "Spell tables", parse_spell_tables, ('spells',),
+        ('Spell', 'SpellClass', 'SpellSubclass'),
+        ('reference', 'classes')),
+    ('equipment', "Equipment tables", parse_equipment_tables, ('equipment',),
+        ('Equipment', 'EquipmentProperty', 'EquipmentContent'),
+        ('reference',)),
+    # Populates Features, which Races depend on
+    ('levels', "level progression tables", parse_levels_tables, ('features', 'levels'),
+        ('Feature', 'ClassLevel', 'ClassLevel_Feature', 'ClassLevel_Spellcasting',
+         'SubclassLevel', 'SubclassLevel_Feature'),
+        ('classes',)),
+    ('races', "Race tables", parse_race_tables, ('races',),
+        ('Race', 'RaceAbilityBonus', 'RaceProficiency', 'RaceLanguage', 'RaceFeature',
+         'RaceProficiencyChoice', 'RaceProficiencyChoiceOption',
+         'RaceLanguageChoice', 'RaceLanguageChoiceOption'),
+        ('reference', 'levels')),
+    ('subraces', "Subrace tables", parse_subrace_tables, ('subraces',),
+        ('Subrace', 'SubraceAbilityBonus', 'SubraceProficiency', 'SubraceLanguage', 'SubraceFeature',
+         'SubraceLanguageChoice', 'SubraceLanguageChoiceOption'),
+        ('races', 'levels')),
+    ('feats', "Feat table", parse_feat_table, ('feats',), ('Feat',), ('reference',)),
+)
+
+# SQL run after a stage's rows are written
+POST_STAGE_SQL = {
+    # Pack contents may only reference known equipment
+    'equipment': ("""DELETE FROM EquipmentContent
+                     WHERE content_equipment_index NOT IN (SELECT "index" FROM Equipment)""",),
+}
+
+# Contents of the SrdSearch full-text index: (stage the rows come from, SELECT of
+# name, description, details, kind, item_index). Rebuilt whenever one of
+# these stages runs.
+SEARCH_SOURCES = (
+    ('spells', """SELECT name, description,
+                         CASE WHEN concentration THEN 'Concentration ' ELSE '' END
+                         || CASE WHEN ritual THEN 'Ritual ' ELSE '' END
+                         || school_index || ' '
+                         || COALESCE(damage_type_index || ' damage ', '')
+                         || COALESCE(duration, '') || char(10)
+                         || COALESCE(higher_level_desc, ''),
+                         'spells', "index"
+                  FROM Spell"""),
+    ('levels', """SELECT name, description, NULL, 'features', "index" FROM Feature"""),
+    ('feats', """SELECT name, description, NULL, 'feats', "index" FROM Feat"""),
+    ('equipment', """SELECT name, description,
+                            replace(equipment_category_index, '-', ' ') || ' '
+                            || COALESCE(weapon_category || ' ', '')
+                            || COALESCE(damage_type_index || ' damage', ''),
+                            'equipment', "index"
+                     FROM Equipment"""),
+)
+
+def build_search_index(cursor, stage_names, report):
+    """(Re)builds the SrdSearch FTS5 index if any of its source stages ran."""
+    if not any(stage in stage_names for stage, _ in SEARCH_SOURCES):
         return
+    start = time.perf_counter()
+    cursor.execute("DELETE FROM SrdSearch")
+    for _, select in SEARCH_SOURCES:
+        cursor.execute(f"INSERT INTO SrdSearch (name, description, details, kind, item_index) {select}")
+    # Merge the index into a single b-tree for the fastest reads
+    cursor.execute("INSERT INTO SrdSearch (SrdSearch) VALUES ('optimize')")
+    rows = cursor.execute("SELECT count(*) FROM SrdSearch").fetchone()[0]
+    report.record("(search index)", rows, time.perf_counter() - start)
 
-    try:
-        for race in races_data:
-            cursor.execute(
-                """INSERT OR IGNORE INTO Race ("index", name, speed, alignment, age, size, size_description, language_desc) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    race['index'], race['name'], race['speed'],
-                    race.get('alignment'), race.get('age'), race.get('size'),
-                    race.get('size_description'), race.get('language_desc')
-                )
-            )
-            race_index = race['index']
+# --- Read-optimized tables ---
 
-            # Ability Bonuses
-            for bonus in race.get('ability_bonuses', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO RaceAbilityBonus (race_index, ability_score_index, bonus) VALUES (?, ?, ?)",
-                    (race_index, bonus['ability_score']['index'], bonus['bonus'])
-                )
-            
-            # Starting Proficiencies
-            for prof in race.get('starting_proficiencies', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO RaceProficiency (race_index, proficiency_index) VALUES (?, ?)",
-                    (race_index, prof['index'])
-                )
+def _refs(rows):
+    """JSON array of {"index", "name"} for (index, name, ...) rows."""
+    return json.dumps([{'index': row[0], 'name': row[1]} for row in rows])
 
-            # Languages
-            for lang in race.get('languages', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO RaceLanguage (race_index, language_index) VALUES (?, ?)",
-                    (race_index, lang['index'])
-                )
-            
-            # Traits (Features)
-            for trait in race.get('traits', []):
-                # Ensure feature exists in Feature table first
-                cursor.execute("INSERT OR IGNORE INTO Feature (\"index\", name) VALUES (?, ?)", (trait['index'], trait['name']))
-                cursor.execute(
-                    "INSERT OR IGNORE INTO RaceFeature (race_index, feature_index) VALUES (?, ?)",
-                    (race_index, trait['index'])
-                )
+def _grouped(conn, sql):
+    """{first column: [remaining columns...]} for the rows of `sql`, in order."""
+    groups = {}
+    for row in conn.execute(sql):
+        groups.setdefault(row[0], []).append(row[1:])
+    return groups
 
-            # Proficiency Choices (modeled after class choices)
-            for choice in race.get('starting_proficiency_options', []):
-                # --- START FIX ---
-                # Check if choice is a dictionary before trying to access keys
-                if not isinstance(choice, dict):
-                    print(f"  Skipping non-dict proficiency choice for race {race_index}: {choice}")
-                    continue
-                # --- END FIX ---
+def build_class_progression(conn):
+    """ClassProgression rows: one per ClassLevel, with features up to that level."""
+    features = _grouped(conn, """
+        SELECT LF.class_level_id, F."index", F.name
+        FROM ClassLevel_Feature AS LF JOIN Feature AS F ON F."index" = LF.feature_index
+        ORDER BY LF.class_level_id, F.name""")
+    levels = conn.execute("""
+        SELECT CL.id, CL.class_index, CL.level, C.name, C.hit_die, CL.prof_bonus, CL.ability_score_bonuses,
+               C.spellcasting_ability_index, S.cantrips_known, S.spells_known,
+               S.spell_slots_level_1, S.spell_slots_level_2, S.spell_slots_level_3,
+               S.spell_slots_level_4, S.spell_slots_level_5, S.spell_slots_level_6,
+               S.spell_slots_level_7, S.spell_slots_level_8, S.spell_slots_level_9,
+               CL.class_specific_json
+        FROM ClassLevel AS CL
+        JOIN Class AS C ON C."index" = CL.class_index
+        LEFT JOIN ClassLevel_Spellcasting AS S ON S.class_level_id = CL.id
+        ORDER BY CL.class_index, CL.level""").fetchall()
+    so_far, current_class = [], None
+    for level_id, class_index, level, *columns in levels:
+        if class_index != current_class:
+            so_far, current_class = [], class_index
+        gained = features.get(level_id, [])
+        so_far += [{'index': index, 'name': name, 'level': level} for index, name in gained]
+        yield 'ClassProgression', (class_index, level, *columns, _refs(gained), json.dumps(so_far))
 
-                cursor.execute(
-                    "INSERT INTO RaceProficiencyChoice (race_index, description, choose, type) VALUES (?, ?, ?, ?)",
-                    (race_index, choice.get('desc'), choice['choose'], choice['type'])
-                )
-                choice_id = cursor.lastrowid
-                choice_from = choice.get('from', {})
-                if not choice_from: continue
-                
-                options = choice_from.get('options', [])
-                for option in options:
-                    if isinstance(option, dict) and option.get('option_type') == 'reference':
-                        cursor.execute(
-                            "INSERT OR IGNORE INTO RaceProficiencyChoiceOption (choice_id, proficiency_index) VALUES (?, ?)",
-                            (choice_id, option['item']['index'])
-                        )
-                    elif isinstance(option, dict) and option.get('option_type') == 'choice':
-                        nested_choice_from = option.get('choice', {}).get('from', {})
-                        nested_options = nested_choice_from.get('options', [])
-                        for nested_option in nested_options:
-                             if isinstance(nested_option, dict) and nested_option.get('option_type') == 'reference':
-                                cursor.execute(
-                                    "INSERT OR IGNORE INTO RaceProficiencyChoiceOption (choice_id, proficiency_index) VALUES (?, ?)",
-                                    (choice_id, nested_option['item']['index'])
-                                )
-
-            # Language Choices
-            for choice in race.get('language_options', []):
-                # --- START FIX ---
-                # Check if choice is a dictionary before trying to access keys
-                if not isinstance(choice, dict):
-                    print(f"  Skipping non-dict language choice for race {race_index}: {choice}")
+def build_subclass_progression(conn):
+    """SubclassProgression rows: every level of the subclass's class, features up to that level."""
+    features = _grouped(conn, """
+        SELECT SL.subclass_index, SL.level, SL.subclass_specific_json, F."index", F.name
+        FROM SubclassLevel AS SL
+        LEFT JOIN SubclassLevel_Feature AS LF ON LF.subclass_level_id = SL.id
+        LEFT JOIN Feature AS F ON F."index" = LF.feature_index
+        ORDER BY SL.subclass_index, SL.level, F.name""")
+    class_levels = _grouped(conn, "SELECT DISTINCT class_index, level FROM ClassLevel ORDER BY class_index, level")
+    subclasses = conn.execute('SELECT "index", class_index, name FROM Subclass ORDER BY "index"').fetchall()
+    for subclass_index, class_index, name in subclasses:
+        entries = features.get(subclass_index, [])
+        so_far, specific = [], None
+        for (level,) in class_levels.get(class_index, []):
+            gained = []
+            for entry_level, entry_specific, feature_index, feature_name in entries:
+                if entry_level != level:
                     continue
-                # --- END FIX ---
+                specific = entry_specific
+                if feature_index is not None:
+                    gained.append((feature_index, feature_name))
+            so_far += [{'index': index, 'name': name, 'level': level} for index, name in gained]
+            yield 'SubclassProgression', (
+                subclass_index, level, class_index, name, specific, _refs(gained), json.dumps(so_far)
+            )
 
-                cursor.execute(
-                    "INSERT INTO RaceLanguageChoice (race_index, description, choose, type) VALUES (?, ?, ?, ?)",
-                    (race_index, choice.get('desc'), choice['choose'], choice['type'])
-                )
-                choice_id = cursor.lastrowid
-                choice_from = choice.get('from', {})
-                if not choice_from: continue
-                
-                options = choice_from.get('options', [])
-                for option in options:
-                     if isinstance(option, dict) and option.get('option_type') == 'reference':
-                        cursor.execute(
-                            "INSERT OR IGNORE INTO RaceLanguageChoiceOption (choice_id, language_index) VALUES (?, ?)",
-                            (choice_id, option['item']['index'])
-                        )
-                     elif isinstance(option, dict) and option.get('option_type') == 'choice':
-                        nested_choice_from = option.get('choice', {}).get('from', {})
-                        nested_options = nested_choice_from.get('options', [])
-                        for nested_option in nested_options:
-                             if isinstance(nested_option, dict) and nested_option.get('option_type') == 'reference':
-                                cursor.execute(
-                                    "INSERT OR IGNORE INTO RaceLanguageChoiceOption (choice_id, language_index) VALUES (?, ?)",
-                                    (choice_id, nested_option['item']['index'])
-                                )
-        
-        print("Race tables populated.")
+def build_race_summary(conn):
+    """RaceSummary rows: every race, then every subrace merged with its race."""
+    race_bonuses = _grouped(conn, "SELECT race_index, ability_score_index, bonus FROM RaceAbilityBonus ORDER BY race_index, ability_score_index")
+    race_profs = _grouped(conn, """SELECT R.race_index, P."index", P.name FROM RaceProficiency AS R
+                          JOIN Proficiency AS P ON P."index" = R.proficiency_index ORDER BY R.race_index, P.name""")
+    race_langs = _grouped(conn, """SELECT R.race_index, L."index", L.name FROM RaceLanguage AS R
+                          JOIN Language AS L ON L."index" = R.language_index ORDER BY R.race_index, L.name""")
+    race_traits = _grouped(conn, """SELECT R.race_index, F."index", F.name FROM RaceFeature AS R
+                           JOIN Feature AS F ON F."index" = R.feature_index ORDER BY R.race_index, F.name""")
+    sub_bonuses = _grouped(conn, "SELECT subrace_index, ability_score_index, bonus FROM SubraceAbilityBonus ORDER BY subrace_index, ability_score_index")
+    sub_profs = _grouped(conn, """SELECT S.subrace_index, P."index", P.name FROM SubraceProficiency AS S
+                         JOIN Proficiency AS P ON P."index" = S.proficiency_index ORDER BY S.subrace_index, P.name""")
+    sub_langs = _grouped(conn, """SELECT S.subrace_index, L."index", L.name FROM SubraceLanguage AS S
+                         JOIN Language AS L ON L."index" = S.language_index ORDER BY S.subrace_index, L.name""")
+    sub_traits = _grouped(conn, """SELECT S.subrace_index, F."index", F.name FROM SubraceFeature AS S
+                          JOIN Feature AS F ON F."index" = S.feature_index ORDER BY S.subrace_index, F.name""")
+
+    races = {}
+    for index, name, speed, size in conn.execute('SELECT "index", name, speed, size FROM Race ORDER BY "index"').fetchall():
+        races[index] = (speed, size)
+        bonuses = dict(race_bonuses.get(index, []))
+        yield 'RaceSummary', (
+            index, 'race', index, name, speed, size, json.dumps(bonuses),
+            _refs(race_profs.get(index, [])), _refs(race_langs.get(index, [])), _refs(race_traits.get(index, []))
+        )
+    for index, name, race_index in conn.execute('SELECT "index", name, race_index FROM Subrace ORDER BY "index"').fetchall():
+        speed, size = races.get(race_index, (None, None))
+        bonuses = dict(race_bonuses.get(race_index, []))
+        for ability, bonus in sub_bonuses.get(index, []):
+            bonuses[ability] = bonuses.get(ability, 0) + bonus
+        yield 'RaceSummary', (
+            index, 'subrace', race_index, name, speed, size, json.dumps(dict(sorted(bonuses.items()))),
+            _refs(race_profs.get(race_index, []) + sub_profs.get(index, [])),
+            _refs(race_langs.get(race_index, []) + sub_langs.get(index, [])),
+            _refs(race_traits.get(race_index, []) + sub_traits.get(index, [])),
+        )
+
+def build_spell_lists(conn):
+    """SpellList rows: per class and subclass, its spells of each level."""
+    for sql in ("""SELECT SC.class_index, S.level, S."index", S.name FROM SpellClass AS SC
+                   JOIN Spell AS S ON S."index" = SC.spell_index ORDER BY SC.class_index, S.level, S.name""",
+                """SELECT SS.subclass_index, S.level, S."index", S.name FROM SpellSubclass AS SS
+                   JOIN Spell AS S ON S."index" = SS.spell_index ORDER BY SS.subclass_index, S.level, S.name"""):
+        lists = {}
+        for owner, level, index, name in conn.execute(sql):
+            lists.setdefault((owner, level), []).append((index, name))
+        for (owner, level), spells in lists.items():
+            yield 'SpellList', (owner, level, _refs(spells))
+
+# Tables with entries saved character files refer to, by SrdRef kind
+SRD_REF_KINDS = (
+    ('class', 'Class'), ('subclass', 'Subclass'), ('race', 'Race'), ('subrace', 'Subrace'),
+    ('spell', 'Spell'), ('equipment', 'Equipment'), ('feat', 'Feat'), ('feature', 'Feature'),
+)
+# Bytes of the hash used as an SrdRef id. 40 bits keep collisions unlikely
+# even with tens of thousands of homebrew entries; a collision fails the build.
+SRD_ID_BYTES = 5
+
+def srd_id(kind, index):
+    """The stable SrdRef id of an SRD entry."""
+    digest = hashlib.blake2b(f"{kind}:{index}".encode('utf-8'), digest_size=SRD_ID_BYTES).digest()
+    return int.from_bytes(digest, 'little')
+
+def build_srd_refs(conn):
+    """SrdRef rows: an id for every class, race, spell, item, feat and feature."""
+    for kind, table in SRD_REF_KINDS:
+        for index, name in conn.execute(f'SELECT "index", name FROM "{table}" ORDER BY "index"').fetchall():
+            yield 'SrdRef', (srd_id(kind, index), kind, index, name)
+
+# Read-optimized tables: (table, stages its rows come from, row builder).
+# A table is rebuilt whenever one of its stages runs.
+READ_TABLES = (
+    ('ClassProgression', ('classes', 'levels'), build_class_progression),
+    ('SubclassProgression', ('classes', 'levels'), build_subclass_progression),
+    ('RaceSummary', ('reference', 'levels', 'races', 'subraces'), build_race_summary),
+    ('SpellList', ('classes', 'spells'), build_spell_lists),
+    ('SrdRef', ('classes', 'spells', 'equipment', 'levels', 'races', 'subraces', 'feats'), build_srd_refs),
+)
+
+def build_read_tables(cursor, stage_names, report):
+    """(Re)builds the read-optimized tables whose source stages ran."""
+    for table, sources, builder in READ_TABLES:
+        if not any(stage in stage_names for stage in sources):
+            continue
+        cursor.execute(f'DELETE FROM "{table}"')
+        # Builders read through their own cursor while rows are written here
+        for batch in iter_batches(builder(cursor.connection)):
+            write_rows(cursor, batch, report)
+
+def write_stage(cursor, stage, batches, report):
+    """Writes one stage's row batches ({table: [rows]}) into the database."""
+    name, label, _, _, _, _ = stage
+    print(f"Populating {label}...")
+    try:
+        for batch in batches:
+            write_rows(cursor, batch, report)
+        for statement in POST_STAGE_SQL.get(name, ()):
+            cursor.execute(statement)
+        print(f"{label[0].upper()}{label[1:]} populated.")
     except sqlite3.Error as e:
-        print(f"Error populating race tables: {e}", file=sys.stderr)
+        print(f"Error populating {label}: {e}", file=sys.stderr)
         raise
+
+def populate_stages(cursor, stages, file_paths, report):
+    """Parses and writes the given stages one after another in this process."""
+    for stage in stages:
+        parse = stage[2]
+        write_stage(cursor, stage, iter_batches(parse(file_paths, report)), report)
+
+# --- Parallel Parsing ---
+
+# Set in each pool worker by _init_parse_worker
+_worker_queues = None
+_worker_cancel = None
+
+def _init_parse_worker(queues, cancel):
+    global _worker_queues, _worker_cancel
+    _worker_queues = queues
+    _worker_cancel = cancel
+    # The writer drains every queue on success, so on failure a worker must
+    # not wait at exit for unread batches to be flushed
+    for queue in queues.values():
+        queue.cancel_join_thread()
+
+def _put_batch(queue, message):
+    """Puts a message on a bounded queue, giving up if the build was cancelled."""
+    while True:
+        try:
+            queue.put(message, timeout=0.1)
+            return True
+        except Full:
+            if _worker_cancel.is_set():
+                return False
+
+def _parse_stage_worker(stage_name, file_paths):
+    """
+    Runs in a pool worker: parses one stage and puts its row batches on the
+    stage's queue, followed by ('done', parse timings) or ('error', message).
+    The queue is bounded, so a worker never runs far ahead of the writer.
+    """
+    queue = _worker_queues[stage_name]
+    parse = next(stage[2] for stage in STAGES if stage[0] == stage_name)
+    report = BuildReport()
+    try:
+        for batch in iter_batches(parse(file_paths, report)):
+            if not _put_batch(queue, ('rows', batch)):
+                return
     except Exception as e:
-        print(f"A general error occurred in populate_race_tables: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc()
+        _put_batch(queue, ('error', f"{type(e).__name__}: {e}"))
+        return
+    _put_batch(queue, ('done', report.tables))
+
+def _queued_batches(stage, queue, report):
+    """Yields the batches a worker sends for `stage` and merges its parse timings."""
+    while True:
+        kind, payload = queue.get()
+        if kind == 'rows':
+            yield payload
+        elif kind == 'done':
+            for name, (rows, seconds) in payload.items():
+                report.record(name, rows, seconds)
+            return
+        else:
+            raise RuntimeError(f"Parsing {stage[1]} failed: {payload}")
+
+def populate_stages_parallel(cursor, stages, file_paths, report, jobs):
+    """
+    Parses the given stages in a pool of `jobs` processes while this process
+    writes their batches in stage (i.e. foreign key) order.
+    Stages are submitted in that same order and the pool starts them FIFO,
+    so the stage being written has always been started by a worker.
+    """
+    queues = {stage[0]: multiprocessing.Queue(maxsize=PARSE_QUEUE_BATCHES) for stage in stages}
+    cancel = multiprocessing.Event()
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_parse_worker, initargs=(queues, cancel))
+    try:
+        for stage in stages:
+            pool.submit(_parse_stage_worker, stage[0], file_paths)
+        for stage in stages:
+            write_stage(cursor, stage, _queued_batches(stage, queues[stage[0]], report), report)
+    except BaseException:
+        # Release workers blocked on a full queue before waiting for them
+        cancel.set()
         raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
-# ---------- NEW: Subrace Population Function ----------
-def populate_subrace_tables(cursor, file_paths):
-    """Populates all tables related to Subraces."""
-    print("Populating Subrace tables...")
-    subraces_data = load_json(file_paths['subraces'])
-    if not subraces_data:
-        print("  Skipping Subrace tables, file not loaded.")
-        return
+def default_jobs(file_paths, stage_names):
+    """
+    Number of parse processes to use when --jobs is not given: parallel
+    parsing only pays for its start-up cost on large module sets.
+    """
+    keys = {key for stage in STAGES if stage[0] in stage_names for key in stage[3]}
+    total_bytes = sum(os.path.getsize(file_paths[key]) for key in keys if os.path.exists(file_paths[key]))
+    if total_bytes < PARALLEL_MIN_BYTES:
+        return 1
+    return min(os.cpu_count() or 1, len(stage_names))
 
+# --- Incremental Builds ---
+
+def file_hash(path):
+    """SHA-256 of a file's contents, or None if it does not exist."""
+    digest = hashlib.sha256()
     try:
-        for subrace in subraces_data:
-            cursor.execute(
-                """INSERT OR IGNORE INTO Subrace ("index", name, race_index, description) 
-                   VALUES (?, ?, ?, ?)""",
-                (
-                    subrace['index'], subrace['name'], subrace['race']['index'],
-                    '\n'.join(subrace.get('desc', []))
-                )
-            )
-            subrace_index = subrace['index']
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
 
-            # Ability Bonuses
-            for bonus in subrace.get('ability_bonuses', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO SubraceAbilityBonus (subrace_index, ability_score_index, bonus) VALUES (?, ?, ?)",
-                    (subrace_index, bonus['ability_score']['index'], bonus['bonus'])
-                )
-            
-            # Starting Proficiencies
-            for prof in subrace.get('starting_proficiencies', []):
-                cursor.execute(
-                    "INSERT OR IGNORE INTO SubraceProficiency (subrace_index, proficiency_index) VALUES (?, ?)",
-                    (subrace_index, prof['index'])
-                )
+def current_hashes(file_paths):
+    """Returns {module key: sha256} for every module plus schema.sql."""
+    hashes = {key: file_hash(path) for key, path in file_paths.items()}
+    hashes[SCHEMA_META_KEY] = file_hash(SCHEMA_FILE)
+    return hashes
 
-            # Languages
-            for lang in subrace.get('languages', []):
-                cursor.execute(
-                    "INSERT OR IGWE IGNORE INTO SubraceLanguage (subrace_index, language_index) VALUES (?, ?)",
-                    (subrace_index, lang['index'])
-                )
-            
-            # Traits (Features) - Note: key is 'racial_traits' in subrace json
-            for trait in subrace.get('racial_traits', []): 
-                cursor.execute("INSERT OR IGNORE INTO Feature (\"index\", name) VALUES (?, ?)", (trait['index'], trait['name']))
-                cursor.execute(
-                    "INSERT OR IGNORE INTO SubraceFeature (subrace_index, feature_index) VALUES (?, ?)",
-                    (subrace_index, trait['index'])
-                )
+def stored_hashes(db_name):
+    """Reads the module hashes recorded by the last build, or None if unavailable."""
+    if not os.path.exists(db_name):
+        return None
+    conn = None
+    try:
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_name)}?mode=ro", uri=True)
+        return dict(conn.execute("SELECT module, sha256 FROM BuildMeta"))
+    except sqlite3.Error:
+        return None # Database predates BuildMeta
+    finally:
+        if conn:
+            conn.close()
 
-            # Language Choices
-            for choice in subrace.get('language_options', []):
-                # --- START FIX ---
-                # Check if choice is a dictionary before trying to access keys
-                if not isinstance(choice, dict):
-                    print(f"  Skipping non-dict language choice for subrace {subrace_index}: {choice}")
-                    continue
-                # --- END FIX ---
+def plan_stages(old_hashes, new_hashes):
+    """
+    Returns the names of the stages that must be re-run, in build order,
+    or None when a full rebuild is required.
+    """
+    if old_hashes is None or old_hashes.get(SCHEMA_META_KEY) != new_hashes[SCHEMA_META_KEY]:
+        return None
 
-                cursor.execute(
-                    "INSERT INTO SubraceLanguageChoice (subrace_index, description, choose, type) VALUES (?, ?, ?, ?)",
-                    (subrace_index, choice.get('desc'), choice['choose'], choice['type'])
-                )
-                choice_id = cursor.lastrowid
-                choice_from = choice.get('from', {})
-                if not choice_from: continue
-                
-                options = choice_from.get('options', [])
-                for option in options:
-                     if isinstance(option, dict) and option.get('option_type') == 'reference':
-                        cursor.execute(
-                            "INSERT OR IGNORE INTO SubraceLanguageChoiceOption (choice_id, language_index) VALUES (?, ?)",
-                            (choice_id, option['item']['index'])
-                        )
-                     elif isinstance(option, dict) and option.get('option_type') == 'choice':
-                        nested_choice_from = option.get('choice', {}).get('from', {})
-                        nested_options = nested_choice_from.get('options', [])
-                        for nested_option in nested_options:
-                             if isinstance(nested_option, dict) and nested_option.get('option_type') == 'reference':
-                                cursor.execute(
-                                    "INSERT OR IGNORE INTO SubraceLanguageChoiceOption (choice_id, language_index) VALUES (?, ?)",
-                                    (choice_id, nested_option['item']['index'])
-                                )
-        
-        print("Subrace tables populated.")
-    except sqlite3.Error as e:
-        print(f"Error populating subrace tables: {e}", file=sys.stderr)
-        raise
+    changed = {key for key, digest in new_hashes.items() if old_hashes.get(key) != digest}
+    dirty = []
+    for name, _, _, modules, _, depends_on in STAGES:
+        if changed.intersection(modules) or any(dep in dirty for dep in depends_on):
+            dirty.append(name)
+    return dirty
+
+def clear_stage_tables(cursor, stage_names, report):
+    """Empties the tables owned by the given stages, dependents first."""
+    for name, _, _, _, tables, _ in reversed(STAGES):
+        if name not in stage_names:
+            continue
+        for table in reversed(tables):
+            start = time.perf_counter()
+            cursor.execute(f'DELETE FROM "{table}"')
+            report.record(f"(clear) {table}", 0, time.perf_counter() - start)
+
+def record_hashes(cursor, hashes):
+    """Stores the module hashes this build was made from."""
+    cursor.execute("DELETE FROM BuildMeta")
+    cursor.executemany(
+        "INSERT INTO BuildMeta (module, sha256, built_at) VALUES (?, ?, datetime('now'))",
+        [(key, digest) for key, digest in hashes.items() if digest is not None]
+    )
 
 # --- Main Execution ---
 
-def main():
+def main(argv=None):
     """Main function to create and populate the database."""
-    
+    parser = argparse.ArgumentParser(description="Builds data/dnd_srd.db from the JSON files in data/modules.")
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="only re-ingest modules whose contents changed since the last build (and their dependents)"
+    )
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=None,
+        help="number of processes parsing modules in parallel (default: one per core for large module sets)"
+    )
+    args = parser.parse_args(argv)
+
     # This script assumes all these JSON files are in the 'modules' subdirectory.
-    file_paths = {
-        'classes': os.path.join(MODULES_DIR, '5e-SRD-Classes.json'),
-        'levels': os.path.join(MODULES_DIR, '5e-SRD-Levels.json'),
-        'subclasses': os.path.join(MODULES_DIR, '5e-SRD-Subclasses.json'),
-        'features': os.path.join(MODULES_DIR, '5e-SRD-Features.json'),
-        'spells': os.path.join(MODULES_DIR, '5e-SRD-Spells.json'),
-        'equipment': os.path.join(MODULES_DIR, '5e-SRD-Equipment.json'),
-        'proficiencies': os.path.join(MODULES_DIR, '5e-SRD-Proficiencies.json'),
-        'equipment_categories': os.path.join(MODULES_DIR, '5e-SRD-Equipment-Categories.json'),
-        'weapon_properties': os.path.join(MODULES_DIR, '5e-SRD-Weapon-Properties.json'),
-        'ability_scores': os.path.join(MODULES_DIR, '5e-SRD-Ability-Scores.json'),
-        'damage_types': os.path.join(MODULES_DIR, '5e-SRD-Damage-Types.json'),
-        'magic_schools': os.path.join(MODULES_DIR, '5e-SRD-Magic-Schools.json'),
-        # NEWLY ADDED
-        'races': os.path.join(MODULES_DIR, '5e-SRD-Races.json'),
-        'subraces': os.path.join(MODULES_DIR, '5e-SRD-Subraces.json'),
-        'languages': os.path.join(MODULES_DIR, '5e-SRD-Languages.json'),
-        'feats': os.path.join(MODULES_DIR, '5e-SRD-Feats.json'),
-    }
-    
-    # Check if DB already exists and delete it for a clean build
-    if os.path.exists(DB_NAME):
-        print(f"Removing old database '{DB_NAME}'...")
-        os.remove(DB_NAME)
+    file_paths = {key: os.path.join(MODULES_DIR, name) for key, name in MODULE_FILES.items()}
+    hashes = current_hashes(file_paths)
+
+    stages_to_run = None
+    if args.incremental:
+        stages_to_run = plan_stages(stored_hashes(DB_NAME), hashes)
+        if stages_to_run is None:
+            print("No usable previous build (or schema.sql changed); doing a full rebuild.")
+        elif not stages_to_run:
+            print(f"'{DB_NAME}' is up to date.")
+            return
+        else:
+            print(f"Incremental build, re-running stages: {', '.join(stages_to_run)}")
 
+    # Build into a temporary file; the old database is only replaced once
+    # the new one is complete.
+    build_path = DB_NAME + ".building"
+    if os.path.exists(build_path):
+        os.remove(build_path)
+
+    report = BuildReport()
     conn = None
     try:
-        conn, cursor = connect_db(DB_NAME)
-        
-        # Create all the tables
-        create_tables(cursor)
-        
-        # Populate tables in order of dependency
-        populate_reference_tables(cursor, file_paths) # Now includes Languages
-        
-        populate_class_tables(cursor, file_paths) 
-        
-        populate_subclass_details(cursor, file_paths) 
-        
-        populate_spell_tables(cursor, file_paths)
-        populate_equipment_tables(cursor, file_paths)
-        
-        populate_levels_tables(cursor, file_paths) # Populates Features, which Races depend on
-        
-        # NEWLY ADDED
-        populate_race_tables(cursor, file_paths)
-        populate_subrace_tables(cursor, file_paths)
-        populate_feat_table(cursor, file_paths)
-        
+        if stages_to_run is None:
+            stages_to_run = [stage[0] for stage in STAGES]
+            conn, cursor = connect_db(build_path)
+            # Create all the tables
+            create_tables(cursor)
+        else:
+            # Incremental: start from a copy of the current database
+            shutil.copyfile(DB_NAME, build_path)
+            conn, cursor = connect_db(build_path)
+            clear_stage_tables(cursor, stages_to_run, report)
+
+        # Populate tables in order of dependency, all in a single transaction
+        stages = [stage for stage in STAGES if stage[0] in stages_to_run]
+        jobs = args.jobs or default_jobs(file_paths, stages_to_run)
+        if jobs > 1:
+            print(f"Parsing modules with {jobs} processes.")
+            populate_stages_parallel(cursor, stages, file_paths, report, jobs)
+        else:
+            populate_stages(cursor, stages, file_paths, report)
+
+        build_search_index(cursor, stages_to_run, report)
+        build_read_tables(cursor, stages_to_run, report)
+        create_indexes(cursor, report)
+        check_foreign_keys(cursor)
+        record_hashes(cursor, hashes)
+
         # Save changes
         conn.commit()
+        conn.close()
+        conn = None
+        os.replace(build_path, DB_NAME)
         print(f"\nSuccessfully created and populated '{DB_NAME}'!")
+        report.print_report()
 
     except Exception as e:
         print(f"\nAn error occurred: {e}", file=sys.stderr)
         if conn:
-            conn.rollback()
-            print("Database transaction rolled back.")
+            conn.close()
+            conn = None
+        # Without a journal a rollback is not reliable; drop the partial build
+        if os.path.exists(build_path):
+            os.remove(build_path)
+            print("Partial build discarded; the previous database was left untouched.")
     finally:
         if conn:
             conn.close()
             print("Database connection closed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -377,4 +377,151 @@ CREATE TABLE IF NOT EXISTS SubraceLanguageChoiceOption (
     PRIMARY KEY (choice_id, language_index),
     FOREIGN KEY (choice_id) REFERENCES SubraceLanguageChoice(id),
     FOREIGN KEY (language_index) REFERENCES Language("index")
-);
\ No newline at end of file
+);
+
+-- Content hash of every module file used for the last build.
+-- populate.py --incremental compares these to decide what to re-ingest.
+CREATE TABLE IF NOT EXISTS BuildMeta (
+    module VARCHAR(100) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    built_at TEXT
+);
+
+-- Full-text search over spell, feature, feat and equipment text.
+-- kind is the viewer data type ('spells', ...) and item_index the row's "index".
+-- details holds secondary text (spell duration/school, damage types, ...).
+-- prefix= keeps short prefix queries ("fir*") fast.
+CREATE VIRTUAL TABLE IF NOT EXISTS SrdSearch USING fts5(
+    name,
+    description,
+    details,
+    kind UNINDEXED,
+    item_index UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+-- Read-optimized tables, rebuilt by populate.py from the tables above.
+-- Each answers one question the sheet asks with a single primary-key
+-- lookup instead of a multi-way join. *_json columns hold JSON arrays of
+-- {"index", "name"} objects unless noted otherwise.
+
+-- Everything a character of a class has at a level. all_features_json
+-- holds every class feature up to this level (objects also carry "level").
+CREATE TABLE IF NOT EXISTS ClassProgression (
+    class_index VARCHAR(100) NOT NULL,
+    level INT NOT NULL,
+    class_name VARCHAR(100) NOT NULL,
+    hit_die INT NOT NULL,
+    prof_bonus INT,
+    ability_score_bonuses INT,
+    spellcasting_ability_index VARCHAR(10),
+    cantrips_known INT,
+    spells_known INT,
+    spell_slots_level_1 INT,
+    spell_slots_level_2 INT,
+    spell_slots_level_3 INT,
+    spell_slots_level_4 INT,
+    spell_slots_level_5 INT,
+    spell_slots_level_6 INT,
+    spell_slots_level_7 INT,
+    spell_slots_level_8 INT,
+    spell_slots_level_9 INT,
+    class_specific_json TEXT,
+    features_json TEXT NOT NULL,
+    all_features_json TEXT NOT NULL,
+    PRIMARY KEY (class_index, level)
+) WITHOUT ROWID;
+
+-- What a subclass adds at every level of its class (1-20, not only the
+-- levels it gains something). subclass_specific_json is the most recent one.
+CREATE TABLE IF NOT EXISTS SubclassProgression (
+    subclass_index VARCHAR(100) NOT NULL,
+    level INT NOT NULL,
+    class_index VARCHAR(100) NOT NULL,
+    subclass_name VARCHAR(100) NOT NULL,
+    subclass_specific_json TEXT,
+    features_json TEXT NOT NULL,
+    all_features_json TEXT NOT NULL,
+    PRIMARY KEY (subclass_index, level)
+) WITHOUT ROWID;
+
+-- A race, or a subrace with its race's traits merged in, by race or subrace
+-- index. ability_bonuses_json is an object: {"dex": 2, "int": 1}.
+CREATE TABLE IF NOT EXISTS RaceSummary (
+    "index" VARCHAR(100) PRIMARY KEY,
+    kind VARCHAR(10) NOT NULL, -- 'race' or 'subrace'
+    race_index VARCHAR(100) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    speed INT,
+    size VARCHAR(50),
+    ability_bonuses_json TEXT NOT NULL,
+    proficiencies_json TEXT NOT NULL,
+    languages_json TEXT NOT NULL,
+    traits_json TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Stable integer IDs for SRD entries, used by saved character files
+-- (src/charfile.py). id is a hash of kind and "index" (populate.srd_id), so
+-- it stays the same across rebuilds and module changes.
+CREATE TABLE IF NOT EXISTS SrdRef (
+    id INTEGER PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL, -- 'class', 'subclass', 'race', 'subrace', 'spell', 'equipment', 'feat', 'feature'
+    "index" VARCHAR(100) NOT NULL,
+    name VARCHAR(100) NOT NULL
+);
+
+-- Spells of one level a class or subclass (owner_index) can learn, by name.
+CREATE TABLE IF NOT EXISTS SpellList (
+    owner_index VARCHAR(100) NOT NULL,
+    spell_level INT NOT NULL,
+    spells_json TEXT NOT NULL,
+    PRIMARY KEY (owner_index, spell_level)
+) WITHOUT ROWID;
+
+-- Secondary indexes. populate.py creates these after the bulk load.
+-- src/query_audit.py checks that the app's queries actually use them.
+
+-- Catalog orderings used by the viewers. They also hold "index", so the
+-- viewer's (index, name) pages are read from the index alone.
+CREATE INDEX IF NOT EXISTS idx_class_name ON Class(name, "index");
+CREATE INDEX IF NOT EXISTS idx_spell_level_name ON Spell(level, name, "index");
+CREATE INDEX IF NOT EXISTS idx_equipment_category_name ON Equipment(equipment_category_index, name, "index");
+CREATE INDEX IF NOT EXISTS idx_feature_name ON Feature(name, "index");
+CREATE INDEX IF NOT EXISTS idx_feat_name ON Feat(name, "index");
+CREATE INDEX IF NOT EXISTS idx_race_name ON Race(name, "index");
+CREATE INDEX IF NOT EXISTS idx_subrace_race_name ON Subrace(race_index, name, "index");
+
+-- Character files resolve names to SrdRef ids (and back) one kind at a time
+CREATE INDEX IF NOT EXISTS idx_srdref_kind ON SrdRef(kind, "index", name, id);
+
+-- Parent lookups on child tables
+CREATE INDEX IF NOT EXISTS idx_subclass_class ON Subclass(class_index, name);
+CREATE INDEX IF NOT EXISTS idx_classlevel_class_level ON ClassLevel(class_index, level);
+CREATE INDEX IF NOT EXISTS idx_subclasslevel_subclass_level ON SubclassLevel(subclass_index, level);
+CREATE INDEX IF NOT EXISTS idx_classproficiencychoice_class ON ClassProficiencyChoice(class_index);
+CREATE INDEX IF NOT EXISTS idx_raceproficiencychoice_race ON RaceProficiencyChoice(race_index);
+CREATE INDEX IF NOT EXISTS idx_racelanguagechoice_race ON RaceLanguageChoice(race_index);
+CREATE INDEX IF NOT EXISTS idx_subracelanguagechoice_subrace ON SubraceLanguageChoice(subrace_index);
+
+-- Junction tables looked up by their second key (the primary key covers the first).
+-- Both columns are in the index, so these lookups never touch the table.
+CREATE INDEX IF NOT EXISTS idx_classproficiency_proficiency ON ClassProficiency(proficiency_index, class_index);
+CREATE INDEX IF NOT EXISTS idx_classproficiencychoiceoption_proficiency ON ClassProficiencyChoiceOption(proficiency_index, choice_id);
+CREATE INDEX IF NOT EXISTS idx_spellclass_class ON SpellClass(class_index, spell_index);
+CREATE INDEX IF NOT EXISTS idx_spellsubclass_subclass ON SpellSubclass(subclass_index, spell_index);
+CREATE INDEX IF NOT EXISTS idx_equipmentproperty_property ON EquipmentProperty(property_index, equipment_index);
+CREATE INDEX IF NOT EXISTS idx_equipmentcontent_content ON EquipmentContent(content_equipment_index, pack_equipment_index);
+CREATE INDEX IF NOT EXISTS idx_classlevel_feature_feature ON ClassLevel_Feature(feature_index, class_level_id);
+CREATE INDEX IF NOT EXISTS idx_subclasslevel_feature_feature ON SubclassLevel_Feature(feature_index, subclass_level_id);
+CREATE INDEX IF NOT EXISTS idx_raceabilitybonus_ability ON RaceAbilityBonus(ability_score_index, race_index);
+CREATE INDEX IF NOT EXISTS idx_raceproficiency_proficiency ON RaceProficiency(proficiency_index, race_index);
+CREATE INDEX IF NOT EXISTS idx_racelanguage_language ON RaceLanguage(language_index, race_index);
+CREATE INDEX IF NOT EXISTS idx_racefeature_feature ON RaceFeature(feature_index, race_index);
+CREATE INDEX IF NOT EXISTS idx_raceproficiencychoiceoption_proficiency ON RaceProficiencyChoiceOption(proficiency_index, choice_id);
+CREATE INDEX IF NOT EXISTS idx_racelanguagechoiceoption_language ON RaceLanguageChoiceOption(language_index, choice_id);
+CREATE INDEX IF NOT EXISTS idx_subraceabilitybonus_ability ON SubraceAbilityBonus(ability_score_index, subrace_index);
+CREATE INDEX IF NOT EXISTS idx_subraceproficiency_proficiency ON SubraceProficiency(proficiency_index, subrace_index);
+CREATE INDEX IF NOT EXISTS idx_subracelanguage_language ON SubraceLanguage(language_index, subrace_index);
+CREATE INDEX IF NOT EXISTS idx_subracefeature_feature ON SubraceFeature(feature_index, subrace_index);
+CREATE INDEX IF NOT EXISTS idx_subracelanguagechoiceoption_language ON SubraceLanguageChoiceOption(language_index, choice_id);
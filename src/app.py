@@ -13,15 +13,24 @@
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 import sys
-import random
 import os
-import sqlite3
 import json
+from collections import OrderedDict
 
 # --- Import modularized components ---
+import dice
+from database import SrdDatabase, SEARCH_KINDS
+from progression import ProgressionEngine
+import charfile
+from character import Character
+from derived import ArmorTable, DerivedStats
+from journal import Journal
+from charfile import SPELL_LEVELS
 from components.styles import DARK_MODE
 # Import InventoryList (from components.widgets)
 from components.widgets import InventoryList 
+from components.catalog import CatalogModel, HtmlCache, detail_key
+from components.binding import CharacterBinder
 # Import panel builders
 from panels.left import populate_left_panel
 from panels.center import populate_center_panel
@@ -29,17 +38,32 @@ from panels.right import populate_right_panel
 
 # --- (REMOVED) DraggableTreeWidget class ---
 
+# Serve SRD lookups from an in-memory copy of dnd_srd.db (loaded on first
+# use) instead of reading the file. Set DNDICE_SRD_IN_MEMORY=0 to disable.
+SRD_IN_MEMORY = os.environ.get("DNDICE_SRD_IN_MEMORY", "1") != "0"
+
+# Catalog rows kept loaded across all viewer windows. Closed (hidden) viewers
+# are kept warm for instant re-opening until this is exceeded, then released
+# least recently used first.
+VIEWER_ROW_BUDGET = 20000
+# Quiet time after the last keystroke before the viewer's name filter runs
+FILTER_DELAY_MS = 120
+# Unsaved edits are journaled here for crash recovery, in one session directory
+# per running window (see journal.py). Set DNDICE_AUTOSAVE_DIR to move it.
+AUTOSAVE_DIR = os.environ.get(
+    "DNDICE_AUTOSAVE_DIR", os.path.join(os.path.expanduser("~"), ".dndice", "autosave")
+)
+
 
 # ---------- REVISED: Database Viewer Window (Tree/Details + Add Button) ----------
 class DbViewerWindow(QtWidgets.QWidget):
     """
-    A new window for displaying database query results in a
+    A window for displaying database query results in a
     tree/details view, with an "Add to Sheet" button.
+    MainWindow keeps one per data type; closing it only hides it.
     """
-    def __init__(self, title, data, data_type, parent_list, parent_main):
+    def __init__(self, title, model, data_type, parent_main):
         super().__init__()
-        self.parent_list = parent_list
-        self.parent_list.append(self)
         self.parent_main = parent_main # Reference to MainWindow
         self.data_type = data_type
         self.selected_item_data = None # Store the currently clicked item
@@ -55,12 +79,72 @@ class DbViewerWindow(QtWidgets.QWidget):
         splitter = QtWidgets.QSplitter(QtCore.Qt.Orientation.Horizontal)
         splitter.setObjectName("viewerSplitter")
         
-        # Left: Tree widget for grouped items
-        self.tree = QtWidgets.QTreeWidget()
+        # Left: Tree view over the lazily loaded catalog model
+        self.model = model
+        self.model.setParent(self)
+        self.tree = QtWidgets.QTreeView()
         self.tree.setObjectName("viewerTree")
         self.tree.setHeaderHidden(True)
-        self._populate_tree(data)
-        self.tree.itemClicked.connect(self.on_item_clicked)
+        self.tree.setUniformRowHeights(True) # Lets the view skip measuring every row
+        self.tree.setModel(self.model)
+        if data_type in ('races', 'classes'):
+            # Show every race's subraces (class's subclasses), as rows arrive
+            self.model.rowsInserted.connect(self.on_rows_inserted)
+        self.model.loaded.connect(self.on_loaded)
+        self.model.load_failed.connect(self.on_load_failed)
+        self.tree.clicked.connect(self.on_item_clicked)
+
+        # ---------- NEW: Full-text search (spells, features, feats, equipment) ----------
+        left_panel_widget = QtWidgets.QWidget()
+        left_layout = QtWidgets.QVBoxLayout()
+        left_layout.setContentsMargins(0, 0, 0, 0)
+        left_layout.setSpacing(6)
+        left_panel_widget.setLayout(left_layout)
+
+        # ---------- NEW: Name filter (narrows the tree as you type) ----------
+        self.filter_box = QtWidgets.QLineEdit()
+        self.filter_box.setPlaceholderText("Filter by name")
+        self.filter_box.setClearButtonEnabled(True)
+        self.filter_box.textEdited.connect(self.on_filter_edited)
+        self.filter_box.textChanged.connect(self.on_filter_changed)
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.on_filter)
+        self.model.names_ready.connect(self.on_filter)
+        left_layout.addWidget(self.filter_box)
+
+        self.search_box = None
+        self.search_status = None
+        if data_type in SEARCH_KINDS:
+            self.search_box = QtWidgets.QLineEdit()
+            self.search_box.setPlaceholderText("Search text, e.g. fire damage (Enter)")
+            self.search_box.setClearButtonEnabled(True)
+            self.search_box.returnPressed.connect(self.on_search)
+            self.search_status = QtWidgets.QLabel("")
+            left_layout.addWidget(self.search_box)
+            left_layout.addWidget(self.search_status)
+
+        # ---------- NEW: Facets (spells, equipment) with live counts ----------
+        self.facet_tree = None
+        self.facet_items = {} # (column, value) -> checkable QTreeWidgetItem
+        facets = self.model.spec.get('facets')
+        if facets:
+            self.facet_tree = QtWidgets.QTreeWidget()
+            self.facet_tree.setObjectName("facetTree")
+            self.facet_tree.setHeaderHidden(True)
+            self.facet_groups = {}
+            for column, label, _, _ in facets:
+                self.facet_groups[column] = QtWidgets.QTreeWidgetItem(self.facet_tree, [label])
+            self.facet_tree.itemChanged.connect(self.on_facet_changed)
+            lists = QtWidgets.QSplitter(QtCore.Qt.Orientation.Vertical)
+            lists.addWidget(self.facet_tree)
+            lists.addWidget(self.tree)
+            lists.setSizes([150, 450])
+            left_layout.addWidget(lists)
+            self.model.load_names() # Counts show up once the facets are indexed
+        else:
+            left_layout.addWidget(self.tree)
         
         # --- Right Panel (Details + Button) ---
         right_panel_widget = QtWidgets.QWidget()
@@ -84,66 +168,139 @@ class DbViewerWindow(QtWidgets.QWidget):
         right_layout.addWidget(self.add_button)
         # --- End Right Panel ---
 
-        splitter.addWidget(self.tree)
+        splitter.addWidget(left_panel_widget)
         splitter.addWidget(right_panel_widget)
         splitter.setSizes([250, 550]) # Initial size split
         
         layout.addWidget(splitter)
         self.setLayout(layout)
 
-    def _populate_tree(self, data_dicts):
-        """Fills the QTreeWidget with grouped items."""
-        self.tree.clear()
-        
-        if self.data_type == 'spells':
-            groups = {}
-            for spell in data_dicts:
-                groups.setdefault(spell['level'], []).append(spell)
-            
-            for level in sorted(groups.keys()):
-                level_str = "Cantrips" if level == 0 else f"{level}-Level Spells"
-                level_item = QtWidgets.QTreeWidgetItem(self.tree, [level_str])
-                level_item.setFlags(level_item.flags() & ~QtCore.Qt.ItemFlag.ItemIsSelectable)
-                for spell in groups[level]:
-                    spell_item = QtWidgets.QTreeWidgetItem(level_item, [spell['name']])
-                    spell_item.setData(0, QtCore.Qt.ItemDataRole.UserRole, spell)
-        
-        elif self.data_type == 'equipment':
-            groups = {}
-            for item in data_dicts:
-                cat = item['equipment_category_index']
-                if not cat: cat = "other"
-                groups.setdefault(cat, []).append(item)
-            
-            for cat in sorted(groups.keys()):
-                cat_item = QtWidgets.QTreeWidgetItem(self.tree, [cat.replace('-', ' ').title()])
-                cat_item.setFlags(cat_item.flags() & ~QtCore.Qt.ItemFlag.ItemIsSelectable)
-                for item in groups[cat]:
-                    item_widget = QtWidgets.QTreeWidgetItem(cat_item, [item['name']])
-                    item_widget.setData(0, QtCore.Qt.ItemDataRole.UserRole, item)
-
-        elif self.data_type == 'races':
-            current_race_item = None
-            for row in data_dicts:
-                if current_race_item is None or current_race_item.text(0) != row['name']:
-                    current_race_item = QtWidgets.QTreeWidgetItem(self.tree, [row['name']])
-                    current_race_item.setData(0, QtCore.Qt.ItemDataRole.UserRole, (row, 'race'))
-                
-                if row['subrace_name']:
-                    subrace_item = QtWidgets.QTreeWidgetItem(current_race_item, [row['subrace_name']])
-                    subrace_item.setData(0, QtCore.Qt.ItemDataRole.UserRole, (row, 'subrace'))
-            self.tree.expandAll()
-            
-        elif self.data_type in ['features', 'feats', 'classes']:
-            # Flat list, no groups
-            for item in data_dicts:
-                tree_item = QtWidgets.QTreeWidgetItem(self.tree, [item['name']])
-                tree_item.setData(0, QtCore.Qt.ItemDataRole.UserRole, item)
-    
+    @QtCore.pyqtSlot()
+    def on_loaded(self):
+        """The catalog's top level has arrived from the loader thread."""
+        if not self.model.rowCount() and self.model.columns == 1:
+            QtWidgets.QMessageBox.information(self, "Query Result", "No results found for this query.")
+            self.parent_main.release_viewer(self)
+
+    @QtCore.pyqtSlot(str)
+    def on_load_failed(self, error):
+        QtWidgets.QMessageBox.critical(self, "Database Error", error)
+        self.parent_main.release_viewer(self) # Try again from scratch next time
+
+    @QtCore.pyqtSlot(QtCore.QModelIndex, int, int)
+    def on_rows_inserted(self, parent, first, last):
+        if not parent.isValid():
+            for row in range(first, last + 1):
+                self.tree.expand(self.model.index(row, 0))
+
+    def closeEvent(self, event):
+        """
+        Stops any catalog rows still loading for this window. The window is
+        only hidden; MainWindow re-shows it or releases it.
+        """
+        self.model.cancel()
+        super().closeEvent(event)
+        self.parent_main.on_viewer_closed(self)
+
+    @QtCore.pyqtSlot(str)
+    def on_filter_edited(self, text):
+        """Typing in the filter box: start indexing names on first use."""
+        self.model.load_names()
+
+    @QtCore.pyqtSlot(str)
+    def on_filter_changed(self, text):
+        """Restarts the debounce timer; the tree is filtered once typing pauses."""
+        self.filter_timer.start()
+
     @QtCore.pyqtSlot(QtWidgets.QTreeWidgetItem, int)
-    def on_item_clicked(self, item, column):
+    def on_facet_changed(self, item, column):
+        """A facet value was (un)checked: filter right away."""
+        self.filter_timer.stop()
+        self.on_filter()
+
+    def selected_facets(self):
+        """{column: set of values} for the checked facet values."""
+        selected = {}
+        for (column, value), item in self.facet_items.items():
+            if item.checkState(0) == QtCore.Qt.CheckState.Checked:
+                selected.setdefault(column, set()).add(value)
+        return selected
+
+    def _update_facets(self):
+        """Shows every facet value with its live count; values with none are disabled."""
+        if self.facet_tree is None:
+            return
+        self.facet_tree.blockSignals(True)
+        for column, _, value_label, _ in self.model.spec['facets']:
+            for value, count in self.model.facet_counts.get(column, {}).items():
+                item = self.facet_items.get((column, value))
+                if item is None:
+                    item = QtWidgets.QTreeWidgetItem(self.facet_groups[column])
+                    item.setFlags(QtCore.Qt.ItemFlag.ItemIsEnabled | QtCore.Qt.ItemFlag.ItemIsUserCheckable)
+                    item.setCheckState(0, QtCore.Qt.CheckState.Unchecked)
+                    self.facet_items[(column, value)] = item
+                checked = item.checkState(0) == QtCore.Qt.CheckState.Checked
+                item.setText(0, f"{value_label(value)} ({count})")
+                item.setDisabled(count == 0 and not checked)
+        self.facet_tree.blockSignals(False)
+
+    def _clear_facets(self):
+        self.facet_tree.blockSignals(True)
+        for item in self.facet_items.values():
+            item.setCheckState(0, QtCore.Qt.CheckState.Unchecked)
+        self.facet_tree.blockSignals(False)
+
+    @QtCore.pyqtSlot()
+    def on_filter(self):
+        """Narrows the tree to the names containing the filter text and the checked facets."""
+        text = self.filter_box.text().strip()
+        selected = self.selected_facets()
+        if not text and not selected and not self.model.filtered and self.facet_tree is None:
+            return
+        if self.model.filter(text, selected) is None:
+            self.model.load_names() # Filtered again on names_ready
+            return
+        self._update_facets()
+        if not text and not selected:
+            return
+        if self.search_box is not None and self.search_box.text():
+            self.search_box.clear() # The filter replaces any search results
+            self.search_status.setText("")
+        for row in range(self.model.rowCount()):
+            self.tree.expand(self.model.index(row, 0))
+
+    @QtCore.pyqtSlot()
+    def on_search(self):
+        """Runs a full-text search; an empty box brings back the full list."""
+        self.filter_timer.stop()
+        self.filter_box.blockSignals(True)
+        self.filter_box.clear()
+        self.filter_box.blockSignals(False)
+        if self.facet_tree is not None:
+            self._clear_facets()
+        text = self.search_box.text().strip()
+        if not text:
+            self.search_status.setText("")
+            self.model.show_catalog()
+            self.model.filter("") # Just brings the facet counts up to date
+            self._update_facets()
+            return
+
+        _, hits, error = self.parent_main.db.search(text, kind=self.data_type)
+        if error:
+            self.search_status.setText(error)
+            return
+        self.search_status.setText(f"{len(hits)} match(es), best first")
+        self.model.show_hits(hits)
+        self.tree.resizeColumnToContents(0)
+        if self.facet_tree is not None:
+            self.model.filter("")
+            self._update_facets()
+
+    @QtCore.pyqtSlot(QtCore.QModelIndex)
+    def on_item_clicked(self, index):
         """When an item is clicked, show its details and enable the Add button."""
-        data = item.data(0, QtCore.Qt.ItemDataRole.UserRole)
+        data = index.siblingAtColumn(0).data(QtCore.Qt.ItemDataRole.UserRole)
         
         if not data:
             # It's a category item
@@ -151,32 +308,61 @@ class DbViewerWindow(QtWidgets.QWidget):
             self.selected_item_data = None
             self.add_button.setEnabled(False)
             return
-        
-        # It's a data item
+
+        # Rendered details are shared by all viewers; only render on a miss
+        key = detail_key(self.data_type, data)
+        html = self.parent_main.detail_html.get(key)
+        if html is None:
+            # The tree only holds index/name; load the full record to render it
+            record = self.model.record(data)
+            if record is None:
+                self.details.setPlainText(self.model.error or "Could not load this item.")
+                self.selected_item_data = None
+                self.add_button.setEnabled(False)
+                return
+            html = self._build_html_display(record)
+            self.parent_main.detail_html.put(key, html)
+
+        # It's a data item (the light row has the name Add to Sheet needs)
         self.selected_item_data = data
         self.add_button.setEnabled(True)
-        self._build_html_display(data)
+        self.details.setHtml(html)
 
     def _build_html_display(self, data):
-        """Builds an HTML string to display in the details panel."""
-        html = ""
+        """Builds the HTML string to display in the details panel."""
+        parts = []
         
+        # Classes are (row_data, 'class'/'subclass'); a class shows as before
+        if isinstance(data, tuple) and data[1] == 'class':
+            data = data[0]
+
         # Data format for races is a tuple: (row_data, 'race'/'subrace')
         if isinstance(data, tuple):
             data_dict, item_type = data
             if item_type == 'race':
-                html = f"<h1>{data_dict['name']}</h1>"
-                html += f"<i>Race</i><hr>"
-                html += f"<b>Speed:</b> {data_dict['speed']} ft.<br>"
-                html += f"<b>Size:</b> {data_dict['size']}<br>"
-                html += f"<b>Alignment:</b> {data_dict.get('alignment', 'Varies')}<br><br>"
-                html += f"<b>Age:</b> {data_dict.get('age', 'Varies')}<br><br>"
-                html += data_dict.get('language_desc', '').replace('\n', '<br>')
+                parts += [
+                    f"<h1>{data_dict['name']}</h1>",
+                    "<i>Race</i><hr>",
+                    f"<b>Speed:</b> {data_dict['speed']} ft.<br>",
+                    f"<b>Size:</b> {data_dict['size']}<br>",
+                    f"<b>Alignment:</b> {data_dict.get('alignment', 'Varies')}<br><br>",
+                    f"<b>Age:</b> {data_dict.get('age', 'Varies')}<br><br>",
+                    data_dict.get('language_desc', '').replace('\n', '<br>'),
+                ]
             
             elif item_type == 'subrace':
-                html = f"<h1>{data_dict['subrace_name']}</h1>"
-                html += f"<i>Subrace of {data_dict['name']}</i><hr>"
-                html += data_dict.get('subrace_desc', '').replace('\n', '<br>')
+                parts += [
+                    f"<h1>{data_dict['subrace_name']}</h1>",
+                    f"<i>Subrace of {data_dict['name']}</i><hr>",
+                    data_dict.get('subrace_desc', '').replace('\n', '<br>'),
+                ]
+
+            elif item_type == 'subclass':
+                parts += [
+                    f"<h1>{data_dict['subclass_name']}</h1>",
+                    f"<i>{data_dict.get('subclass_flavor') or 'Subclass'} of the {data_dict['name']}</i><hr>",
+                    (data_dict.get('subclass_desc') or '').replace('\n', '<br>'),
+                ]
         
         # All other data types are just a single dictionary
         elif isinstance(data, dict):
@@ -184,41 +370,44 @@ class DbViewerWindow(QtWidgets.QWidget):
             desc = data.get('description', data.get('desc', 'No description available.'))
             if not desc: desc = "No description."
 
-            html = f"<h1>{name}</h1><hr>"
+            parts.append(f"<h1>{name}</h1><hr>")
             
             if self.data_type == 'spells':
                 level_str = "Cantrip" if data['level'] == 0 else f"Level {data['level']}"
                 school = data.get('school_index', 'Unknown School')
-                html += f"<i>{school.title()} {level_str}</i><br><br>"
-                html += f"<b>Casting Time:</b> {data.get('casting_time', 'N/A')}<br>"
-                html += f"<b>Range:</b> {data.get('range', 'N/A')}<br>"
-                html += f"<b>Components:</b> {",".join(data.get('components', []))}<br>"
-                html += f"<b>Duration:</b> {data.get('duration', 'N/A')}"
+                parts += [
+                    f"<i>{school.title()} {level_str}</i><br><br>",
+                    f"<b>Casting Time:</b> {data.get('casting_time', 'N/A')}<br>",
+                    f"<b>Range:</b> {data.get('range', 'N/A')}<br>",
+                    f"<b>Components:</b> {",".join(data.get('components', []))}<br>",
+                    f"<b>Duration:</b> {data.get('duration', 'N/A')}",
+                ]
                 if data.get('concentration'):
-                    html += " (Concentration)"
-                html += "<br><br>"
-                html += desc.replace('\n', '<br>')
+                    parts.append(" (Concentration)")
+                parts.append("<br><br>")
+                parts.append(desc.replace('\n', '<br>'))
                 
                 if data.get('higher_level_desc'):
-                    html += f"<br><br><b>At Higher Levels:</b><br>{data['higher_level_desc'].replace('\n', '<br>')}"
+                    parts.append(f"<br><br><b>At Higher Levels:</b><br>{data['higher_level_desc'].replace('\n', '<br>')}")
 
             elif self.data_type == 'equipment':
-                html += f"<b>Category:</b> {data.get('equipment_category_index', 'N/A')}<br>"
-                html += f"<b>Cost:</b> {data.get('cost_quantity', 0)} {data.get('cost_unit', 'gp')}<br>"
-                html += f"<b>Weight:</b> {data.get('weight', 0)} lb.<br><br>"
-                
+                parts += [
+                    f"<b>Category:</b> {data.get('equipment_category_index', 'N/A')}<br>",
+                    f"<b>Cost:</b> {data.get('cost_quantity', 0)} {data.get('cost_unit', 'gp')}<br>",
+                    f"<b>Weight:</b> {data.get('weight', 0)} lb.<br><br>",
+                ]
                 if data.get('damage_dice'):
-                     html += f"<b>Damage:</b> {data.get('damage_dice')} {data.get('damage_type_index', '')}<br>"
+                     parts.append(f"<b>Damage:</b> {data.get('damage_dice')} {data.get('damage_type_index', '')}<br>")
                 if data.get('armor_class_base'):
-                     html += f"<b>Base AC:</b> {data.get('armor_class_base')}<br>"
+                     parts.append(f"<b>Base AC:</b> {data.get('armor_class_base')}<br>")
                 
-                html += "<br>" + desc.replace('\n', '<br>')
+                parts.append("<br>" + desc.replace('\n', '<br>'))
             
             elif self.data_type == 'classes':
-                html += f"<b>Hit Die:</b> d{data.get('hit_die', 'N/A')}<br>"
+                parts.append(f"<b>Hit Die:</b> d{data.get('hit_die', 'N/A')}<br>")
                 if data.get('spellcasting_ability_index'):
-                    html += f"<b>Spellcasting:</b> {data.get('spellcasting_ability_index').upper()}<br>"
-                html += "<br>" + desc.replace('\n', '<br>')
+                    parts.append(f"<b>Spellcasting:</b> {data.get('spellcasting_ability_index').upper()}<br>")
+                parts.append("<br>" + desc.replace('\n', '<br>'))
                 
             elif self.data_type in ['features', 'feats']:
                 if self.data_type == 'feats' and data.get('prerequisites_json'):
@@ -229,13 +418,13 @@ class DbViewerWindow(QtWidgets.QWidget):
                             if p.get('ability_score_index'):
                                 prereq_strs.append(f"{p['ability_score_index'].upper()} {p['minimum_score']}")
                         if prereq_strs:
-                            html += f"<b>Prerequisites:</b> {', '.join(prereq_strs)}<br><br>"
+                            parts.append(f"<b>Prerequisites:</b> {', '.join(prereq_strs)}<br><br>")
                     except json.JSONDecodeError:
                         pass # Ignore invalid JSON
 
-                html += desc.replace('\n', '<br>')
+                parts.append(desc.replace('\n', '<br>'))
         
-        self.details.setHtml(html)
+        return "".join(parts)
 
     @QtCore.pyqtSlot()
     def on_add_to_sheet_clicked(self):
@@ -251,6 +440,10 @@ class DbViewerWindow(QtWidgets.QWidget):
                 item_name = data_dict.get('name')
             elif item_type == 'subrace':
                 item_name = data_dict.get('subrace_name')
+            elif item_type == 'class':
+                item_name = data_dict.get('name')
+            elif item_type == 'subclass':
+                item_name = data_dict.get('subclass_name')
         elif isinstance(self.selected_item_data, dict):
             item_name = self.selected_item_data.get('name')
             
@@ -259,34 +452,22 @@ class DbViewerWindow(QtWidgets.QWidget):
 
         # Add the item to the correct list on the main window
         try:
-            target_list = None
-            
-            if self.data_type == 'spells':
-                target_list = self.parent_main.spell_info
-            elif self.data_type == 'equipment':
-                target_list = self.parent_main.inventory
-            elif self.data_type == 'feats':
-                target_list = self.parent_main.feats_txt
-            elif self.data_type == 'features':
-                target_list = self.parent_main.feature_txt
+            # Sheet list each catalog adds to
+            target_field = {
+                'spells': 'spells', 'equipment': 'inventory',
+                'feats': 'feats', 'features': 'features',
+            }.get(self.data_type)
+
+            if target_field:
+                self.parent_main.character.add(target_field, item_name)
             elif self.data_type == 'classes':
-                self.parent_main.class_edit.setText(item_name)
+                data_dict, item_type = self.selected_item_data
+                if item_type == 'subclass': # Its class too, named as the class
+                    self.parent_main.set_class(data_dict['index'], data_dict['name'], data_dict['subclass_index'])
+                else:
+                    self.parent_main.set_class(data_dict['index'], item_name)
             elif self.data_type == 'races':
-                self.parent_main.race_edit.setText(item_name)
-            
-            if target_list and isinstance(target_list, QtWidgets.QListWidget):
-                
-                # --- NEW: Check for and remove placeholder ---
-                if target_list.count() == 1:
-                    first_item = target_list.item(0)
-                    # Check if the item is one of our placeholders
-                    if first_item.flags() == QtCore.Qt.ItemFlag.NoItemFlags:
-                        target_list.takeItem(0) # Remove placeholder
-                # --- END NEW ---
-                
-                # Add if not already in the list
-                if not target_list.findItems(item_name, QtCore.Qt.MatchFlag.MatchExactly):
-                    target_list.addItem(QtWidgets.QListWidgetItem(item_name))
+                self.parent_main.character.set('race', item_name)
                 
             # --- Switch-tab logic (this part is also required) ---
             target_page = None
@@ -313,13 +494,34 @@ class DbViewerWindow(QtWidgets.QWidget):
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
-        self.setWindowTitle("Character Sheet — Draft")
+        self.setWindowTitle("Character Sheet — Draft[*]")
         self.resize(1200, 800)
         self.setStyleSheet(DARK_MODE)
 
         # ---------- NEW: Database state ----------
         self.db_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'dnd_srd.db')
-        self.open_viewers = [] # Holds references to open DB windows
+        self.db = SrdDatabase(self.db_path, in_memory=SRD_IN_MEMORY) # Opened on first query, reused after
+        self.viewers = OrderedDict() # data_type -> DbViewerWindow, least recently shown first
+        self.detail_html = HtmlCache() # Rendered item details, shared by all viewers
+        # Catalog queries run here. Threads never expire, so each keeps its
+        # database connection instead of opening a new one per load.
+        self.query_pool = QtCore.QThreadPool(self)
+        self.query_pool.setMaxThreadCount(2)
+        self.query_pool.setExpiryTimeout(-1)
+
+        # ---------- NEW: Class progression (auto-fills the sheet) ----------
+        self.progression = ProgressionEngine(self.db)
+        self.class_features = [] # Feature names the progression put in feature_txt
+        self._applied_features = () # Progression feature list those came from
+
+        # ---------- NEW: The character (widgets are bound to it below) ----------
+        self.character = Character()
+        # Initiative, AC, skills, ... recomputed from what they depend on
+        self.derived = DerivedStats(self.character, self.progression, ArmorTable(self.db))
+
+        # ---------- NEW: Character files ----------
+        self.srd_refs = charfile.SrdRefs(self.db) # SRD ids in saved files
+        self.char_path = None # File the sheet was last opened from/saved to
         
         # ---------- Dice queue state ----------
         self.dice_queue = {} # e.g., {6: 2, 20: 1} for 2d6 + 1d20
@@ -375,6 +577,19 @@ class MainWindow(QtWidgets.QMainWindow):
         central_layout.addWidget(center_panel, stretch=1)
         central_layout.addWidget(right_panel)
 
+        # Widgets <-> character. Connected first, so the slots below see
+        # the character already updated.
+        self.binder = CharacterBinder(self.character, self)
+        self.character.observe(self.on_character_changed)
+        self.derived.recompute()
+        self.character.clean()
+        self.binder.render()
+        # Started last: the blank sheet above isn't an edit
+        self.journal = Journal(AUTOSAVE_DIR, self.character, self.srd_refs)
+
+        self.level_spin.valueChanged.connect(self.on_level_changed)
+        self.class_edit.textEdited.connect(self.on_class_edited)
+
     def _create_menu(self):
         menubar = self.menuBar()
         file_menu = menubar.addMenu("File")
@@ -383,8 +598,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # placeholders
         file_menu.addAction("New")
-        file_menu.addAction("Open")
-        file_menu.addAction("Save")
+        file_menu.addAction("Open...", self.on_file_open)
+        file_menu.addAction("Save", self.on_file_save)
+        file_menu.addAction("Save As...", self.on_file_save_as)
         file_menu.addSeparator()
         file_menu.addAction("Exit", self.close)
 
@@ -401,128 +617,244 @@ class MainWindow(QtWidgets.QMainWindow):
         
         help_menu.addAction("About")  # HOOK: show about
 
-    # ---------- NEW: Database Helper Function ----------
-
-    def _get_db_data(self, query: str):
-        """
-        Connects to the DB, runs a query, and returns headers, data, or an error.
-        Returns: (headers, data_as_dicts, error_message)
-        """
-        abs_db_path = os.path.abspath(self.db_path)
-        if not os.path.exists(abs_db_path):
-            return None, None, f"Database file not found. Looked for:\n{abs_db_path}"
-
-        conn = None
-        try:
-            conn = sqlite3.connect(f"file:{abs_db_path}?mode=ro", uri=True) # Read-only
-            # Use sqlite3.Row to get results as dictionaries
-            conn.row_factory = sqlite3.Row 
-            cursor = conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            if not rows:
-                return [], [], None # No results, but not an error
-                
-            headers = [desc[0] for desc in cursor.description]
-            # Convert sqlite3.Row objects to standard dicts
-            data_as_dicts = [dict(row) for row in rows] 
-            
-            return headers, data_as_dicts, None
-                    
-        except sqlite3.Error as e:
-            return None, None, f"Database error: {e}"
-        finally:
-            if conn:
-                conn.close()
+    def closeEvent(self, event):
+        """Closes the shared database connections with the main window."""
+        for viewer in self.viewers.values():
+            viewer.model.cancel()
+        self.query_pool.waitForDone()
+        self.journal.close(keep=bool(self.character.dirty)) # Unsaved edits stay for next time
+        self.db.close()
+        super().closeEvent(event)
 
     # ---------- NEW: Database Viewer Slots ----------
 
-    def _show_db_viewer(self, title: str, query: str, data_type: str):
-        """Helper to query DB and show results in a new window."""
-        headers, data_dicts, error = self._get_db_data(query)
-        
-        if error:
-            QtWidgets.QMessageBox.critical(self, "Database Error", error)
-            return
-        
-        if not headers and not data_dicts:
-            QtWidgets.QMessageBox.information(self, "Query Result", "No results found for this query.")
+    def _show_db_viewer(self, title: str, data_type: str):
+        """
+        Helper to open a catalog from the DB in its viewer window.
+        A catalog that was viewed before is re-shown as it was left (loading
+        resumes if it was closed mid-load). Otherwise a new window shows right
+        away; rows are loaded on self.query_pool and errors or an empty result
+        are reported once the first rows arrive.
+        """
+        viewer = self.viewers.get(data_type)
+        if viewer is not None:
+            self.viewers.move_to_end(data_type)
+            root = QtCore.QModelIndex()
+            if viewer.model.canFetchMore(root):
+                viewer.model.fetchMore(root)
+            viewer.show()
+            viewer.raise_()
+            viewer.activateWindow()
             return
 
+        model = CatalogModel(self.db, data_type, self.query_pool)
+
         # Create and show the new window, passing in the data type and a
         # reference to this main window
-        viewer = DbViewerWindow(title, data_dicts, data_type, self.open_viewers, self)
+        viewer = DbViewerWindow(title, model, data_type, self)
+        self.viewers[data_type] = viewer
         viewer.show()
+        self._trim_viewers()
+
+    def on_viewer_closed(self, viewer):
+        """A viewer is closing; release old ones if over budget once it's hidden."""
+        QtCore.QTimer.singleShot(0, self._trim_viewers)
+
+    def release_viewer(self, viewer):
+        """Closes a viewer for good and frees its window and rows."""
+        if self.viewers.get(viewer.data_type) is viewer:
+            del self.viewers[viewer.data_type]
+        viewer.model.cancel()
+        viewer.hide()
+        viewer.deleteLater()
+
+    def _trim_viewers(self):
+        """
+        Frees hidden viewers, least recently shown first, until the rows held
+        by all viewers (tree rows and name indexes) fit in VIEWER_ROW_BUDGET:
+        first their name indexes, which are rebuilt on the next filter, then
+        the viewers themselves. Visible ones are kept.
+        """
+        rows = sum(viewer.model.held_rows for viewer in self.viewers.values())
+        hidden = [viewer for viewer in self.viewers.values() if not viewer.isVisible()]
+        for viewer in hidden:
+            if rows <= VIEWER_ROW_BUDGET:
+                return
+            rows -= viewer.model.held_rows
+            viewer.model.drop_names()
+            rows += viewer.model.held_rows
+        for viewer in hidden:
+            if rows <= VIEWER_ROW_BUDGET:
+                return
+            rows -= viewer.model.held_rows
+            self.release_viewer(viewer)
 
     @QtCore.pyqtSlot()
     def on_view_classes(self):
-        self._show_db_viewer(
-            "SRD Classes",
-            "SELECT * FROM Class ORDER BY name",
-            data_type='classes'
-        )
+        self._show_db_viewer("SRD Classes", data_type='classes')
 
     @QtCore.pyqtSlot()
     def on_view_spells(self):
-        # Gets all spell data for the detailed view
-        self._show_db_viewer(
-            "SRD Spells",
-            """
-            SELECT * FROM Spell
-            ORDER BY level, name
-            """,
-            data_type='spells'
-        )
+        self._show_db_viewer("SRD Spells", data_type='spells')
 
     @QtCore.pyqtSlot()
     def on_view_equipment(self):
-        # Gets all equipment data for the detailed view
-        self._show_db_viewer(
-            "SRD Equipment",
-            """
-            SELECT * FROM Equipment
-            ORDER BY equipment_category_index, name
-            """,
-            data_type='equipment'
-        )
+        self._show_db_viewer("SRD Equipment", data_type='equipment')
 
     @QtCore.pyqtSlot()
     def on_view_features(self):
         """Views class/subclass features, which are in the Feature table."""
-        self._show_db_viewer(
-            "SRD Features",
-            "SELECT * FROM Feature ORDER BY name",
-            data_type='features'
-        )
+        self._show_db_viewer("SRD Features", data_type='features')
 
     @QtCore.pyqtSlot()
     def on_view_feats(self):
         """Views Feats from the Feat table."""
-        self._show_db_viewer(
-            "SRD Feats",
-            "SELECT * FROM Feat ORDER BY name",
-            data_type='feats'
-        )
+        self._show_db_viewer("SRD Feats", data_type='feats')
 
     @QtCore.pyqtSlot()
     def on_view_races(self):
-        # Joins Race and Subrace to build the tree structure
-        self._show_db_viewer(
-            "SRD Races and Subraces",
-            """
-            SELECT
-                R.*,
-                S.name as subrace_name,
-                S."index" as subrace_index,
-                S.description as subrace_desc
-            FROM Race AS R
-            LEFT JOIN Subrace AS S ON R."index" = S.race_index
-            ORDER BY R.name, S.name
-            """,
-            data_type='races'
-        )
+        # Races with their subraces as children
+        self._show_db_viewer("SRD Races and Subraces", data_type='races')
         
+    # ---------- NEW: Class Progression ----------
+
+    def set_class(self, class_index, name, subclass_index=None):
+        """Sets the character's class (and subclass) and fills in what its current level gives."""
+        self.character.update({'class_name': name, 'class_index': class_index, 'subclass_index': subclass_index})
+        self.apply_progression()
+
+    @QtCore.pyqtSlot(str)
+    def on_class_edited(self, text):
+        """A hand-typed class isn't an SRD class: stop auto-filling."""
+        self.character.update({'class_index': None, 'subclass_index': None})
+
+    @QtCore.pyqtSlot(int)
+    def on_level_changed(self, level):
+        if self.character.class_index:
+            self.apply_progression()
+
+    def apply_progression(self):
+        """
+        Updates hit dice, spell slots and class features for the current
+        class and level in one change to the character.
+        Features added by hand stay; only ones from the progression change.
+        """
+        c = self.character
+        info = self.progression.at(c.class_index, c.level, c.subclass_index)
+        if info is None:
+            return
+        c.update({
+            'hit_dice': info.hit_dice,
+            'spell_slots': dict(zip(SPELL_LEVELS, info.spell_slots)),
+            'features': self._replace_class_features(info.features),
+        })
+
+    def _replace_class_features(self, features):
+        """
+        The character's features with the previous progression features
+        swapped for `features`. Levelling up only appends the newly gained ones.
+        """
+        current = self.character.features
+        applied = self._applied_features
+        if features[:len(applied)] == applied:
+            new = features[len(applied):]
+        else:
+            old = set(self.class_features)
+            current = [name for name in current if name not in old]
+            self.class_features = []
+            new = features
+        self._applied_features = features
+
+        present = set(current)
+        added = [name for name in dict.fromkeys(new) if name not in present]
+        self.class_features += added
+        return current + added
+
+    def _restore_progression(self):
+        """After loading a character: which of its features came from its class."""
+        c = self.character
+        info = self.progression.at(c.class_index, c.level, c.subclass_index) if c.class_index else None
+        self._applied_features = info.features if info else ()
+        applied = set(self._applied_features)
+        self.class_features = [name for name in c.features if name in applied]
+
+    def on_character_changed(self, addresses):
+        self.derived.recompute(addresses)
+        self.setWindowModified(bool(self.character.dirty))
+
+    # ---------- NEW: Save / Open ----------
+
+    @QtCore.pyqtSlot()
+    def on_file_open(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Open Character", "", "Character Files (*.dndc)"
+        )
+        if not path:
+            return
+        try:
+            sheet = charfile.load(path, self.srd_refs)
+        except (OSError, charfile.CharFileError) as e:
+            QtWidgets.QMessageBox.critical(self, "Open Character", f"Could not open {path}:\n{e}")
+            return
+        with self.journal.paused():
+            self.character.update(sheet) # Redraws the changed widgets in one pass
+            # The file's own derived stats may be stale, and the incremental
+            # pass above skips any whose inputs match the last character's
+            self.derived.recompute()
+        self.journal.reset(path)
+        self.character.clean()
+        self.setWindowModified(False)
+        self._restore_progression()
+        self.char_path = path
+
+    @QtCore.pyqtSlot()
+    def on_file_save(self):
+        if not self.char_path:
+            self.on_file_save_as()
+            return
+        try:
+            charfile.save(self.char_path, self.character.to_sheet(), self.srd_refs)
+        except OSError as e:
+            QtWidgets.QMessageBox.critical(self, "Save Character", f"Could not save {self.char_path}:\n{e}")
+            return
+        self.journal.reset(self.char_path)
+        self.character.clean()
+        self.setWindowModified(False)
+
+    @QtCore.pyqtSlot()
+    def on_file_save_as(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Save Character", self.char_path or "character.dndc", "Character Files (*.dndc)"
+        )
+        if not path:
+            return
+        if not path.endswith(".dndc"):
+            path += ".dndc"
+        self.char_path = path
+        self.on_file_save()
+
+    def offer_recovery(self):
+        """Asks to restore edits a previous session didn't save (e.g. after a crash)."""
+        if not self.journal.recoverable():
+            return
+        answer = QtWidgets.QMessageBox.question(
+            self, "Recover Character",
+            "A previous session ended with unsaved changes. Recover them?",
+        )
+        if answer != QtWidgets.QMessageBox.StandardButton.Yes:
+            self.journal.discard()
+            return
+        try:
+            self.journal.recover()
+        except (OSError, charfile.CharFileError) as e:
+            QtWidgets.QMessageBox.critical(self, "Recover Character", f"Could not recover the autosave:\n{e}")
+            self.journal.discard()
+            return
+        self.char_path = self.journal.source # Save goes back to the file it was editing
+        with self.journal.paused():
+            self.derived.recompute() # As in on_file_open
+        self._restore_progression()
+
     # ---------- Dice Roller Slots ----------
 
     @QtCore.pyqtSlot()
@@ -545,6 +877,15 @@ class MainWindow(QtWidgets.QMainWindow):
         self.dice_queue = {}
         self.update_roll_display()
 
+    def _queue_expression(self) -> str:
+        """Builds a dice expression (e.g. "2d6+1d20-1") from the queue and modifier."""
+        # Sort by die type (d4, d6, etc.)
+        expression = "+".join(f"{count}d{sides}" for sides, count in sorted(self.dice_queue.items()))
+        mod = self.mod_spin.value()
+        if mod:
+            expression += f"{mod:+d}"
+        return expression
+
     @QtCore.pyqtSlot(int)
     def update_roll_display(self, value: int = None):
         """
@@ -552,23 +893,15 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         if not hasattr(self, 'roll_result'): return
         
-        mod = self.mod_spin.value()
-        mod_str = f" + {mod}" if mod > 0 else f" - {abs(mod)}" if mod < 0 else ""
-
-        formula_parts = []
-        # Sort by die type (d4, d6, etc.)
-        for sides, count in sorted(self.dice_queue.items()):
-            formula_parts.append(f"{count}d{sides}")
-        
-        formula_str = " + ".join(formula_parts)
-
-        if not formula_str and mod == 0:
+        expression = self._queue_expression()
+        if not expression:
             self.roll_result.setPlaceholderText("Build your roll...")
             self.roll_result.setText("")
-        elif not formula_str and mod != 0:
-            self.roll_result.setText(f"{mod}") # Just show modifier
         else:
-            self.roll_result.setText(f"{formula_str}{mod_str}")
+            # Compiled plans (and their distributions) are cached, so the
+            # ROLL button reuses this parse
+            plan = dice.compile_expression(expression)
+            self.roll_result.setText(f"{plan}  (avg {plan.distribution().mean:.4g})")
 
     @QtCore.pyqtSlot(int)
     def on_dice_added(self, sides: int):
@@ -590,21 +923,14 @@ class MainWindow(QtWidgets.QMainWindow):
              self.roll_result.setText(f"Result: {mod} [Mod: {mod}]")
              return
 
-        total_roll = 0
-        roll_details = []
+        plan = dice.compile_expression(self._queue_expression())
+        final_total, details = plan.roll()
 
-        for sides, count in sorted(self.dice_queue.items()):
-            rolls_for_this_type = []
-            for _ in range(count):
-                roll = random.randint(1, sides)
-                total_roll += roll
-                rolls_for_this_type.append(str(roll))
-            
-            roll_details.append(f"{count}d{sides} ({', '.join(rolls_for_this_type)})")
+        roll_details = []
+        for term, rolls, kept in details:
+            roll_details.append(f"{term} ({', '.join(map(str, rolls))})")
 
-        mod = self.mod_spin.value()
-        final_total = total_roll + mod
-        
+        mod = plan.modifier
         mod_str = f" + {mod}" if mod > 0 else f" - {abs(mod)}" if mod < 0 else ""
         details_str = " | ".join(roll_details)
 
@@ -619,6 +945,7 @@ def main():
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    window.offer_recovery()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+# batch.py
+# Checks and recomputes saved characters (.dndc) without the GUI.
+#
+# Each file is resolved against dnd_srd.db: its class and level give hit
+# dice, spell slots, class features and proficiency bonus
+# (ClassProgression), its race or subrace the ability bonuses and speed
+# (RaceSummary, built from RaceAbilityBonus/SubraceAbilityBonus). Derived
+# stats are recomputed as the sheet does (derived.py). Files are spread
+# over a process pool; every worker opens the database once.
+#
+# Usage: python batch.py [--write] [--json REPORT] [-j N] FILE_OR_DIR...
+# Exits with status 1 if a file couldn't be read or has issues.
+#
+# Imports nothing from Qt, so it runs on machines without a display.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import charfile
+from character import Character
+from charfile import SPELL_LEVELS
+from database import QUERIES, SrdDatabase
+from derived import ArmorTable, DerivedStats
+from progression import ProgressionEngine
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'dnd_srd.db')
+
+
+class Resolver:
+    """Resolves and recomputes characters against one database."""
+    def __init__(self, db_path):
+        self.db = SrdDatabase(db_path)
+        self.refs = charfile.SrdRefs(self.db)
+        self.progression = ProgressionEngine(self.db)
+        self.armor = ArmorTable(self.db)
+        self._races = {} # race name -> RaceSummary row or None
+
+    def race(self, name):
+        """RaceSummary row of a race or subrace by name (subraces first), or None."""
+        if name not in self._races:
+            row = None
+            for kind in ('subrace', 'race'):
+                index = self.refs.index_of_name(kind, name)
+                if index:
+                    _, rows, error = self.db.query(QUERIES['race_summary'], (index,))
+                    if error:
+                        print(f"Error loading race {name}: {error}", file=sys.stderr)
+                    row = rows[0] if rows else None
+                    break
+            self._races[name] = row
+        return self._races[name]
+
+    def process(self, path, write=False):
+        """
+        Checks one file. Returns a report entry:
+        {path, name, class, level, race, race_bonuses, changes, issues, error}
+        """
+        entry = {'path': path, 'error': None, 'changes': {}, 'issues': []}
+        try:
+            sheet = charfile.load(path, self.refs)
+        except (OSError, charfile.CharFileError) as e:
+            entry['error'] = str(e)
+            return entry
+        c = Character(sheet)
+        issues = entry['issues']
+        entry.update(name=c.name, level=c.level, race=c.race, race_bonuses={})
+
+        # Class: hit dice, spell slots and features for the level
+        if not c.class_index and c.class_name:
+            c.set('class_index', self.refs.index_of_name('class', c.class_name))
+        info = self.progression.at(c.class_index, c.level, c.subclass_index) if c.class_index else None
+        entry['class'] = info.class_name if info else c.class_name
+        if info is None:
+            if c.class_name:
+                issues.append(f"class '{c.class_name}' is not in the SRD")
+        else:
+            if c.level > info.level:
+                issues.append(f"level {c.level} is past {info.class_name}'s last level ({info.level})")
+            have = set(c.features)
+            c.update({
+                'hit_dice': info.hit_dice,
+                'spell_slots': dict(zip(SPELL_LEVELS, info.spell_slots)),
+                'features': c.features + [name for name in dict.fromkeys(info.features) if name not in have],
+            })
+
+        # Race: ability bonuses and speed
+        race = self.race(c.race) if c.race else None
+        if race is None:
+            if c.race:
+                issues.append(f"race '{c.race}' is not in the SRD")
+        else:
+            bonuses = {ability.upper(): bonus for ability, bonus in json.loads(race['ability_bonuses_json']).items()}
+            entry['race_bonuses'] = bonuses
+            for ability, bonus in bonuses.items():
+                if c.abilities[ability] - bonus < 3:
+                    issues.append(f"{ability} {c.abilities[ability]} is too low to include the {race['name']} +{bonus}")
+            if race['speed'] and c.speed < race['speed']:
+                issues.append(f"speed {c.speed} is below the {race['name']} speed of {race['speed']}")
+        for ability, score in c.abilities.items():
+            if not 1 <= score <= 30:
+                issues.append(f"{ability} {score} is outside 1-30")
+
+        DerivedStats(c, self.progression, self.armor).recompute()
+
+        # What recomputing changed, as {field or field.key: [old, new]}
+        for field, old in sheet.items():
+            new = getattr(c, field)
+            if isinstance(old, dict):
+                for key in new:
+                    if old.get(key) != new[key]:
+                        entry['changes'][f"{field}.{key}"] = [old.get(key), new[key]]
+            elif old != new:
+                entry['changes'][field] = [old, new]
+
+        if write and entry['changes']:
+            try:
+                charfile.save(path, c.to_sheet(), self.refs)
+            except OSError as e:
+                entry['error'] = f"Could not save: {e}"
+        return entry
+
+
+# --- Process pool ---
+
+_resolver = None # One per worker process
+
+def _init_worker(db_path):
+    global _resolver
+    _resolver = Resolver(db_path)
+
+def _process(args):
+    path, write = args
+    return _resolver.process(path, write)
+
+
+def find_files(paths):
+    """The .dndc files among `paths`, searching directories recursively."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found += [os.path.join(root, name) for name in sorted(files) if name.endswith('.dndc')]
+        else:
+            found.append(path)
+    return found
+
+def run(paths, db_path=DEFAULT_DB_PATH, jobs=None, write=False):
+    """Processes every file; returns report entries in `paths` order."""
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths)))
+    if jobs == 1:
+        resolver = Resolver(db_path)
+        return [resolver.process(path, write) for path in paths]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(db_path,)) as pool:
+        # Chunks big enough to amortize the round trips, small enough to balance
+        chunksize = max(1, len(paths) // (jobs * 8))
+        return list(pool.map(_process, [(path, write) for path in paths], chunksize=chunksize))
+
+
+def print_report(entries, elapsed, write):
+    changed = with_issues = unreadable = 0
+    for entry in entries:
+        if entry['error']:
+            unreadable += 1
+            print(f"[FAIL] {entry['path']}: {entry['error']}")
+            continue
+        status = "ok"
+        if entry['issues']:
+            status = "WARN"
+            with_issues += 1
+        print(f"[{status:>4}] {entry['path']}: {entry['name'] or '(unnamed)'}, "
+              f"{entry['class'] or '(no class)'} {entry['level']}, {entry['race'] or '(no race)'}")
+        if entry['changes']:
+            changed += 1
+            verb = "updated" if write else "would update"
+            fields = ", ".join(f"{key} {old!r} -> {new!r}" for key, (old, new) in entry['changes'].items())
+            print(f"         {verb}: {fields}")
+        for issue in entry['issues']:
+            print(f"         {issue}")
+    print(f"\n{len(entries)} characters in {elapsed:.2f}s: {changed} {'updated' if write else 'out of date'}, "
+          f"{with_issues} with issues, {unreadable} unreadable.")
+    return 1 if (with_issues or unreadable) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks and recomputes saved characters against the SRD database.")
+    parser.add_argument('paths', nargs='+', help=".dndc files, or directories to search for them")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SRD database (default: data/dnd_srd.db)")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--write', action='store_true', help="save recomputed characters back to their files")
+    parser.add_argument('--json', metavar='REPORT', help="also write the full report as JSON to REPORT")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"ERROR: Database '{args.db}' not found.", file=sys.stderr)
+        return 2
+    paths = find_files(args.paths)
+    if not paths:
+        print("No character files found.", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    entries = run(paths, args.db, args.jobs, args.write)
+    status = print_report(entries, time.perf_counter() - start, args.write)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
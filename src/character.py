@@ -0,0 +1,148 @@
+# character.py
+# The character being edited, kept apart from the widgets that show it.
+#
+# A Character holds every field charfile.FIELDS saves. All changes go
+# through set() / set_entry() / add() / remove() / update(), which record
+# what changed as an address:
+#   "level", "features", ...     a plain field, or a whole list
+#   ("abilities", "DEX"), ...    one entry of abilities, skills,
+#                                spell_slots, equipment or skill_proficiency
+# Addresses collect in `dirty` until clean() (the sheet is saved) and are
+# passed to observers as they happen, so the GUI redraws and derived stats
+# are recomputed only for what changed. No Qt here, so headless tools can
+# load, change and save characters without a QApplication.
+
+from charfile import ABILITIES, FIELDS, SKILLS, SPELL_LEVELS
+
+# Field groups by how they're changed
+MAPPINGS = tuple(key for key, kind, _ in FIELDS if kind in ('ints', 'slots'))
+LISTS = tuple(key for key, kind, _ in FIELDS if kind == 'list')
+
+# A new, blank character (matches the sheet's starting values)
+DEFAULTS = {
+    'name': "",
+    'class_name': "",
+    'class_index': None,
+    'subclass_index': None,
+    'race': "",
+    'level': 1,
+    'hp': 25,
+    'ac': 10,
+    'speed': 30,
+    'initiative': 0,
+    'passive_perception': 10,
+    'hit_dice': "",
+    'image_path': None,
+    'abilities': dict.fromkeys(ABILITIES, 10),
+    'skills': dict.fromkeys(SKILLS, 0),
+    'spell_slots': dict.fromkeys(SPELL_LEVELS, 0),
+    'equipment': {}, # slot name -> item name or None
+    'inventory': [],
+    'spells': [],
+    'feats': [],
+    'features': [],
+    'skill_proficiency': dict.fromkeys(SKILLS, 0),
+}
+
+
+class Character:
+    """One character's fields, with per-field change tracking."""
+    __slots__ = tuple(key for key, _, _ in FIELDS) + ('dirty', '_observers')
+
+    def __init__(self, sheet=None):
+        for key, value in DEFAULTS.items():
+            setattr(self, key, value.copy() if isinstance(value, (dict, list)) else value)
+        self.dirty = set() # Addresses changed since the last clean()
+        self._observers = []
+        if sheet:
+            self.update(sheet)
+            self.clean()
+
+    # --- Observers ---
+
+    def observe(self, callback):
+        """Calls callback(addresses) after every change."""
+        self._observers.append(callback)
+
+    def unobserve(self, callback):
+        self._observers.remove(callback)
+
+    def _changed(self, addresses):
+        if not addresses:
+            return False
+        self.dirty.update(addresses)
+        for callback in list(self._observers):
+            callback(addresses)
+        return True
+
+    def clean(self):
+        """Forgets what changed (e.g. after saving). Returns the old dirty set."""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    # --- Changes ---
+
+    def _assign(self, field, value):
+        """Stores a value without notifying; returns the addresses it changed."""
+        if field in MAPPINGS:
+            if field == 'equipment': # A slot left out of `value` is empty
+                value = {**dict.fromkeys(self.equipment), **value}
+            return self._assign_entries(field, value)
+        if field in LISTS:
+            value = list(value)
+        elif field not in DEFAULTS:
+            raise KeyError(field)
+        if getattr(self, field) == value:
+            return []
+        setattr(self, field, value)
+        return [field]
+
+    def _assign_entries(self, field, entries):
+        current = getattr(self, field)
+        changed = []
+        for key, entry in entries.items():
+            if key not in current or current[key] != entry:
+                current[key] = entry
+                changed.append((field, key))
+        return changed
+
+    def set(self, field, value):
+        """Sets one field (a whole list or mapping too). True if it changed."""
+        return self._changed(self._assign(field, value))
+
+    def set_entry(self, field, key, value):
+        """Sets one entry of a mapping field (abilities, equipment, ...)."""
+        return self._changed(self._assign_entries(field, {key: value}))
+
+    def add(self, field, item):
+        """Appends to a list field unless it's already there. True if added."""
+        items = getattr(self, field)
+        if item in items:
+            return False
+        items.append(item)
+        return self._changed([field])
+
+    def remove(self, field, item):
+        """Removes an item from a list field. True if it was there."""
+        items = getattr(self, field)
+        if item not in items:
+            return False
+        items.remove(item)
+        return self._changed([field])
+
+    def update(self, values):
+        """Sets many fields at once; observers hear about them in one call."""
+        changed = []
+        for field, value in values.items():
+            changed += self._assign(field, value)
+        return self._changed(changed)
+
+    # --- Sheets (charfile dicts) ---
+
+    def to_sheet(self):
+        """A copy of every field, as charfile.dumps() takes it."""
+        sheet = {}
+        for key in DEFAULTS:
+            value = getattr(self, key)
+            sheet[key] = value.copy() if isinstance(value, (dict, list)) else value
+        return sheet
@@ -0,0 +1,312 @@
+# charfile.py
+# Compact binary character files (.dndc).
+#
+# A sheet is a plain dict (see FIELDS). On disk:
+#   magic "DNDC", format version (1 byte), flags (1 byte), body
+# The body (zlib-compressed if FLAG_ZLIB) is a string table followed by
+# every field in FIELDS order, as LEB128 varints:
+#   ints are zigzag-encoded; text values are 0 (none), 2*k+1 (entry k of
+#   the string table) or 2*id+2 (an SrdRef id, see populate.srd_id).
+# Names of SRD spells, items, feats, ... are stored as ids, so files stay
+# small and an entry renamed in a later SRD build loads with its new name.
+# No Qt here, so headless tools can read and write sheets too.
+
+import os
+import sys
+import zlib
+
+from database import QUERIES
+
+MAGIC = b'DNDC'
+VERSION = 1
+FLAG_ZLIB = 0x01
+
+ABILITIES = ("STR", "DEX", "CON", "INT", "WIS", "CHA")
+SKILLS = (
+    "Acrobatics", "Animal Handling", "Arcana", "Athletics", "Deception",
+    "History", "Insight", "Intimidation", "Investigation", "Medicine",
+    "Nature", "Perception", "Performance", "Persuasion", "Religion",
+    "Sleight of Hand", "Stealth", "Survival",
+)
+SPELL_LEVELS = tuple(range(1, 10))
+
+# Every sheet field in file order: (key, type, SrdRef kinds a name may be).
+#   text:  a string, stored as an SrdRef id when it names an entry of `kinds`
+#   index: an SRD "index" of the kind, stored as its SrdRef id
+#   int:   an integer
+#   ints:  {key: int} for the keys in `kinds` (fixed order, no names stored)
+#   slots: {slot name: text or None}
+#   list:  [text]
+# Changing FIELDS needs a VERSION bump.
+FIELDS = (
+    ('name', 'text', ()),
+    ('class_name', 'text', ('class',)),
+    ('class_index', 'index', 'class'),
+    ('subclass_index', 'index', 'subclass'),
+    ('race', 'text', ('race', 'subrace')),
+    ('level', 'int', None),
+    ('hp', 'int', None),
+    ('ac', 'int', None),
+    ('speed', 'int', None),
+    ('initiative', 'int', None),
+    ('passive_perception', 'int', None),
+    ('hit_dice', 'text', ()),
+    ('image_path', 'text', ()),
+    ('abilities', 'ints', ABILITIES),
+    ('skills', 'ints', SKILLS),
+    ('spell_slots', 'ints', SPELL_LEVELS),
+    ('equipment', 'slots', ('equipment',)),
+    ('inventory', 'list', ('equipment',)),
+    ('spells', 'list', ('spell',)),
+    ('feats', 'list', ('feat',)),
+    ('features', 'list', ('feature',)),
+    ('skill_proficiency', 'ints', SKILLS), # 0 none, 1 proficient, 2 expertise
+)
+
+
+class CharFileError(ValueError):
+    """A file that isn't a character file this version can read."""
+
+
+class SrdRefs:
+    """
+    SrdRef ids <-> names and indexes, read from the database one kind at a
+    time on first use and kept. Share one instance to load many files.
+    A kind whose query failed isn't kept, so the next lookup tries again;
+    `error` holds the last failure.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.error = None
+        self._kinds = {} # kind -> (name -> id, index -> id)
+        self._names = {} # id -> name
+        self._indexes = {} # id -> index
+
+    def _load(self, kind):
+        maps = self._kinds.get(kind)
+        if maps is None:
+            _, rows, error = self.db.query(QUERIES['srd_refs'], (kind,))
+            if error:
+                print(f"Error loading SRD ids ({kind}): {error}", file=sys.stderr)
+                self.error = error
+                return {}, {}
+            by_name, by_index = {}, {}
+            for row in rows:
+                by_name.setdefault(row['name'], row['id'])
+                by_index[row['index']] = row['id']
+                self._names[row['id']] = row['name']
+                self._indexes[row['id']] = row['index']
+            maps = self._kinds[kind] = (by_name, by_index)
+        return maps
+
+    def id_of_name(self, kinds, name):
+        for kind in kinds:
+            ref = self._load(kind)[0].get(name)
+            if ref is not None:
+                return ref
+        return None
+
+    def id_of_index(self, kind, index):
+        return self._load(kind)[1].get(index)
+
+    def index_of_name(self, kind, name):
+        """SRD "index" of the entry of `kind` called `name`, or None."""
+        ref = self._load(kind)[0].get(name)
+        return None if ref is None else self._indexes[ref]
+
+    def name(self, kinds, ref):
+        for kind in kinds:
+            self._load(kind)
+        return self._names.get(ref)
+
+    def index(self, kind, ref):
+        self._load(kind)
+        return self._indexes.get(ref)
+
+
+# --- Varints ---
+
+def _put_uint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _put_int(out, n):
+    _put_uint(out, (n << 1) if n >= 0 else ((-n << 1) - 1))
+
+def _get_uint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def _get_int(data, pos):
+    n, pos = _get_uint(data, pos)
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+
+
+# --- Sheets <-> bytes ---
+
+class _Writer:
+    def __init__(self, refs):
+        self.refs = refs
+        self.out = bytearray()
+        self.strings = {} # text -> string table position
+
+    def text(self, value, kinds):
+        if value is None:
+            _put_uint(self.out, 0)
+            return
+        ref = self.refs.id_of_name(kinds, value) if kinds else None
+        if ref is not None:
+            _put_uint(self.out, 2 * ref + 2)
+        else:
+            _put_uint(self.out, 2 * self.strings.setdefault(value, len(self.strings)) + 1)
+
+    def body(self):
+        """String table + fields."""
+        table = bytearray()
+        _put_uint(table, len(self.strings))
+        for text in self.strings: # Insertion order == positions
+            encoded = text.encode('utf-8')
+            _put_uint(table, len(encoded))
+            table += encoded
+        return bytes(table + self.out)
+
+
+def dumps(sheet, refs, compress=True):
+    """Encodes a sheet dict; compressed if asked and if that makes it smaller."""
+    w = _Writer(refs)
+    out = w.out
+    for key, kind, kinds in FIELDS:
+        value = sheet.get(key)
+        if kind == 'text':
+            w.text(value, kinds)
+        elif kind == 'index':
+            ref = refs.id_of_index(kinds, value) if value else None
+            _put_uint(out, 0 if ref is None else 2 * ref + 2)
+        elif kind == 'int':
+            _put_int(out, value or 0)
+        elif kind == 'ints':
+            value = value or {}
+            for name in kinds:
+                _put_int(out, value.get(name, 0))
+        elif kind == 'slots':
+            value = value or {}
+            _put_uint(out, len(value))
+            for slot, item in value.items():
+                w.text(slot, ())
+                w.text(item, kinds)
+        else: # list
+            value = value or []
+            _put_uint(out, len(value))
+            for item in value:
+                w.text(item, kinds)
+
+    body, flags = w.body(), 0
+    if compress:
+        packed = zlib.compress(body, 9)
+        if len(packed) < len(body):
+            body, flags = packed, FLAG_ZLIB
+    return MAGIC + bytes((VERSION, flags)) + body
+
+
+def _unresolved(refs, ref):
+    """The error for an SrdRef id this database doesn't have."""
+    reason = f" ({refs.error})" if refs.error else ""
+    return CharFileError(f"The file refers to an SRD entry (id {ref}) this database can't resolve{reason}.")
+
+
+def loads(data, refs):
+    """
+    Decodes bytes from dumps() into a sheet dict. Raises CharFileError,
+    also when an SRD entry it names can't be resolved: loading it without
+    that entry and saving again would lose it.
+    """
+    if data[:4] != MAGIC or len(data) < 6:
+        raise CharFileError("Not a character file.")
+    version, flags = data[4], data[5]
+    if version != VERSION:
+        raise CharFileError(f"Character file version {version} isn't supported (this app reads version {VERSION}).")
+    try:
+        body = zlib.decompress(data[6:]) if flags & FLAG_ZLIB else data[6:]
+        count, pos = _get_uint(body, 0)
+        strings = []
+        for _ in range(count):
+            length, pos = _get_uint(body, pos)
+            strings.append(body[pos:pos + length].decode('utf-8'))
+            pos += length
+
+        def text(kinds):
+            nonlocal pos
+            n, pos = _get_uint(body, pos)
+            if n == 0:
+                return None
+            if n & 1:
+                return strings[n >> 1]
+            name = refs.name(kinds, (n - 2) >> 1)
+            if name is None:
+                raise _unresolved(refs, (n - 2) >> 1)
+            return name
+
+        sheet = {}
+        for key, kind, kinds in FIELDS:
+            if kind == 'text':
+                sheet[key] = text(kinds)
+            elif kind == 'index':
+                n, pos = _get_uint(body, pos)
+                sheet[key] = refs.index(kinds, (n - 2) >> 1) if n else None
+                if n and sheet[key] is None:
+                    raise _unresolved(refs, (n - 2) >> 1)
+            elif kind == 'int':
+                sheet[key], pos = _get_int(body, pos)
+            elif kind == 'ints':
+                values = {}
+                for name in kinds:
+                    values[name], pos = _get_int(body, pos)
+                sheet[key] = values
+            elif kind == 'slots':
+                count, pos = _get_uint(body, pos)
+                slots = {}
+                for _ in range(count):
+                    slot = text(())
+                    slots[slot] = text(kinds)
+                sheet[key] = slots
+            else: # list
+                count, pos = _get_uint(body, pos)
+                sheet[key] = [text(kinds) for _ in range(count)]
+    except (IndexError, UnicodeDecodeError, zlib.error) as e:
+        raise CharFileError(f"Damaged character file ({e}).")
+    return sheet
+
+
+def save(path, sheet, refs, compress=True):
+    """Writes a sheet to `path`, replacing any old file only once it's complete."""
+    data = dumps(sheet, refs, compress)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def load(path, refs):
+    """Reads a sheet from `path`. Raises OSError or CharFileError."""
+    with open(path, 'rb') as f:
+        return loads(f.read(), refs)
+
+def load_roster(paths, refs):
+    """
+    Loads many sheets sharing one SrdRefs (each kind is read from the
+    database once). Returns [(path, sheet or None, error or None)].
+    """
+    results = []
+    for path in paths:
+        try:
+            results.append((path, load(path, refs), None))
+        except (OSError, CharFileError) as e:
+            results.append((path, None, str(e)))
+    return results
@@ -0,0 +1,146 @@
+# binding.py
+# Two-way link between a Character (character.py) and the sheet's widgets.
+#
+# Widget edits are written to the character; character changes (from the
+# widgets, file loads, class progression, ...) are drawn back into only the
+# widgets whose addresses changed, with their signals blocked so nothing
+# echoes back.
+
+import os
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+from components.widgets import EquipmentSlot, ImageLabel
+
+
+class CharacterBinder(QtCore.QObject):
+    """
+    Binds `character` to the widgets populate_*_panel put on `main_window`.
+    Call render() once to show the character; after that it stays in step.
+    """
+    def __init__(self, character, main_window):
+        super().__init__(main_window)
+        self.character = character
+        self.widgets = {} # address -> widget
+        self.placeholders = {} # list widget -> placeholder text
+
+        mw = main_window
+        for field, widget in (
+            ('name', mw.name_edit), ('class_name', mw.class_edit), ('race', mw.race_edit),
+            ('hit_dice', mw.hd_edit), ('level', mw.level_spin), ('hp', mw.hp_spin),
+            ('ac', mw.ac_spin), ('speed', mw.speed_spin), ('initiative', mw.init_spin),
+            ('passive_perception', mw.perc_spin), ('image_path', mw.char_image),
+        ):
+            self._bind(field, widget)
+        for field, widgets in (
+            ('abilities', mw.ability_spins), ('skills', mw.skill_spins),
+            ('spell_slots', mw.spell_slot_spins), ('equipment', mw.equip_slots),
+            ('skill_proficiency', mw.skill_prof_checks),
+        ):
+            for key, widget in widgets.items():
+                self._bind((field, key), widget)
+        for field, widget in (
+            ('inventory', mw.inventory), ('spells', mw.spell_info),
+            ('feats', mw.feats_txt), ('features', mw.feature_txt),
+        ):
+            # Lists start out showing their gray placeholder row
+            self.placeholders[widget] = widget.item(0).text()
+            self._bind(field, widget)
+
+        character.observe(self.render)
+
+    def _bind(self, address, widget):
+        self.widgets[address] = widget
+        if isinstance(widget, QtWidgets.QSpinBox):
+            widget.valueChanged.connect(lambda value: self._edited(address, value))
+        elif isinstance(widget, QtWidgets.QCheckBox):
+            widget.toggled.connect(lambda checked: self._edited(address, int(checked)))
+        elif isinstance(widget, QtWidgets.QLineEdit):
+            widget.textChanged.connect(lambda text: self._edited(address, text))
+        elif isinstance(widget, EquipmentSlot):
+            widget.item_changed.connect(lambda item: self._edited(address, item))
+        elif isinstance(widget, ImageLabel):
+            widget.image_changed.connect(lambda path: self._edited(address, path))
+        elif isinstance(widget, QtWidgets.QListWidget):
+            widget.item_dropped.connect(lambda text: self.character.add(address, text))
+
+    def _edited(self, address, value):
+        if isinstance(address, tuple):
+            self.character.set_entry(*address, value)
+        else:
+            self.character.set(address, value)
+
+    # --- Character -> widgets ---
+
+    def render(self, addresses=None):
+        """Draws `addresses` (default: all) into their widgets in one pass."""
+        if addresses is None:
+            addresses = list(self.widgets)
+        widgets = [(self.widgets[a], a) for a in addresses if a in self.widgets]
+        if not widgets:
+            return
+
+        # Repaint once at the end, not per widget, when loading a whole sheet
+        batch = self.parent().centralWidget() if len(widgets) > 1 else None
+        if batch:
+            batch.setUpdatesEnabled(False)
+        try:
+            for widget, address in widgets:
+                widget.blockSignals(True)
+                try:
+                    self._show(widget, self._value(address))
+                finally:
+                    widget.blockSignals(False)
+        finally:
+            if batch:
+                batch.setUpdatesEnabled(True)
+
+    def _value(self, address):
+        if isinstance(address, tuple):
+            field, key = address
+            return getattr(self.character, field).get(key)
+        return getattr(self.character, address)
+
+    def _show(self, widget, value):
+        if isinstance(widget, QtWidgets.QSpinBox):
+            widget.setValue(value)
+        elif isinstance(widget, QtWidgets.QCheckBox):
+            widget.setChecked(bool(value))
+        elif isinstance(widget, QtWidgets.QLineEdit):
+            if widget.text() != (value or ""): # Keeps the cursor where the user is typing
+                widget.setText(value or "")
+        elif isinstance(widget, EquipmentSlot):
+            if value:
+                widget.set_item(value)
+            else:
+                widget.clear_item()
+        elif isinstance(widget, ImageLabel):
+            # A missing file (moved, or saved on another machine) shows the placeholder
+            if not value or not os.path.exists(value):
+                if widget.image_path is not None:
+                    widget.clear_image()
+            elif value != widget.image_path:
+                widget.set_image(value)
+        elif isinstance(widget, QtWidgets.QListWidget):
+            self._show_list(widget, value)
+
+    def _show_list(self, widget, names):
+        """Shows `names`, or the gray placeholder row if there are none."""
+        current = [widget.item(row).text() for row in range(widget.count())
+                   if widget.item(row).flags() != QtCore.Qt.ItemFlag.NoItemFlags]
+        if len(current) == widget.count(): # No placeholder showing
+            if current == names:
+                return
+            if current and names[:len(current)] == current: # Appended: keep the rest
+                widget.addItems(names[len(current):])
+                return
+        elif not names:
+            return
+        widget.clear()
+        if names:
+            widget.addItems(names)
+        else:
+            placeholder = QtWidgets.QListWidgetItem(self.placeholders[widget])
+            placeholder.setFlags(QtCore.Qt.ItemFlag.NoItemFlags)
+            placeholder.setForeground(QtGui.QColor("#888a8f"))
+            widget.addItem(placeholder)
@@ -0,0 +1,622 @@
+# catalog.py
+# Lazy, database-backed item model for the DB viewer window.
+#
+# Instead of building one QTreeWidgetItem per row up front, CatalogModel
+# only knows the group headers (e.g. spell levels) when a catalog opens.
+# Rows are fetched from the database a page at a time through
+# canFetchMore/fetchMore as groups are expanded or the list is scrolled.
+# Queries run on a QThreadPool; rows come back to the GUI thread in chunks.
+
+import sys
+from collections import OrderedDict
+
+from PyQt6 import QtCore
+
+from database import QUERIES
+from components.facets import FacetIndex
+
+# Rows fetched from the database per fetchMore() call
+FETCH_BATCH = 200
+# Rows per chunk handed from a loader thread to the model
+CHUNK_SIZE = 50
+# Full records kept per catalog for recently clicked items
+RECORD_CACHE_SIZE = 32
+# Total size (characters) of rendered detail HTML kept across all viewers
+HTML_CACHE_CHARS = 4 * 1024 * 1024
+
+
+def _spell_level_label(level):
+    return "Cantrips" if level == 0 else f"{level}-Level Spells"
+
+def _category_label(category):
+    return (category or "other").replace('-', ' ').title()
+
+def _yes_no(flag):
+    return "Yes" if flag else "No"
+
+def _value_label(value):
+    return "(none)" if value is None else str(value).replace('-', ' ').title()
+
+# How each viewer data type is laid out. All SQL lives in database.QUERIES:
+#   groups:      (key, count) rows for the top-level headers, or None for a flat list
+#   group_label: header text for a group key
+#   items:       page of rows; params are (group key,) + (limit, offset) or just (limit, offset)
+#   detail:      full record of an item, by "index" (pages only hold index/name/group)
+#   children:    page of child rows of an item (params: item index, limit, offset)
+#   child_detail: full record of a child, by its index column
+#   child_count: column of an item row holding its number of children
+#   wrap:        turns a row into the data the viewer expects (races and classes use (row, kind) tuples)
+#   child_wrap:  same for child rows; also gets the parent item's data
+#   names:       every item in tree order, for the name filter (grouped catalogs only)
+#   group_column: column of an item row holding its group key
+#   facets:      (column of the names rows, label, value label, multi-valued) per facet
+CATALOGS = {
+    'spells': {
+        'groups': 'spell_levels', 'group_label': _spell_level_label,
+        'items': 'spells_page', 'detail': 'spells_item',
+        'names': 'spells_names', 'group_column': 'level',
+        'facets': [
+            ('classes', "Class", _value_label, True),
+            ('level', "Level", _spell_level_label, False),
+            ('school_index', "School", _value_label, False),
+            ('concentration', "Concentration", _yes_no, False),
+            ('ritual', "Ritual", _yes_no, False),
+            ('damage_type_index', "Damage Type", _value_label, False),
+        ],
+    },
+    'equipment': {
+        'groups': 'equipment_categories', 'group_label': _category_label,
+        'items': 'equipment_page', 'detail': 'equipment_item',
+        'names': 'equipment_names', 'group_column': 'equipment_category_index',
+        'facets': [
+            ('equipment_category_index', "Category", _category_label, False),
+            ('weapon_category', "Weapon", _value_label, False),
+            ('armor_category', "Armor", _value_label, False),
+            ('damage_type_index', "Damage Type", _value_label, False),
+        ],
+    },
+    'classes': {
+        'items': 'classes_page', 'detail': 'classes_item',
+        'children': 'subclasses_page', 'child_detail': 'subclasses_item', 'child_count': 'subclass_count',
+        'wrap': lambda row: (row, 'class'),
+        'child_wrap': lambda row, cls: ({**cls[0], **row}, 'subclass'),
+    },
+    'features': {'items': 'features_page', 'detail': 'features_item'},
+    'feats': {'items': 'feats_page', 'detail': 'feats_item'},
+    'races': {
+        'items': 'races_page', 'detail': 'races_item',
+        'children': 'subraces_page', 'child_detail': 'subraces_item', 'child_count': 'subrace_count',
+        'wrap': lambda row: (row, 'race'),
+        'child_wrap': lambda row, race: ({**race[0], **row}, 'subrace'),
+    },
+}
+
+
+def detail_key(data_type, data):
+    """
+    (data_type, index) identifying an item's record and rendered details.
+    Races and subraces are told apart as 'races' and 'subraces', classes
+    and subclasses as 'classes' and 'subclasses'.
+    """
+    if isinstance(data, tuple):
+        row, kind = data
+        if kind == 'subrace':
+            return 'subraces', row['subrace_index']
+        if kind == 'subclass':
+            return 'subclasses', row['subclass_index']
+        return data_type, row['index']
+    return data_type, data['index']
+
+
+class HtmlCache:
+    """
+    Rendered detail HTML keyed by detail_key(), least recently used dropped
+    first once the total size passes max_chars. One instance is shared by
+    all viewer windows.
+    """
+    def __init__(self, max_chars=HTML_CACHE_CHARS):
+        self.max_chars = max_chars
+        self.chars = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        html = self._entries.get(key)
+        if html is not None:
+            self._entries.move_to_end(key)
+        return html
+
+    def put(self, key, html):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.chars -= len(old)
+        self._entries[key] = html
+        self.chars += len(html)
+        while self.chars > self.max_chars and len(self._entries) > 1:
+            _, dropped = self._entries.popitem(last=False)
+            self.chars -= len(dropped)
+
+    def clear(self):
+        self._entries.clear()
+        self.chars = 0
+
+
+class NameIndex:
+    """
+    Case-insensitive substring lookup over item names, for the viewer's
+    filter box. Queries of three or more characters only check the names
+    sharing their rarest trigram; a query that extends the previous one
+    only re-checks the previous matches.
+    """
+    def __init__(self, names):
+        self.names = [name.lower() for name in names]
+        self._trigrams = {} # trigram -> positions of the names containing it, ascending
+        for pos, name in enumerate(self.names):
+            for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                self._trigrams.setdefault(gram, []).append(pos)
+        self._last = ("", range(len(self.names))) # Previous query and its matches
+
+    def matches(self, text):
+        """Positions of the names containing `text` (any case), in order."""
+        text = text.lower()
+        last_text, last_matches = self._last
+        if last_text and last_text in text:
+            candidates = last_matches
+        elif len(text) >= 3:
+            candidates = min(
+                (self._trigrams.get(text[i:i + 3], ()) for i in range(len(text) - 2)),
+                key=len,
+            )
+        else:
+            candidates = range(len(self.names))
+        names = self.names
+        found = [pos for pos in candidates if text in names[pos]]
+        self._last = (text, found)
+        return found
+
+
+class _Node:
+    """One row of the tree: the root, a group header or an item."""
+    __slots__ = ('parent', 'label', 'data', 'key', 'snippet', 'children', 'done', 'loading', 'has_children', 'pending')
+
+    def __init__(self, parent, label, data=None, key=None, has_children=False):
+        self.parent = parent
+        self.label = label
+        self.data = data # None for headers
+        self.key = key # Group value, for headers
+        self.snippet = None # Search snippet (HTML), for search hits
+        self.children = []
+        self.done = not has_children # True once every child has been fetched
+        self.loading = False # A loader is fetching children right now
+        self.has_children = has_children
+        self.pending = None # Filter matches not yet turned into children
+
+
+class _LoaderSignals(QtCore.QObject):
+    rows = QtCore.pyqtSignal(object, list) # (loader, chunk of row dicts)
+    finished = QtCore.pyqtSignal(object, int, str) # (loader, rows fetched, error message or "")
+
+
+class _NameIndexSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(object, str) # ((rows, NameIndex, FacetIndex or None) or None, error message or "")
+
+
+class _NameIndexLoader(QtCore.QRunnable):
+    """
+    Fetches every item of a catalog and builds its NameIndex (and
+    FacetIndex, if the catalog has facets) on a pool thread.
+    """
+    def __init__(self, db, sql, params, facets):
+        super().__init__()
+        self.signals = _NameIndexSignals()
+        self.db = db
+        self.sql = sql
+        self.params = params
+        self.facets = facets
+
+    def run(self):
+        _, rows, error = self.db.query(self.sql, self.params)
+        if error:
+            self.signals.finished.emit(None, error)
+            return
+        names = NameIndex(row['name'] for row in rows)
+        facets = FacetIndex(rows, self.facets) if self.facets else None
+        self.signals.finished.emit((rows, names, facets), "")
+
+
+class _PageLoader(QtCore.QRunnable):
+    """
+    Runs one page query on a pool thread and emits its rows in chunks.
+    The pool owns (and deletes) it once started, so a loader outlives a
+    closed viewer safely; `cancelled` makes it stop at the next chunk.
+    """
+    def __init__(self, db, sql, params, node, generation):
+        super().__init__()
+        self.signals = _LoaderSignals()
+        self.db = db
+        self.sql = sql
+        self.params = params
+        self.node = node
+        self.generation = generation
+        self.cancelled = False
+
+    def run(self):
+        fetched, error = 0, ""
+        try:
+            for chunk in self.db.query_chunks(self.sql, self.params, CHUNK_SIZE):
+                if self.cancelled:
+                    return
+                fetched += len(chunk)
+                self.signals.rows.emit(self, chunk)
+        except Exception as e:
+            error = self.db.error_message(e)
+        if not self.cancelled:
+            self.signals.finished.emit(self, fetched, error)
+
+
+class CatalogModel(QtCore.QAbstractItemModel):
+    """
+    Tree model over one SRD catalog (spells, equipment, ...), fetching rows
+    lazily on `pool` threads. Item data (UserRole) is a light row dict
+    (index, name, group key), or (row, kind) for races and classes; record()
+    turns it into the full record.
+    Emits `loaded` once the top level has arrived, or `load_failed` with a
+    message if it could not be loaded. Call cancel() before discarding it.
+    filter() narrows the tree by name and facets once the name index is
+    ready (load_names(), then `names_ready`).
+    """
+    loaded = QtCore.pyqtSignal()
+    load_failed = QtCore.pyqtSignal(str)
+    names_ready = QtCore.pyqtSignal()
+
+    def __init__(self, db, data_type, pool, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.data_type = data_type
+        self.spec = CATALOGS[data_type]
+        self.pool = pool
+        self.error = None
+        self.columns = 1
+        self._records = OrderedDict() # detail_key -> full record, most recent last
+        self._loaders = set() # Started loaders that haven't finished yet
+        self._generation = 0 # Bumped on reset/cancel; results of older loaders are dropped
+        self.loaded_rows = 0 # Rows currently held by the tree (for MainWindow's viewer budget)
+        self.filtered = False # The tree shows filter() results
+        self._names = None # (item rows in tree order, NameIndex, FacetIndex or None), once loaded
+        self.facet_counts = {} # column -> {value: rows}, for the last filter()
+        self._names_loader = None
+        self.root = _Node(None, "", has_children=True)
+        self._load(self.root)
+
+    # --- Loading ---
+
+    def _query(self, name, params=()):
+        _, rows, error = self.db.query(QUERIES[name], params)
+        if error:
+            self.error = error
+            print(f"Error loading {self.data_type}: {error}", file=sys.stderr)
+            return []
+        return rows
+
+    def _page_query(self, node):
+        """Returns (query name, params) for the next page of children of `node`."""
+        if node is self.root:
+            if self.spec.get('groups'):
+                # All headers in one go, after any a cancelled load already added
+                return self.spec['groups'], (-1, len(node.children))
+            return self.spec['items'], (FETCH_BATCH, len(node.children))
+        if node.data is None: # Group header
+            params = (node.key,)
+            name = self.spec['items']
+        else:
+            row = node.data[0] if isinstance(node.data, tuple) else node.data
+            params = (row['index'],)
+            name = self.spec['children']
+        return name, params + (FETCH_BATCH, len(node.children))
+
+    def _load(self, node):
+        """Starts fetching the next page of children of `node` in the background."""
+        if node.done or node.loading:
+            return
+        if node.pending is not None:
+            self._add_pending(node)
+            return
+        node.loading = True
+        name, params = self._page_query(node)
+        loader = _PageLoader(self.db, QUERIES[name], params, node, self._generation)
+        loader.signals.rows.connect(self._on_rows)
+        loader.signals.finished.connect(self._on_finished)
+        self._loaders.add(loader)
+        self.pool.start(loader)
+
+    def _add_pending(self, node):
+        """Turns the next chunk of `node`'s filter matches into rows (no query needed)."""
+        rows, node.pending = node.pending[:CHUNK_SIZE], node.pending[CHUNK_SIZE:]
+        start = len(node.children)
+        self.beginInsertRows(self._index_of(node), start, start + len(rows) - 1)
+        node.children.extend(self._make_node(node, row) for row in rows)
+        self.loaded_rows += len(rows)
+        self.endInsertRows()
+        node.done = not node.pending
+
+    def _make_node(self, parent, row):
+        """Builds the tree node for one fetched row under `parent`."""
+        if parent is self.root and self.spec.get('groups'):
+            key, count = list(row.values())
+            return _Node(parent, self.spec['group_label'](key), key=key, has_children=count > 0)
+        if parent.data is None: # Top-level item (flat list or inside a group)
+            child_count = self.spec.get('child_count')
+            data = self.spec['wrap'](row) if 'wrap' in self.spec else row
+            return _Node(parent, self._label(data), data=data,
+                         has_children=bool(child_count and row.get(child_count)))
+        data = self.spec['child_wrap'](row, parent.data)
+        return _Node(parent, self._label(data), data=data)
+
+    def _index_of(self, node):
+        if node is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.parent.children.index(node), 0, node)
+
+    @QtCore.pyqtSlot(object, list)
+    def _on_rows(self, loader, rows):
+        if loader.generation != self._generation:
+            return
+        node = loader.node
+        start = len(node.children)
+        self.beginInsertRows(self._index_of(node), start, start + len(rows) - 1)
+        node.children.extend(self._make_node(node, row) for row in rows)
+        self.loaded_rows += len(rows)
+        self.endInsertRows()
+
+    @QtCore.pyqtSlot(object, int, str)
+    def _on_finished(self, loader, fetched, error):
+        self._loaders.discard(loader)
+        if loader.generation != self._generation:
+            return
+        node = loader.node
+        node.loading = False
+        if error:
+            self.error = error
+            print(f"Error loading {self.data_type}: {error}", file=sys.stderr)
+            node.done = True
+        else:
+            grouped_root = node is self.root and self.spec.get('groups')
+            node.done = bool(grouped_root) or fetched < FETCH_BATCH
+        first_page = not loader.params or loader.params[-1] == 0
+        if node is self.root and first_page:
+            if error:
+                self.load_failed.emit(error)
+            else:
+                self.loaded.emit()
+
+    def cancel(self):
+        """
+        Stops all running loaders; their remaining rows are dropped. The
+        interrupted pages are fetched again on the next fetchMore().
+        """
+        self._generation += 1
+        for loader in self._loaders:
+            loader.cancelled = True
+            loader.node.loading = False
+            try:
+                self.pool.tryTake(loader) # Not started yet: never runs
+            except RuntimeError:
+                pass # Already finished and deleted by the pool
+        self._loaders.clear()
+
+    def _label(self, data):
+        if isinstance(data, tuple):
+            row, kind = data
+            if kind == 'subrace':
+                return row['subrace_name']
+            return row['subclass_name'] if kind == 'subclass' else row['name']
+        return data['name']
+
+    # --- Full records ---
+
+    def record(self, data):
+        """
+        Returns the full record for an item's data (same shape: dict or
+        (dict, kind)), from the cache or the database. None if it can't be loaded.
+        """
+        key = detail_key(self.data_type, data)
+        kind = data[1] if isinstance(data, tuple) else None
+        query = self.spec['child_detail'] if kind in ('subrace', 'subclass') else self.spec['detail']
+
+        cached = self._records.get(key)
+        if cached is not None:
+            self._records.move_to_end(key)
+            return cached
+
+        rows = self._query(query, (key[1],))
+        if not rows:
+            return None
+        full = (rows[0], kind) if kind else rows[0]
+        self._records[key] = full
+        if len(self._records) > RECORD_CACHE_SIZE:
+            self._records.popitem(last=False)
+        return full
+
+    # --- Name filter ---
+
+    def load_names(self):
+        """
+        Starts fetching every item name and indexing it in the background,
+        once. `names_ready` is emitted when filter() can be used.
+        """
+        if self._names is not None or self._names_loader is not None:
+            return
+        if self.spec.get('groups'):
+            name, params = self.spec['names'], ()
+        else:
+            name, params = self.spec['items'], (-1, 0) # LIMIT -1: every row
+        facets = [(column, multi) for column, _, _, multi in self.spec.get('facets', [])]
+        self._names_loader = _NameIndexLoader(self.db, QUERIES[name], params, facets)
+        self._names_loader.signals.finished.connect(self._on_names)
+        self.pool.start(self._names_loader)
+
+    def drop_names(self):
+        """Frees the name index; load_names() builds it again when needed."""
+        self._names = None
+
+    @property
+    def held_rows(self):
+        """
+        Rows held by the tree plus those held by the name index, which
+        covers the whole catalog (for MainWindow's viewer budget).
+        """
+        return self.loaded_rows + (len(self._names[0]) if self._names else 0)
+
+    @QtCore.pyqtSlot(object, str)
+    def _on_names(self, names, error):
+        self._names_loader = None
+        if error:
+            self.error = error
+            print(f"Error indexing {self.data_type}: {error}", file=sys.stderr)
+            return
+        self._names = names
+        self.names_ready.emit()
+
+    def filter(self, text, selected=None):
+        """
+        Replaces the tree with the items whose name contains `text` and that
+        match the `selected` facets ({column: set of values}), under their
+        group headers. With neither, goes back to the full catalog.
+        Matches become rows a page at a time, like catalog rows.
+        Updates facet_counts. Returns the number of matches, or None if the
+        name index isn't loaded yet (see load_names()).
+        """
+        if self._names is None:
+            return None
+        rows, index, facets = self._names
+        selected = {column: values for column, values in (selected or {}).items() if values}
+        matches = index.matches(text) if text else None
+
+        if facets is not None:
+            base = facets.mask_of(matches) if matches is not None else None
+            self.facet_counts = facets.counts(selected, base)
+            if selected:
+                mask = facets.mask(selected)
+                if base is not None:
+                    mask &= base
+                matches = facets.positions(mask)
+
+        if matches is None: # Nothing to filter by
+            if self.filtered:
+                self.show_catalog()
+            return len(rows)
+        group_column = self.spec.get('group_column')
+
+        self.cancel()
+        self.beginResetModel()
+        root = _Node(None, "", has_children=True)
+        if group_column:
+            key = object() # Never equal to a group key
+            for pos in matches:
+                row = rows[pos]
+                if row[group_column] != key:
+                    key = row[group_column]
+                    group = _Node(root, self.spec['group_label'](key), key=key, has_children=True)
+                    group.pending = []
+                    root.children.append(group)
+                group.pending.append(row)
+            root.done = True
+        else:
+            root.pending = [rows[pos] for pos in matches]
+            root.done = not matches
+        self.root = root
+        self.columns = 1
+        self.loaded_rows = len(root.children)
+        self.filtered = True
+        self.endResetModel()
+        return len(matches)
+
+    # --- Search hits ---
+
+    def show_hits(self, hits):
+        """
+        Replaces the tree with a flat list of search hits (name | snippet).
+        `hits` are SrdDatabase.search() rows for this catalog's data type.
+        """
+        self.cancel()
+        self.beginResetModel()
+        root = _Node(None, "")
+        for hit in hits:
+            node = _Node(root, hit['name'], data={'index': hit['item_index'], 'name': hit['name']})
+            node.snippet = hit['snippet'] or ""
+            root.children.append(node)
+        self.root = root
+        self.columns = 2
+        self.loaded_rows = len(hits)
+        self.filtered = False
+        self.endResetModel()
+
+    def show_catalog(self):
+        """Goes back to the full, grouped catalog (reloaded in the background)."""
+        self.cancel()
+        self.beginResetModel()
+        self.root = _Node(None, "", has_children=True)
+        self.columns = 1
+        self.loaded_rows = 0
+        self.filtered = False
+        self.endResetModel()
+        self._load(self.root)
+
+    # --- QAbstractItemModel ---
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        if 0 <= row < len(node.children) and 0 <= column < self.columns:
+            return self.createIndex(row, column, node.children[row])
+        return QtCore.QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.parent.children.index(parent), 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return self.columns
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        return bool(node.children) or node.has_children
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return not node.done and not node.loading
+
+    def fetchMore(self, parent):
+        # Rows are inserted as the loader's chunks arrive (_on_rows)
+        self._load(self._node(parent))
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.ItemFlag.NoItemFlags
+        if index.internalPointer().data is None:
+            return QtCore.Qt.ItemFlag.ItemIsEnabled # Group headers can't be selected
+        return QtCore.Qt.ItemFlag.ItemIsEnabled | QtCore.Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            if index.column() == 0:
+                return node.label
+            return (node.snippet or "").replace('<b>', '').replace('</b>', '').replace('\n', ' ')
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole and index.column() == 1:
+            return node.snippet
+        if role == QtCore.Qt.ItemDataRole.UserRole:
+            return node.data
+        return None
@@ -0,0 +1,78 @@
+# facets.py
+# Bitset index for faceted filtering of a catalog (school, class, ritual, ...).
+#
+# Every facet value gets one Python int with bit i set when row i has that
+# value. Combining facets is then a few ANDs/ORs, and the count next to each
+# value is a popcount, so selections and live counts don't touch the database.
+# Nothing here needs Qt.
+
+
+def _to_bits(positions, size):
+    """Bitset (int) with the bits at `positions` set."""
+    mask = bytearray((size + 7) // 8)
+    for pos in positions:
+        mask[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(mask, 'little')
+
+
+class FacetIndex:
+    """
+    Facet value bitsets over `rows` (dicts, in tree order).
+    `facets` is [(column, multi)]; a multi-valued column holds its values
+    comma-separated (e.g. a spell's classes). Selections are
+    {column: set of values}: values of one facet are OR-ed, facets AND-ed.
+    """
+    def __init__(self, rows, facets):
+        self.size = len(rows)
+        self.all = (1 << self.size) - 1
+        self.columns = [column for column, _ in facets]
+        self.values = {} # column -> {value: bitset}
+        for column, multi in facets:
+            positions = {}
+            for pos, row in enumerate(rows):
+                value = row.get(column)
+                if multi:
+                    for part in (value.split(',') if value else [None]):
+                        positions.setdefault(part, []).append(pos)
+                else:
+                    positions.setdefault(value, []).append(pos)
+            self.values[column] = {
+                value: _to_bits(found, self.size)
+                for value, found in sorted(positions.items(), key=lambda item: (item[0] is None, item[0]))
+            }
+
+    def mask(self, selected, skip=None):
+        """Rows matching every selected facet except `skip`, as a bitset."""
+        mask = self.all
+        for column, values in selected.items():
+            if column == skip or not values:
+                continue
+            bits = self.values.get(column, {})
+            either = 0
+            for value in values:
+                either |= bits.get(value, 0)
+            mask &= either
+        return mask
+
+    def mask_of(self, positions):
+        """Bitset of a list of row positions (e.g. name filter matches)."""
+        return _to_bits(positions, self.size)
+
+    def positions(self, mask):
+        """Row positions set in `mask`, ascending."""
+        bits = bin(mask)[:1:-1] # Lowest bit first
+        return [pos for pos, bit in enumerate(bits) if bit == '1']
+
+    def counts(self, selected, base=None):
+        """
+        {column: {value: rows}} for the current selection. Each facet is
+        counted as if its own selection were cleared, so a count says how
+        many rows picking (or also picking) that value would give.
+        `base` restricts everything further (e.g. to name filter matches).
+        """
+        base = self.all if base is None else base
+        counts = {}
+        for column in self.columns:
+            others = self.mask(selected, skip=column) & base
+            counts[column] = {value: (others & bits).bit_count() for value, bits in self.values[column].items()}
+        return counts
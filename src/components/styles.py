@@ -49,7 +49,7 @@ QPushButton#modButton {
 /* ---------- NEW: Styles for the DB Viewer Window ---------- */
 
 /* The Tree Widget (Left Panel) */
-QTreeWidget#viewerTree {
+QTreeView#viewerTree, QTreeView#facetTree {
     background-color: #18181b; /* Darker than the list */
     border: 1px solid #2a2a2f;
     border-radius: 6px;
@@ -57,29 +57,29 @@ QTreeWidget#viewerTree {
     padding: 4px;
 }
 /* Top-level items (e.g., "Cantrips") */
-QTreeWidget::item:!selected {
+QTreeView::item:!selected {
     color: #cfd8dd;
     font-weight: 700;
     padding-top: 5px;
     padding-bottom: 5px;
 }
 /* Child items (e.g., "Fire Bolt") */
-QTreeWidget::item:!selected:!parent {
+QTreeView::item:!selected:!parent {
     color: #e6eef3;
     font-weight: 400;
     padding: 0px;
 }
-QTreeWidget::item:selected {
+QTreeView::item:selected {
     background: #3fbb7b; /* Accent green */
     color: #0f1113;
     font-weight: 700;
 }
-QTreeWidget::branch:has-children:!has-siblings:closed,
-QTreeWidget::branch:closed:has-children:has-siblings {
+QTreeView::branch:has-children:!has-siblings:closed,
+QTreeView::branch:closed:has-children:has-siblings {
     image: url(icons:light/rightarrow.png); /* Use built-in icons */
 }
-QTreeWidget::branch:open:has-children:!has-siblings,
-QTreeWidget::branch:open:has-children:has-siblings {
+QTreeView::branch:open:has-children:!has-siblings,
+QTreeView::branch:open:has-children:has-siblings {
     image: url(icons:light/downarrow.png); /* Use built-in icons */
 }
 
@@ -12,6 +12,8 @@ class EquipmentSlot(QtWidgets.QLabel):
     Accepts drops from QListWidget inventory items. Shows item text.
     Double-click to clear.
     """
+    item_changed = QtCore.pyqtSignal(object) # Item text, None when cleared by the user
+
     def __init__(self, placeholder="Empty", parent=None):
         super().__init__(parent)
         self.setObjectName("equipSlot")
@@ -40,14 +42,12 @@ class EquipmentSlot(QtWidgets.QLabel):
         text = event.mimeData().text()
         self.set_item(text)
         event.acceptProposedAction()
-        # HOOK: emit a signal or call a method to inform your backend that
-        # `text` was equipped into this slot.
-        # Example: self.item_equipped.emit(self, text)
+        self.item_changed.emit(text)
 
     def mouseDoubleClickEvent(self, event: QtGui.QMouseEvent) -> None:
         # clear slot on double-click
         self.clear_item()
-        # HOOK: inform backend that this slot was cleared.
+        self.item_changed.emit(None)
 
     def set_item(self, text):
         self.item_text = text
@@ -80,6 +80,8 @@ class InventoryList(QtWidgets.QListWidget):
     Draggable list widget. Each item has plain text.
     UPDATED: Now also accepts drops to add new items.
     """
+    item_dropped = QtCore.pyqtSignal(str) # Text of an item the user dropped in
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.SingleSelection)
@@ -106,6 +108,7 @@ class InventoryList(QtWidgets.QListWidget):
             if not self.findItems(text, QtCore.Qt.MatchFlag.MatchExactly):
                 self.addItem(text)
                 event.acceptProposedAction()
+                self.item_dropped.emit(text)
         else:
             event.ignore()
 
@@ -139,11 +142,19 @@ class ImageLabel(QtWidgets.QLabel):
     A QLabel that accepts clicks to open an image file dialog.
     Displays the selected image.
     """
+    image_changed = QtCore.pyqtSignal(str) # Path of an image the user picked
+
     def __init__(self, placeholder_text="Image", parent=None):
         super().__init__(parent)
-        self.setText(placeholder_text)
+        self.placeholder_text = placeholder_text
         self.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
         self.setFixedSize(120, 120) # Changed: Made smaller and square
+        self.clear_image()
+
+    def clear_image(self):
+        """Back to the placeholder (replaces any image shown)."""
+        self.image_path = None
+        self.setText(self.placeholder_text)
         self.setStyleSheet("""
             ImageLabel {
                 background: #0f1113;
@@ -156,7 +167,6 @@ class ImageLabel(QtWidgets.QLabel):
                 color: #e6eef3;
             }
         """)
-        self.image_path = None
 
     def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
@@ -167,6 +177,7 @@ class ImageLabel(QtWidgets.QLabel):
         )
         if file_path:
             self.set_image(file_path)
+            self.image_changed.emit(file_path)
 
     def set_image(self, file_path):
         self.image_path = file_path
@@ -0,0 +1,335 @@
+# database.py
+# Long-lived, read-only access to the SRD database for the app.
+#
+# The SRD database never changes while the app runs, so instead of opening
+# a connection per query, each thread lazily opens one read-only connection
+# and keeps it (with its prepared-statement cache) until close().
+#
+# With in_memory=True the file is read once into an in-memory image (SQLite
+# backup API); every thread gets its own copy of that image, and query
+# results are kept, so repeated lookups touch neither the disk nor SQLite.
+
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Prepared statements kept per connection (sqlite3's default is 128)
+STATEMENT_CACHE_SIZE = 256
+# Map up to this many bytes of the database file instead of read() calls
+MMAP_SIZE = 256 * 1024 * 1024
+# Distinct (query, params) results kept in in-memory mode
+RESULT_CACHE_SIZE = 64
+# Most search hits returned at once
+SEARCH_LIMIT = 100
+
+# Viewer data types covered by the SrdSearch full-text index
+SEARCH_KINDS = ('spells', 'features', 'feats', 'equipment')
+
+# Every query the app issues, by name. Keep new lookups here so
+# query_audit.py can check that they stay index-backed.
+QUERIES = {
+    # Catalog viewers (components/catalog.py): group headers, then pages of
+    # rows fetched as the tree is expanded/scrolled (params end in LIMIT, OFFSET).
+    # Pages only carry what the tree shows; full records come from the *_item
+    # queries when an item is clicked.
+    'spell_levels': "SELECT level, count(*) AS n FROM Spell GROUP BY level ORDER BY level LIMIT ? OFFSET ?",
+    'spells_page': """
+        SELECT "index", name, level FROM Spell
+        WHERE level = ? ORDER BY name LIMIT ? OFFSET ?
+    """,
+    'equipment_categories': """
+        SELECT equipment_category_index, count(*) AS n FROM Equipment
+        GROUP BY equipment_category_index ORDER BY equipment_category_index
+        LIMIT ? OFFSET ?
+    """,
+    'equipment_page': """
+        SELECT "index", name, equipment_category_index FROM Equipment
+        WHERE equipment_category_index = ? ORDER BY name LIMIT ? OFFSET ?
+    """,
+    # Every item of a grouped catalog in tree order, with its facet columns,
+    # for the name filter and facets (flat catalogs use their *_page query
+    # with LIMIT -1). classes is a comma-separated list.
+    'spells_names': """
+        SELECT "index", name, level, school_index, concentration, ritual, damage_type_index,
+               (SELECT group_concat(class_index) FROM SpellClass AS C
+                WHERE C.spell_index = S."index") AS classes
+        FROM Spell AS S ORDER BY level, name
+    """,
+    'equipment_names': """
+        SELECT "index", name, equipment_category_index,
+               weapon_category, armor_category, damage_type_index
+        FROM Equipment
+        ORDER BY equipment_category_index, name
+    """,
+    'classes_page': """
+        SELECT C."index", C.name,
+               (SELECT count(*) FROM Subclass AS S WHERE S.class_index = C."index") AS subclass_count
+        FROM Class AS C
+        ORDER BY C.name LIMIT ? OFFSET ?
+    """,
+    'subclasses_page': """
+        SELECT name AS subclass_name, "index" AS subclass_index
+        FROM Subclass WHERE class_index = ?
+        ORDER BY name LIMIT ? OFFSET ?
+    """,
+    'features_page': 'SELECT "index", name FROM Feature ORDER BY name LIMIT ? OFFSET ?',
+    'feats_page': 'SELECT "index", name FROM Feat ORDER BY name LIMIT ? OFFSET ?',
+    'races_page': """
+        SELECT R."index", R.name,
+               (SELECT count(*) FROM Subrace AS S WHERE S.race_index = R."index") AS subrace_count
+        FROM Race AS R
+        ORDER BY R.name LIMIT ? OFFSET ?
+    """,
+    'subraces_page': """
+        SELECT name AS subrace_name, "index" AS subrace_index
+        FROM Subrace WHERE race_index = ?
+        ORDER BY name LIMIT ? OFFSET ?
+    """,
+    # Full records by "index", for the details panel
+    'spells_item': 'SELECT * FROM Spell WHERE "index" = ?',
+    'equipment_item': 'SELECT * FROM Equipment WHERE "index" = ?',
+    'classes_item': 'SELECT * FROM Class WHERE "index" = ?',
+    # A subclass with its class's columns
+    'subclasses_item': """
+        SELECT
+            C.*,
+            S.name AS subclass_name,
+            S."index" AS subclass_index,
+            S.desc AS subclass_desc,
+            S.subclass_flavor
+        FROM Subclass AS S
+        JOIN Class AS C ON C."index" = S.class_index
+        WHERE S."index" = ?
+    """,
+    'features_item': 'SELECT * FROM Feature WHERE "index" = ?',
+    'feats_item': 'SELECT * FROM Feat WHERE "index" = ?',
+    'races_item': 'SELECT * FROM Race WHERE "index" = ?',
+    # A subrace with its race's columns, as the old Race/Subrace join returned it
+    'subraces_item': """
+        SELECT
+            R.*,
+            S.name as subrace_name,
+            S."index" as subrace_index,
+            S.description as subrace_desc
+        FROM Subrace AS S
+        JOIN Race AS R ON R."index" = S.race_index
+        WHERE S."index" = ?
+    """,
+    # Read-optimized tables built by populate.py: one primary-key lookup each
+    'class_progression': 'SELECT * FROM ClassProgression WHERE class_index = ? AND level = ?',
+    'subclass_progression': 'SELECT * FROM SubclassProgression WHERE subclass_index = ? AND level = ?',
+    # Every level of a class with a subclass's features alongside (params: subclass, class)
+    'class_levels': """
+        SELECT C.*, S.subclass_name, S.all_features_json AS subclass_features_json
+        FROM ClassProgression AS C
+        LEFT JOIN SubclassProgression AS S ON S.subclass_index = ? AND S.level = C.level
+        WHERE C.class_index = ?
+        ORDER BY C.level
+    """,
+    'race_summary': 'SELECT * FROM RaceSummary WHERE "index" = ?',
+    'spell_list': 'SELECT * FROM SpellList WHERE owner_index = ? AND spell_level = ?',
+    # SRD ids used by saved character files (charfile.py), one kind at a time
+    'srd_refs': 'SELECT id, "index", name FROM SrdRef WHERE kind = ?',
+    # Armor and shields, for armor class (derived.py)
+    'armor': """
+        SELECT name, armor_category, armor_class_base, armor_class_dex_bonus, armor_class_max_bonus
+        FROM Equipment WHERE equipment_category_index = 'armor'
+    """,
+    # Full-text search, best matches first. Matches in the name weigh most.
+    'search': """
+        SELECT kind, item_index, name,
+               snippet(SrdSearch, -1, '<b>', '</b>', '…', 12) AS snippet
+        FROM SrdSearch
+        WHERE SrdSearch MATCH ? AND rank MATCH 'bm25(10.0, 1.0, 0.5)'
+        ORDER BY rank
+        LIMIT ?
+    """,
+    'search_kind': """
+        SELECT kind, item_index, name,
+               snippet(SrdSearch, -1, '<b>', '</b>', '…', 12) AS snippet
+        FROM SrdSearch
+        WHERE SrdSearch MATCH ? AND rank MATCH 'bm25(10.0, 1.0, 0.5)' AND kind = ?
+        ORDER BY rank
+        LIMIT ?
+    """,
+}
+
+
+def fts_query(text):
+    """
+    Turns free text into an FTS5 query: every word must match, as a prefix.
+    ("fire dam" -> '"fire"* "dam"*'). Returns None if there are no words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class SrdDatabase:
+    """
+    Read-only SRD database shared by the whole app.
+    Queries return (headers, rows_as_dicts, error_message); on error
+    headers and rows are None and error_message says what went wrong.
+    In in-memory mode the returned lists and dicts are shared between
+    callers, so treat them as read-only.
+    """
+    def __init__(self, db_path, in_memory=False):
+        self.db_path = os.path.abspath(db_path)
+        self.in_memory = in_memory
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._image = None # Serialized in-memory copy of the database
+        self._results = OrderedDict() # (sql, params) -> (headers, rows)
+
+    def _connect(self, database, uri=False):
+        return sqlite3.connect(
+            database, uri=uri,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,  # Only so close() can run from any thread
+        )
+
+    def load(self):
+        """
+        Reads the database file into the in-memory image if that hasn't
+        happened yet. Called on first use, or up front to pay the cost at startup.
+        Raises FileNotFoundError if the DB is missing.
+        """
+        with self._lock:
+            if self._image is not None:
+                return
+            if not os.path.exists(self.db_path):
+                raise FileNotFoundError(self.db_path)
+            source = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            memory = sqlite3.connect(":memory:")
+            try:
+                source.backup(memory)
+                self._image = memory.serialize()
+            finally:
+                source.close()
+                memory.close()
+
+    def _open(self):
+        """Opens this thread's connection. Raises FileNotFoundError if the DB is missing."""
+        if self.in_memory:
+            self.load()
+            conn = self._connect(":memory:")
+            conn.deserialize(self._image)
+        else:
+            if not os.path.exists(self.db_path):
+                raise FileNotFoundError(self.db_path)
+            conn = self._connect(f"file:{self.db_path}?mode=ro", uri=True)
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """Returns the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def _cached(self, key):
+        """Returns a cached (headers, rows) result in in-memory mode, else None."""
+        if not self.in_memory:
+            return None
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+            return cached
+
+    def _cache(self, key, headers, data_as_dicts):
+        if self.in_memory:
+            with self._lock:
+                self._results[key] = (headers, data_as_dicts)
+                if len(self._results) > RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+
+    def error_message(self, error):
+        """The message query() reports for an exception raised while querying."""
+        if isinstance(error, FileNotFoundError):
+            return f"Database file not found. Looked for:\n{self.db_path}"
+        return f"Database error: {error}"
+
+    def query(self, sql, params=()):
+        """
+        Runs a query on the shared connection.
+        Returns: (headers, data_as_dicts, error_message)
+        """
+        key = (sql, tuple(params))
+        cached = self._cached(key)
+        if cached is not None:
+            return cached[0], cached[1], None
+
+        try:
+            cursor = self.connection().execute(sql, params)
+            rows = cursor.fetchall()
+        except (FileNotFoundError, sqlite3.Error) as e:
+            return None, None, self.error_message(e)
+
+        if not rows:
+            headers, data_as_dicts = [], [] # No results, but not an error
+        else:
+            headers = [desc[0] for desc in cursor.description]
+            data_as_dicts = [dict(row) for row in rows]
+
+        self._cache(key, headers, data_as_dicts)
+        return headers, data_as_dicts, None
+
+    def query_chunks(self, sql, params=(), chunk_size=100):
+        """
+        Runs a query and yields its rows as lists of at most `chunk_size`
+        dicts, so callers can hand rows on before the query finishes.
+        Raises FileNotFoundError or sqlite3.Error (see error_message()).
+        """
+        key = (sql, tuple(params))
+        cached = self._cached(key)
+        if cached is not None:
+            rows = cached[1]
+            for start in range(0, len(rows), chunk_size):
+                yield rows[start:start + chunk_size]
+            return
+
+        cursor = self.connection().execute(sql, params)
+        data_as_dicts = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = [dict(row) for row in rows]
+            data_as_dicts += chunk
+            yield chunk
+
+        headers = [desc[0] for desc in cursor.description] if data_as_dicts else []
+        self._cache(key, headers, data_as_dicts)
+
+    def search(self, text, kind=None, limit=SEARCH_LIMIT):
+        """
+        Full-text search, optionally within one viewer data type.
+        Returns (headers, hits, error_message); each hit has kind, item_index,
+        name and an HTML snippet with the matched words in <b>.
+        """
+        match = fts_query(text)
+        if match is None:
+            return [], [], None
+        if kind is None:
+            return self.query(QUERIES['search'], (match, limit))
+        return self.query(QUERIES['search_kind'], (match, kind, limit))
+
+    def close(self):
+        """Closes every connection opened by any thread and drops the in-memory copy."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._image = None
+            self._results.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
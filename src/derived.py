@@ -0,0 +1,186 @@
+# derived.py
+# Stats that follow from other fields of a Character: ability modifiers,
+# proficiency bonus, skills, initiative, passive perception and armor class.
+#
+# Each stat is a node with the nodes or Character addresses (see
+# character.py) it reads. When some addresses change, only the nodes
+# downstream of them are evaluated again, in dependency order (stopping
+# where a value comes out unchanged), and the stats that differ are
+# written back to the character in one update.
+# Changing DEX re-evaluates the DEX modifier, initiative, AC and the three
+# DEX skills; nothing else. No Qt here.
+
+import sys
+
+from character import DEFAULTS
+from charfile import ABILITIES
+from database import QUERIES
+
+SKILL_ABILITIES = {
+    "Acrobatics": "DEX", "Animal Handling": "WIS", "Arcana": "INT",
+    "Athletics": "STR", "Deception": "CHA", "History": "INT",
+    "Insight": "WIS", "Intimidation": "CHA", "Investigation": "INT",
+    "Medicine": "WIS", "Nature": "INT", "Perception": "WIS",
+    "Performance": "CHA", "Persuasion": "CHA", "Religion": "INT",
+    "Sleight of Hand": "DEX", "Stealth": "DEX", "Survival": "WIS",
+}
+
+
+class ArmorTable:
+    """Armor class columns of every armor and shield, read once on first use."""
+    def __init__(self, db):
+        self.db = db
+        self._armor = None # name -> (category, base, dex bonus, max dex bonus)
+
+    def get(self, name):
+        if self._armor is None:
+            _, rows, error = self.db.query(QUERIES['armor'])
+            if error:
+                print(f"Error loading armor: {error}", file=sys.stderr)
+                rows = []
+            self._armor = {
+                row['name']: (row['armor_category'], row['armor_class_base'],
+                              row['armor_class_dex_bonus'], row['armor_class_max_bonus'])
+                for row in rows
+            }
+        return self._armor.get(name)
+
+
+def ability_mod(score):
+    """e.g. +2 for 14-15."""
+    return score // 2 - 5
+
+
+class DerivedStats:
+    """
+    Keeps `character`'s derived stats up to date. `progression`
+    (ProgressionEngine) supplies the class's proficiency bonus and `armor`
+    (ArmorTable) the equipped armor; without them the level-based bonus
+    and unarmored AC are used.
+    """
+    def __init__(self, character, progression=None, armor=None):
+        self.character = character
+        self.progression = progression
+        self.armor = armor
+        self.values = {} # node -> last computed value
+        self._writing = False
+
+        # node -> (inputs, function of the inputs' values)
+        nodes = {}
+        for ability in ABILITIES:
+            nodes[('mod', ability)] = ([('abilities', ability)], ability_mod)
+        nodes['prof_bonus'] = (['level', 'class_index', 'subclass_index'], self._prof_bonus)
+        for skill, ability in SKILL_ABILITIES.items():
+            nodes[('skills', skill)] = (
+                [('mod', ability), 'prof_bonus', ('skill_proficiency', skill)],
+                lambda mod, prof, proficiency: mod + prof * proficiency,
+            )
+        nodes['initiative'] = ([('mod', 'DEX')], lambda mod: mod)
+        nodes['passive_perception'] = ([('skills', 'Perception')], lambda skill: 10 + skill)
+        # 'equipment' stands for every slot
+        nodes['ac'] = ([('mod', 'DEX'), 'equipment'], self._armor_class)
+        self.nodes = nodes
+        # Nodes that are character fields (the rest are intermediate)
+        self.outputs = {node for node in nodes if (node[0] if isinstance(node, tuple) else node) in DEFAULTS}
+
+        # Evaluation order: every node after the nodes it reads
+        self.order = []
+        placed = set()
+        def place(node):
+            if node in placed:
+                return
+            placed.add(node)
+            for source in nodes[node][0]:
+                if source in nodes:
+                    place(source)
+            self.order.append(node)
+        for node in nodes:
+            place(node)
+
+        self.dependents = {} # input -> nodes reading it
+        for node, (inputs, _) in nodes.items():
+            for source in inputs:
+                self.dependents.setdefault(source, []).append(node)
+
+    # --- Nodes ---
+
+    def _prof_bonus(self, level, class_index, subclass_index):
+        info = self.progression.at(class_index, level, subclass_index) if self.progression and class_index else None
+        if info is not None and info.prof_bonus:
+            return info.prof_bonus
+        return 2 + (max(level, 1) - 1) // 4
+
+    def _armor_class(self, dex_mod, equipment):
+        """Worn armor (or 10) plus the DEX it allows, plus the best shield."""
+        body, shield = 10 + dex_mod, 0
+        for item in equipment.values():
+            armor = self.armor.get(item) if self.armor and item else None
+            if armor is None:
+                continue
+            category, base, dex_bonus, max_bonus = armor
+            if category == 'Shield':
+                shield = max(shield, base or 0)
+            elif dex_bonus:
+                body = (base or 10) + (dex_mod if max_bonus is None else min(dex_mod, max_bonus))
+            else:
+                body = base or 10
+        return body + shield
+
+    # --- Recomputing ---
+
+    def _field(self, address):
+        """The character's current value at `address`."""
+        if isinstance(address, tuple):
+            field, key = address
+            return getattr(self.character, field)[key]
+        return getattr(self.character, address)
+
+    def _input(self, source):
+        return self.values[source] if source in self.nodes else self._field(source)
+
+    def recompute(self, addresses=None):
+        """
+        Re-evaluates the nodes downstream of `addresses` (default: all),
+        writes changed stats to the character and returns them as
+        {address: value}.
+        """
+        if self._writing:
+            return {}
+        full = addresses is None or not self.values
+        if full:
+            stale = set(self.nodes)
+        else:
+            stale = set()
+            for address in addresses:
+                stale.update(self.dependents.get(address, ()))
+                if isinstance(address, tuple): # ('equipment', slot) -> 'equipment'
+                    stale.update(self.dependents.get(address[0], ()))
+            if not stale:
+                return {}
+
+        # In order, so a node's inputs are settled before it runs. A node
+        # that comes out the same doesn't make its dependents stale.
+        written, updates = {}, {}
+        for node in self.order:
+            if node not in stale:
+                continue
+            inputs, function = self.nodes[node]
+            value = function(*(self._input(source) for source in inputs))
+            if not full and self.values[node] == value:
+                continue
+            self.values[node] = value
+            stale.update(self.dependents.get(node, ()))
+            # Stats are character fields: write the ones that differ in one update
+            if node in self.outputs and self._field(node) != value:
+                written[node] = value
+                if isinstance(node, tuple):
+                    updates.setdefault(node[0], {})[node[1]] = value
+                else:
+                    updates[node] = value
+        if updates:
+            self._writing = True
+            try:
+                self.character.update(updates)
+            finally:
+                self._writing = False
+        return written
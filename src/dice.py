@@ -1,6 +1,527 @@
-import random 
+# dice.py
+# Dice rolling engine shared by the GUI and headless scripts.
+#
+# All rolls go through a single DiceEngine. When NumPy is installed the
+# engine draws dice in bulk through a numpy Generator and hands back compact
+# integer arrays; without it, it falls back to the stdlib `random` module.
+#
+# Dice expressions ("4d6kh3", "2d20kl1+5", "1d8") are compiled once into a
+# DicePlan by compile_expression(); plans are memoized by expression text.
+#
+# DicePlan.distribution() computes the exact outcome distribution of a plan
+# by convolution, built from cached per-die distributions.
+
+import bisect
+import functools
+import math
+import random
+import re
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the stdlib fallback is used instead
+    np = None
 
 dices = [4, 6, 8, 10, 12, 20, 100]
 
+# Upper bound on the number of dice materialized at once by roll_sum.
+# Larger requests are summed block by block to keep memory flat.
+MAX_BLOCK_DICE = 1 << 22
+
+
+def _dtype_for(num_sides):
+    """Returns the smallest unsigned dtype that can hold a single die."""
+    if num_sides <= 0xFF:
+        return np.uint8
+    if num_sides <= 0xFFFF:
+        return np.uint16
+    return np.uint32
+
+
+class DiceEngine:
+    """
+    Batched dice roller.
+
+    `roll` returns per-die results, `roll_sum` only the totals. Both accept
+    an optional `trials` count to roll the same pool many times at once,
+    e.g. `roll_sum(8, 6, trials=10_000)` for ten thousand fireballs.
+    """
+    def __init__(self, seed=None):
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Re-seeds the underlying generator (None = fresh OS entropy)."""
+        if np is not None:
+            self._rng = np.random.default_rng(seed)
+        else:
+            self._rng = random.Random(seed)
+
+    def roll(self, num_dice, num_sides, trials=None):
+        """
+        Rolls `num_dice` dice with `num_sides` sides.
+        Returns an array of shape (num_dice,), or (trials, num_dice) when
+        `trials` is given. Without NumPy, returns (nested) lists instead.
+        """
+        _check_pool(num_dice, num_sides)
+        if np is not None:
+            shape = num_dice if trials is None else (trials, num_dice)
+            return self._rng.integers(1, num_sides + 1, size=shape, dtype=_dtype_for(num_sides))
+
+        faces = range(1, num_sides + 1)
+        if trials is None:
+            return self._rng.choices(faces, k=num_dice)
+        return [self._rng.choices(faces, k=num_dice) for _ in range(trials)]
+
+    def roll_sum(self, num_dice, num_sides, trials=None):
+        """
+        Rolls `num_dice` dice with `num_sides` sides and returns only the total.
+        Returns an int, or an int64 array of `trials` totals when `trials` is given
+        (a list without NumPy).
+        """
+        _check_pool(num_dice, num_sides)
+        if np is None:
+            faces = range(1, num_sides + 1)
+            if trials is None:
+                return sum(self._rng.choices(faces, k=num_dice))
+            return [sum(self._rng.choices(faces, k=num_dice)) for _ in range(trials)]
+
+        if trials is None:
+            return int(self._sum_block(num_dice, num_sides, 1)[0])
+
+        totals = np.empty(trials, dtype=np.int64)
+        rows_per_block = max(1, MAX_BLOCK_DICE // max(num_dice, 1))
+        for start in range(0, trials, rows_per_block):
+            stop = min(start + rows_per_block, trials)
+            totals[start:stop] = self._sum_block(num_dice, num_sides, stop - start)
+        return totals
+
+    def _sum_block(self, num_dice, num_sides, rows):
+        """Sums `rows` pools of dice, splitting very wide pools into column blocks."""
+        totals = np.zeros(rows, dtype=np.int64)
+        cols_per_block = max(1, MAX_BLOCK_DICE // rows)
+        dtype = _dtype_for(num_sides)
+        for start in range(0, num_dice, cols_per_block):
+            cols = min(cols_per_block, num_dice - start)
+            block = self._rng.integers(1, num_sides + 1, size=(rows, cols), dtype=dtype)
+            totals += block.sum(axis=1, dtype=np.int64)
+        return totals
+
+    def roll_pool(self, pool):
+        """
+        Rolls a dice pool like the GUI's dice queue, e.g. {6: 2, 20: 1}.
+        Returns (total, {sides: [individual rolls]}) with sides in ascending order.
+        """
+        total = 0
+        details = {}
+        for sides, count in sorted(pool.items()):
+            rolls = [int(r) for r in self.roll(count, sides)]
+            total += sum(rolls)
+            details[sides] = rolls
+        return total, details
+
+
+def _check_pool(num_dice, num_sides):
+    if num_dice < 0:
+        raise ValueError(f"Cannot roll a negative number of dice: {num_dice}")
+    if num_sides < 1:
+        raise ValueError(f"A die needs at least one side, got d{num_sides}")
+
+
+# Default engine used by the module-level helpers and the GUI.
+engine = DiceEngine()
+
+
 def roll_dice(num_dice, num_sides):
-    return [random.randint(1, num_sides) for _ in range(num_dice)]
\ No newline at end of file
+    """Rolls `num_dice` dice with `num_sides` sides and returns the results as a list."""
+    rolls = engine.roll(num_dice, num_sides)
+    return rolls.tolist() if np is not None else rolls
+
+
+def roll_sum(num_dice, num_sides, trials=None):
+    """Shortcut for `engine.roll_sum`."""
+    return engine.roll_sum(num_dice, num_sides, trials)
+
+
+# ---------- Dice expressions ----------
+
+class DiceExpressionError(ValueError):
+    """Raised when a dice expression cannot be parsed."""
+
+
+class DiceTerm:
+    """
+    One `NdS` group of an expression, optionally keeping only the highest
+    or lowest `keep_count` dice. `sign` is +1 or -1.
+    """
+    __slots__ = ('count', 'sides', 'keep', 'keep_count', 'sign')
+
+    def __init__(self, count, sides, keep=None, keep_count=None, sign=1):
+        self.count = count
+        self.sides = sides
+        self.keep = keep # None, 'h' (highest) or 'l' (lowest)
+        self.keep_count = count if keep is None else keep_count
+        self.sign = sign
+
+    def __str__(self):
+        text = f"{self.count}d{self.sides}"
+        if self.keep is not None:
+            text += f"k{self.keep}{self.keep_count}"
+        return text
+
+    def kept(self, rolls):
+        """Returns the dice that count towards the total, in rolled order."""
+        if self.keep is None:
+            return list(rolls)
+        order = sorted(range(len(rolls)), key=rolls.__getitem__, reverse=self.keep == 'h')
+        keep_positions = sorted(order[:self.keep_count])
+        return [rolls[i] for i in keep_positions]
+
+    def roll(self, engine):
+        """Rolls the group once. Returns (subtotal, rolls, kept)."""
+        rolls = [int(r) for r in engine.roll(self.count, self.sides)]
+        kept = self.kept(rolls)
+        return self.sign * sum(kept), rolls, kept
+
+    def roll_many(self, engine, trials):
+        """Rolls the group `trials` times and returns the signed subtotals."""
+        if self.keep is None:
+            totals = engine.roll_sum(self.count, self.sides, trials)
+        elif np is not None:
+            rolls = np.sort(engine.roll(self.count, self.sides, trials), axis=1)
+            kept = rolls[:, self.count - self.keep_count:] if self.keep == 'h' else rolls[:, :self.keep_count]
+            totals = kept.sum(axis=1, dtype=np.int64)
+        else:
+            totals = [sum(self.kept(rolls)) for rolls in engine.roll(self.count, self.sides, trials)]
+
+        if self.sign > 0:
+            return totals
+        return -totals if np is not None else [-t for t in totals]
+
+
+class DicePlan:
+    """
+    A compiled dice expression: a tuple of DiceTerm groups plus a flat
+    modifier. Plans are immutable and safe to share; get them through
+    compile_expression() so repeated expressions reuse the same plan.
+    """
+    __slots__ = ('text', 'terms', 'modifier', '_distribution')
+
+    def __init__(self, text, terms, modifier):
+        self.text = text
+        self.terms = tuple(terms)
+        self.modifier = modifier
+        self._distribution = None
+
+    def __str__(self):
+        parts = []
+        for term in self.terms:
+            parts.append(("- " if term.sign < 0 else "+ ") + str(term))
+        if self.modifier or not parts:
+            parts.append(f"- {abs(self.modifier)}" if self.modifier < 0 else f"+ {self.modifier}")
+        formula = " ".join(parts)
+        return formula[2:] if formula.startswith("+ ") else "-" + formula[2:]
+
+    def __repr__(self):
+        return f"DicePlan({self.text!r})"
+
+    @property
+    def minimum(self):
+        return self.modifier + sum(
+            t.sign * (t.keep_count if t.sign > 0 else t.keep_count * t.sides) for t in self.terms
+        )
+
+    @property
+    def maximum(self):
+        return self.modifier + sum(
+            t.sign * (t.keep_count * t.sides if t.sign > 0 else t.keep_count) for t in self.terms
+        )
+
+    def roll(self, dice_engine=None):
+        """
+        Rolls the expression once.
+        Returns (total, details) where details is a list of
+        (term, rolls, kept) tuples, one per dice group.
+        """
+        dice_engine = dice_engine or engine
+        total = self.modifier
+        details = []
+        for term in self.terms:
+            subtotal, rolls, kept = term.roll(dice_engine)
+            total += subtotal
+            details.append((term, rolls, kept))
+        return total, details
+
+    def roll_many(self, trials, dice_engine=None):
+        """
+        Rolls the expression `trials` times.
+        Returns an int64 array of totals (a list without NumPy).
+        """
+        dice_engine = dice_engine or engine
+        if np is not None:
+            totals = np.full(trials, self.modifier, dtype=np.int64)
+            for term in self.terms:
+                totals += term.roll_many(dice_engine, trials)
+            return totals
+
+        totals = [self.modifier] * trials
+        for term in self.terms:
+            totals = [a + b for a, b in zip(totals, term.roll_many(dice_engine, trials))]
+        return totals
+
+    def distribution(self):
+        """Returns the exact Distribution of the expression (computed once per plan)."""
+        if self._distribution is None:
+            dist = Distribution.constant(self.modifier)
+            for term in self.terms:
+                term_dist = _term_distribution(term.count, term.sides, term.keep, term.keep_count)
+                dist = dist + (term_dist if term.sign > 0 else -term_dist)
+            self._distribution = dist
+        return self._distribution
+
+
+_TERM_RE = re.compile(
+    r"""([+-])?                              # sign
+        (?:
+            (\d*)d(\d+|%)                    # NdS / dS / d%
+            (?:(kh|kl|dh|dl|k|d)(\d*))?       # keep / drop suffix
+          | (\d+)                             # flat modifier
+        )""",
+    re.VERBOSE,
+)
+
+_SPACED_OPERATOR_RE = re.compile(r"\s*([+-])\s*")
+
+
+def compile_expression(text):
+    """
+    Compiles a dice expression such as "4d6kh3", "2d20kl1+5" or "1d8 + 2".
+    Returns a cached DicePlan; raises DiceExpressionError on bad input.
+
+    Supported suffixes: khN/kN (keep highest), klN (keep lowest),
+    dhN (drop highest) and dlN/dN (drop lowest). "d%" is a d100.
+    """
+    if not isinstance(text, str):
+        raise DiceExpressionError(f"Dice expression must be a string, got {type(text).__name__}")
+    # Spaces may surround + and -; any left over sit between two terms
+    normalized = _SPACED_OPERATOR_RE.sub(r"\1", text.strip()).lower()
+    if any(c.isspace() for c in normalized):
+        raise DiceExpressionError(f"Missing operator between terms in {text!r}")
+    return _compile_normalized(normalized)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_normalized(text):
+    if not text:
+        raise DiceExpressionError("Empty dice expression")
+
+    terms = []
+    modifier = 0
+    pos = 0
+    while pos < len(text):
+        match = _TERM_RE.match(text, pos)
+        if not match or match.end() == pos or (pos > 0 and not match.group(1)):
+            raise DiceExpressionError(f"Invalid dice expression {text!r} at position {pos}")
+        pos = match.end()
+
+        sign_str, count_str, sides_str, suffix, suffix_num, flat = match.groups()
+        sign = -1 if sign_str == '-' else 1
+        if flat is not None:
+            modifier += sign * int(flat)
+            continue
+
+        count = int(count_str) if count_str else 1
+        sides = 100 if sides_str == '%' else int(sides_str)
+        if sides < 1:
+            raise DiceExpressionError(f"A die needs at least one side in {text!r}")
+
+        keep, keep_count = None, None
+        if suffix:
+            n = int(suffix_num) if suffix_num else 1
+            if suffix in ('kh', 'k'):
+                keep, keep_count = 'h', n
+            elif suffix == 'kl':
+                keep, keep_count = 'l', n
+            elif suffix == 'dh':
+                keep, keep_count = 'l', count - n
+            else: # 'dl' / 'd'
+                keep, keep_count = 'h', count - n
+            if not 0 <= keep_count <= count:
+                raise DiceExpressionError(f"Cannot keep {keep_count} of {count} dice in {text!r}")
+        terms.append(DiceTerm(count, sides, keep, keep_count, sign))
+
+    return DicePlan(text, terms, modifier)
+
+
+def roll_expression(text, dice_engine=None):
+    """Compiles (or fetches the cached plan for) `text` and rolls it once."""
+    return compile_expression(text).roll(dice_engine)
+
+
+# ---------- Exact distributions ----------
+
+class Distribution:
+    """
+    Exact outcome distribution of a dice expression.
+
+    `ways[i]` is the number of equally likely roll combinations that give
+    `offset + i`, out of `total` combinations. Counts are Python ints, so
+    results stay exact no matter how many dice are involved.
+    """
+    __slots__ = ('offset', 'ways', 'total', '_cumulative')
+
+    def __init__(self, offset, ways):
+        self.offset = offset
+        self.ways = tuple(ways)
+        self.total = sum(self.ways)
+        self._cumulative = None
+
+    @classmethod
+    def constant(cls, value):
+        return cls(value, (1,))
+
+    @property
+    def minimum(self):
+        return self.offset
+
+    @property
+    def maximum(self):
+        return self.offset + len(self.ways) - 1
+
+    def __add__(self, other):
+        """Distribution of the sum of two independent outcomes (convolution)."""
+        if len(self.ways) < len(other.ways):
+            self, other = other, self
+        result = [0] * (len(self.ways) + len(other.ways) - 1)
+        for j, w_other in enumerate(other.ways):
+            if w_other:
+                for i, w_self in enumerate(self.ways):
+                    result[i + j] += w_self * w_other
+        return Distribution(self.offset + other.offset, result)
+
+    def __neg__(self):
+        return Distribution(-self.maximum, reversed(self.ways))
+
+    def probability(self, outcome):
+        """Chance of rolling exactly `outcome`, as a float."""
+        i = outcome - self.offset
+        return self.ways[i] / self.total if 0 <= i < len(self.ways) else 0.0
+
+    def at_least(self, outcome):
+        """Chance of rolling `outcome` or more, as a float."""
+        i = outcome - self.offset
+        if i <= 0:
+            return 1.0
+        if i >= len(self.ways):
+            return 0.0
+        return (self.total - self.cumulative()[i - 1]) / self.total
+
+    def pmf(self):
+        """Returns {outcome: probability} for every reachable outcome."""
+        return {self.offset + i: w / self.total for i, w in enumerate(self.ways) if w}
+
+    def cumulative(self):
+        """Running totals of `ways`, i.e. the unnormalized CDF."""
+        if self._cumulative is None:
+            running, acc = [], 0
+            for w in self.ways:
+                acc += w
+                running.append(acc)
+            self._cumulative = running
+        return self._cumulative
+
+    @property
+    def mean(self):
+        return sum(i * w for i, w in enumerate(self.ways)) / self.total + self.offset
+
+    @property
+    def variance(self):
+        # Computed on integer moments so large dice pools don't lose precision
+        s1 = sum(i * w for i, w in enumerate(self.ways))
+        s2 = sum(i * i * w for i, w in enumerate(self.ways))
+        return (s2 * self.total - s1 * s1) / (self.total * self.total)
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def percentile(self, p):
+        """Smallest outcome whose cumulative probability reaches `p` percent."""
+        if not 0 <= p <= 100:
+            raise ValueError(f"Percentile must be between 0 and 100, got {p}")
+        # Compare integers: cumulative / total >= p / 100
+        threshold = math.ceil(p * self.total / 100) if p else 1
+        return self.offset + bisect.bisect_left(self.cumulative(), threshold)
+
+    def summary(self):
+        """Common statistics as a dict, e.g. for balance tables."""
+        return {
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.mean,
+            'stdev': self.stdev,
+            'p10': self.percentile(10),
+            'median': self.percentile(50),
+            'p90': self.percentile(90),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def _die_distribution(sides):
+    """A single die: every face equally likely."""
+    return Distribution(1, [1] * sides)
+
+
+@functools.lru_cache(maxsize=512)
+def _dice_distribution(count, sides):
+    """Sum of `count` dice with `sides` sides, built by repeated squaring."""
+    if count == 0:
+        return Distribution.constant(0)
+    if count == 1:
+        return _die_distribution(sides)
+    half = _dice_distribution(count // 2, sides)
+    dist = half + half
+    if count % 2:
+        dist = dist + _die_distribution(sides)
+    return dist
+
+
+@functools.lru_cache(maxsize=512)
+def _term_distribution(count, sides, keep, keep_count):
+    """Distribution of one NdS group, honoring keep-highest/keep-lowest."""
+    if keep is None or keep_count == count:
+        return _dice_distribution(count, sides)
+    if keep_count == 0:
+        return Distribution.constant(0)
+
+    # Walk the faces from best to worst (highest first for 'h'). Dice showing
+    # earlier faces are kept first, so a state only needs to track how many
+    # dice are placed and the sum of the kept ones.
+    # states: {(dice_placed, kept_sum): ways}
+    faces = range(sides, 0, -1) if keep == 'h' else range(1, sides + 1)
+    states = {(0, 0): 1}
+    for face in faces:
+        next_states = {}
+        for (placed, kept_sum), ways in states.items():
+            free = count - placed
+            still_kept = max(keep_count - placed, 0)
+            for showing in range(free + 1):
+                key = (placed + showing, kept_sum + face * min(showing, still_kept))
+                next_states[key] = next_states.get(key, 0) + ways * math.comb(free, showing)
+        states = next_states
+
+    low, high = keep_count, keep_count * sides
+    ways = [0] * (high - low + 1)
+    for (placed, kept_sum), w in states.items():
+        if placed == count:
+            ways[kept_sum - low] += w
+    return Distribution(low, ways)
+
+
+def distribution(text):
+    """Exact Distribution of a dice expression string."""
+    return compile_expression(text).distribution()
+
+
+def summarize(text):
+    """Mean, spread and percentiles of a dice expression (see Distribution.summary)."""
+    return distribution(text).summary()
@@ -0,0 +1,325 @@
+# journal.py
+# Autosave for the character being edited.
+#
+# Every change to the Character (a spinbox, an equipment slot, a list drop,
+# ...) is appended to a journal file as one JSON line per changed address:
+#   ["level", 5]   or   ["abilities", "DEX", 16]
+# Values are absolute, so replaying a line twice does no harm. The first
+# change after a reset writes a snapshot (a .dndc file, see charfile.py)
+# instead, and once the journal has grown past COMPACT_BYTES it is folded
+# into a new snapshot and started again. Recovery loads the snapshot and
+# replays only the journal lines after it.
+#
+# Every running window journals into its own session directory under the
+# autosave root, locked while it runs. A session left with a snapshot and
+# no lock holder belongs to a window that crashed or closed with unsaved
+# edits; the next start offers to recover it, unless the character file it
+# was editing has been saved since.
+#
+# The GUI thread only encodes lines and queues them. A writer thread
+# appends everything queued in the last FLUSH_INTERVAL with one write and
+# one fsync, so typing never waits on the disk. No Qt here.
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+import charfile
+
+# Seconds the writer collects changes before writing them with one fsync
+FLUSH_INTERVAL = 0.5
+# Journal size that gets it folded into a new snapshot
+COMPACT_BYTES = 64 * 1024
+
+SNAPSHOT_NAME = "autosave.dndc"
+LOG_NAME = "autosave.log"
+# Path of the character file the session was editing, if it has one
+SOURCE_NAME = "source"
+LOCK_NAME = "lock"
+SESSION_PREFIX = "session-"
+
+
+def _lock(directory):
+    """Locks a session directory. Returns the open lock file, or None if another process holds it."""
+    f = open(os.path.join(directory, LOCK_NAME), 'a+b')
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _remove_session(directory, lock):
+    """Unlocks and deletes a session directory."""
+    lock.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _read_source(directory):
+    """The character file a session was editing, or None."""
+    try:
+        with open(os.path.join(directory, SOURCE_NAME), encoding='utf-8') as f:
+            return f.read() or None
+    except FileNotFoundError:
+        return None
+
+
+class Journal:
+    """
+    Appends `character`'s changes to an autosave journal in a new session
+    directory under `root`.
+    """
+    def __init__(self, root, character, refs):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.directory = tempfile.mkdtemp(prefix=SESSION_PREFIX, dir=root)
+        self._lock_file = _lock(self.directory)
+        self.snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        self.log_path = os.path.join(self.directory, LOG_NAME)
+        self.source_path = os.path.join(self.directory, SOURCE_NAME)
+        self.character = character
+        self.refs = refs
+        self.source = None # Character file being edited
+        self._has_snapshot = False
+        self._log_bytes = 0 # Journal bytes queued since the last snapshot
+        self._paused = False
+        self._orphan = None # (directory, lock) of a session recoverable() found
+
+        # Writer thread: queued ('log' | 'snapshot' | 'reset' | 'source', bytes or path)
+        self._pending = []
+        self._lock = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+        character.observe(self.on_changed)
+
+    # --- GUI side ---
+
+    @contextmanager
+    def paused(self):
+        """Changes made inside aren't journaled (e.g. loading a file)."""
+        self._paused = True
+        try:
+            yield
+        finally:
+            self._paused = False
+
+    def on_changed(self, addresses):
+        if self._paused:
+            return
+        if not self._has_snapshot:
+            self.compact()
+            return
+        lines = []
+        for address in addresses:
+            if isinstance(address, tuple):
+                field, key = address
+                record = [field, key, getattr(self.character, field)[key]]
+            else:
+                record = [address, getattr(self.character, address)]
+            lines.append(json.dumps(record, separators=(',', ':')))
+        data = ("\n".join(lines) + "\n").encode('utf-8')
+        self._log_bytes += len(data)
+        self._queue('log', data)
+        if self._log_bytes > COMPACT_BYTES:
+            self.compact()
+
+    def compact(self):
+        """Writes the whole character as a new snapshot and empties the journal."""
+        self._queue('snapshot', charfile.dumps(self.character.to_sheet(), self.refs))
+        self._has_snapshot = True
+        self._log_bytes = 0
+
+    def reset(self, source=None):
+        """
+        Drops the autosave: the character was just saved to or opened from
+        `source` (None for a new sheet).
+        """
+        self.source = source
+        self._queue('reset', source)
+        self._has_snapshot = False
+        self._log_bytes = 0
+
+    def recoverable(self):
+        """
+        True if a session that is no longer running left unsaved changes
+        behind. The newest one is kept for recover() or discard(); sessions
+        with nothing to recover, or whose file was saved after their last
+        edit, are deleted on the way.
+        """
+        self.discard()
+        found = []
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if not name.startswith(SESSION_PREFIX) or directory == self.directory:
+                continue
+            lock = _lock(directory)
+            if lock is None:
+                continue # Another window is still running it
+            paths = [os.path.join(directory, SNAPSHOT_NAME), os.path.join(directory, LOG_NAME)]
+            edited = max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=None)
+            source = _read_source(directory)
+            if (not os.path.exists(paths[0])
+                    or source and os.path.exists(source) and os.path.getmtime(source) > edited):
+                _remove_session(directory, lock)
+                continue
+            found.append((edited, directory, lock))
+        found.sort(key=lambda session: session[0])
+        for _, directory, lock in found[:-1]:
+            lock.close() # Offered again next time
+        if found:
+            self._orphan = found[-1][1:]
+        return self._orphan is not None
+
+    def discard(self):
+        """Deletes the session recoverable() found."""
+        if self._orphan:
+            _remove_session(*self._orphan)
+            self._orphan = None
+
+    def recover(self):
+        """
+        Loads the session recoverable() found (its snapshot and the journal
+        lines after it) into the character in one update, and carries it
+        on in this session. Returns how many lines were replayed.
+        Raises OSError or charfile.CharFileError.
+        """
+        directory = self._orphan[0]
+        sheet = charfile.load(os.path.join(directory, SNAPSHOT_NAME), self.refs)
+        replayed = 0
+        try:
+            with open(os.path.join(directory, LOG_NAME), 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break # Torn last write
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    field = record[0]
+                    if field not in sheet:
+                        continue
+                    if len(record) == 3:
+                        sheet[field][record[1]] = record[2]
+                    else:
+                        sheet[field] = record[1]
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+        self.source = _read_source(directory)
+        with self.paused():
+            self.character.update(sheet)
+        self._queue('source', self.source)
+        self.compact()
+        self.discard()
+        return replayed
+
+    def close(self, keep=True):
+        """
+        Writes what's still queued and stops the writer. Unless `keep` (there
+        are unsaved edits to recover), the session is deleted.
+        """
+        if not keep:
+            self.reset(self.source)
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        self._thread.join()
+        if self._orphan:
+            self._orphan[1].close() # Not decided on: offered again next time
+            self._orphan = None
+        if keep and self._has_snapshot:
+            self._lock_file.close()
+        else:
+            _remove_session(self.directory, self._lock_file)
+
+    def _queue(self, kind, data):
+        with self._lock:
+            self._pending.append((kind, data))
+            self._lock.notify()
+
+    # --- Writer thread ---
+
+    def _run(self):
+        log = None
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._lock.wait()
+                # Let a burst of edits collect into one write
+                self._lock.wait_for(lambda: self._closed, timeout=FLUSH_INTERVAL)
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            try:
+                log = self._write(batch, log)
+            except OSError as e:
+                print(f"Error writing autosave: {e}", file=sys.stderr)
+                if log:
+                    log.close()
+                log = None
+            if closed and not self._pending:
+                if log:
+                    log.close()
+                return
+
+    def _write(self, batch, log):
+        """Writes queued items in order. Returns the open journal file, if any."""
+        data = bytearray()
+        for kind, payload in batch:
+            if kind == 'log':
+                data += payload
+                continue
+            if kind == 'source':
+                self._write_source(payload)
+                continue
+            # A snapshot or reset replaces everything before it
+            data.clear()
+            if log:
+                log.close()
+                log = None
+            if kind == 'snapshot':
+                tmp_path = self.snapshot_path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # Empty the journal before the snapshot goes in: a crash in
+                # between would otherwise replay old lines over the new one
+                log = open(self.log_path, 'wb')
+                os.fsync(log.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+            else:
+                for path in (self.snapshot_path, self.log_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._write_source(payload)
+        if data:
+            if log is None:
+                log = open(self.log_path, 'ab')
+            log.write(data)
+            log.flush()
+            os.fsync(log.fileno())
+        return log
+
+    def _write_source(self, source):
+        if source is None:
+            if os.path.exists(self.source_path):
+                os.remove(self.source_path)
+            return
+        with open(self.source_path, 'w', encoding='utf-8') as f:
+            f.write(source)
@@ -3,7 +3,6 @@
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 from components.widgets import EquipmentSlot
-import random # Keep random here for the dice roller logic
 
 def _create_dice_roller(main_window: QtWidgets.QMainWindow) -> QtWidgets.QGroupBox:
     """Creates and returns the Dice Roller group box."""
@@ -51,9 +51,12 @@ def populate_left_panel(main_window: QtWidgets.QMainWindow, layout: QtWidgets.QV
     info_layout.setLabelAlignment(QtCore.Qt.AlignmentFlag.AlignLeft)
     info_layout.setFormAlignment(QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignTop)
 
-    main_window.name_edit = QtWidgets.QLineEdit("Name")
-    main_window.class_edit = QtWidgets.QLineEdit("Class")
-    main_window.race_edit = QtWidgets.QLineEdit("Race")
+    main_window.name_edit = QtWidgets.QLineEdit()
+    main_window.name_edit.setPlaceholderText("Name")
+    main_window.class_edit = QtWidgets.QLineEdit()
+    main_window.class_edit.setPlaceholderText("Class")
+    main_window.race_edit = QtWidgets.QLineEdit()
+    main_window.race_edit.setPlaceholderText("Race")
     main_window.level_spin = QtWidgets.QSpinBox()
     main_window.level_spin.setRange(1, 30)
     main_window.level_spin.setValue(1)
@@ -79,7 +82,7 @@ def populate_left_panel(main_window: QtWidgets.QMainWindow, layout: QtWidgets.QV
     
     main_window.ac_spin = QtWidgets.QSpinBox()
     main_window.ac_spin.setRange(0, 99)
-    main_window.ac_spin.setValue(15)
+    main_window.ac_spin.setValue(10)
 
     main_window.speed_spin = QtWidgets.QSpinBox()
     main_window.speed_spin.setRange(0, 200)
@@ -87,7 +90,7 @@ def populate_left_panel(main_window: QtWidgets.QMainWindow, layout: QtWidgets.QV
     
     main_window.init_spin = QtWidgets.QSpinBox()
     main_window.init_spin.setRange(-10, 30)
-    main_window.init_spin.setValue(2)
+    main_window.init_spin.setValue(0)
 
     main_window.perc_spin = QtWidgets.QSpinBox()
     main_window.perc_spin.setRange(0, 50)
@@ -148,6 +151,7 @@ def populate_left_panel(main_window: QtWidgets.QMainWindow, layout: QtWidgets.QV
     skills_group.setLayout(skills_layout)
     
     main_window.skill_spins = {}
+    main_window.skill_prof_checks = {} # Checked = proficient (adds the proficiency bonus)
     skill_names = [
         "Acrobatics", "Animal Handling", "Arcana", "Athletics", "Deception", 
         "History", "Insight", "Intimidation", "Investigation", "Medicine", 
@@ -166,8 +170,11 @@ def populate_left_panel(main_window: QtWidgets.QMainWindow, layout: QtWidgets.QV
         spin_left.setFixedWidth(40)
         main_window.skill_spins[skill_left_name] = spin_left
         
+        check_left = QtWidgets.QCheckBox(skill_left_name)
+        main_window.skill_prof_checks[skill_left_name] = check_left
+
         skills_layout.addWidget(spin_left, i, 0)
-        skills_layout.addWidget(QtWidgets.QLabel(skill_left_name), i, 1)
+        skills_layout.addWidget(check_left, i, 1)
 
         # Right column skill
         skill_right_name = skill_names[i + 9]
@@ -178,8 +185,11 @@ def populate_left_panel(main_window: QtWidgets.QMainWindow, layout: QtWidgets.QV
         spin_right.setFixedWidth(40)
         main_window.skill_spins[skill_right_name] = spin_right
         
+        check_right = QtWidgets.QCheckBox(skill_right_name)
+        main_window.skill_prof_checks[skill_right_name] = check_right
+
         skills_layout.addWidget(spin_right, i, 2)
-        skills_layout.addWidget(QtWidgets.QLabel(skill_right_name), i, 3)
+        skills_layout.addWidget(check_right, i, 3)
 
     layout.addWidget(skills_group)
 
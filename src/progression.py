@@ -0,0 +1,84 @@
+# progression.py
+# Resolves a class (and subclass) at a level into what the sheet shows:
+# hit dice, proficiency bonus, spell slots and features.
+#
+# All 20 levels of a class are read in one query on the ClassProgression
+# table populate.py builds, parsed once and kept, so moving the level
+# spinbox up and down never goes back to the database. No Qt here, so
+# headless tools can use it too.
+
+import json
+import sys
+from collections import OrderedDict
+
+from database import QUERIES
+
+# (class, subclass) progressions kept parsed
+PROGRESSION_CACHE_SIZE = 32
+
+
+class LevelInfo:
+    """Everything a class (and subclass) gives at one level."""
+    __slots__ = ('level', 'class_name', 'subclass_name', 'hit_die', 'prof_bonus',
+                 'cantrips_known', 'spells_known', 'spell_slots', 'features')
+
+    def __init__(self, row):
+        self.level = row['level']
+        self.class_name = row['class_name']
+        self.subclass_name = row['subclass_name']
+        self.hit_die = row['hit_die']
+        self.prof_bonus = row['prof_bonus']
+        self.cantrips_known = row['cantrips_known']
+        self.spells_known = row['spells_known']
+        # Slots for spell levels 1-9, 0 where there are none
+        self.spell_slots = tuple(row[f'spell_slots_level_{n}'] or 0 for n in range(1, 10))
+        # Feature names up to this level, class and subclass, in the order they're gained
+        features = json.loads(row['all_features_json'])
+        if row['subclass_features_json']:
+            features += json.loads(row['subclass_features_json'])
+            features.sort(key=lambda feature: feature['level']) # Stable: class features first
+        self.features = tuple(feature['name'] for feature in features)
+
+    @property
+    def hit_dice(self):
+        """e.g. "5d10" for a level 5 fighter."""
+        return f"{self.level}d{self.hit_die}"
+
+
+class ProgressionEngine:
+    """Looks up LevelInfo for class/level/subclass, one query per class and subclass."""
+    def __init__(self, db):
+        self.db = db
+        self._levels = OrderedDict() # (class, subclass) -> [LevelInfo], level order
+
+    def levels(self, class_index, subclass_index=None):
+        """Every level of a class as LevelInfo, in order. [] if unknown or on error."""
+        key = (class_index, subclass_index)
+        levels = self._levels.get(key)
+        if levels is not None:
+            self._levels.move_to_end(key)
+            return levels
+
+        _, rows, error = self.db.query(QUERIES['class_levels'], (subclass_index, class_index))
+        if error:
+            print(f"Error loading progression for {class_index}: {error}", file=sys.stderr)
+            return []
+        levels = [LevelInfo(row) for row in rows]
+        self._levels[key] = levels
+        if len(self._levels) > PROGRESSION_CACHE_SIZE:
+            self._levels.popitem(last=False)
+        return levels
+
+    def at(self, class_index, level, subclass_index=None):
+        """
+        LevelInfo for one level, or None if the class is unknown. Levels past
+        the class's last one (the sheet allows 30) get the last level.
+        """
+        levels = self.levels(class_index, subclass_index)
+        if not levels:
+            return None
+        level = max(level, levels[0].level)
+        for info in reversed(levels):
+            if info.level <= level:
+                return info
+        return levels[0]
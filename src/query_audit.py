@@ -0,0 +1,84 @@
+# query_audit.py
+# Runs EXPLAIN QUERY PLAN over every query in database.QUERIES and flags
+# plans that are not index-backed.
+#
+# Usage: python query_audit.py [path/to/dnd_srd.db] [-v]
+# Exits with status 1 if any query is flagged.
+
+import os
+import sqlite3
+import sys
+
+from database import QUERIES
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'dnd_srd.db')
+
+
+def plan_problems(detail):
+    """
+    Returns what is wrong with one EXPLAIN QUERY PLAN line, or None.
+    Flags full table scans, indexes SQLite had to build on the fly (a missing
+    index) and sorts of the whole result. Walking an index in order
+    ("SCAN t USING INDEX ...") and sorting the rows within one group
+    ("RIGHT PART OF ORDER BY") are fine.
+    Virtual tables (the FTS5 index) report "SCAN t VIRTUAL TABLE INDEX n:..."
+    and only scan everything when no constraint is used ("INDEX 0:").
+    """
+    if ' VIRTUAL TABLE INDEX ' in detail:
+        return "full virtual table scan" if detail.endswith(' 0:') else None
+    if detail.startswith('SCAN ') and ' USING ' not in detail:
+        return "full table scan"
+    if 'AUTOMATIC' in detail:
+        return "automatic index (no usable index exists)"
+    if detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+        return "sorts the whole result"
+    return None
+
+def explain(conn, sql):
+    """Returns the plan lines for `sql`. Any ? parameters are bound to NULL."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count('?')).fetchall()
+    return [row[3] for row in rows]
+
+def audit(db_path, queries=QUERIES):
+    """Returns [(name, plan_lines, problems)] for every query, in order."""
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        results = []
+        for name, sql in queries.items():
+            plan = explain(conn, sql)
+            problems = []
+            for detail in plan:
+                problem = plan_problems(detail)
+                if problem:
+                    problems.append(f"{problem}: {detail}")
+            results.append((name, plan, problems))
+        return results
+    finally:
+        conn.close()
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    verbose = '-v' in args
+    paths = [a for a in args if a != '-v']
+    db_path = paths[0] if paths else DEFAULT_DB_PATH
+
+    if not os.path.exists(db_path):
+        print(f"ERROR: Database '{db_path}' not found.", file=sys.stderr)
+        return 2
+
+    flagged = 0
+    for name, plan, problems in audit(db_path):
+        status = "FLAG" if problems else "ok"
+        print(f"[{status:>4}] {name}")
+        for problem in problems:
+            print(f"         {problem}")
+        if verbose:
+            for detail in plan:
+                print(f"           | {detail}")
+        flagged += bool(problems)
+
+    print(f"\n{len(QUERIES)} queries audited, {flagged} flagged.")
+    return 1 if flagged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())